@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Transcode rendered avatar PNGs into smaller WebP/AVIF variants.
+
+Every public/avatars PNG is written straight from SaveImage at 512x512, but
+the app often shows it as a thumbnail. This writes <width>px WebP (and AVIF
+where Pillow can encode it) copies under public/avatars/variants/ and a
+manifest.json mapping avatar/pose -> variants with their byte sizes.
+Sources whose hash and settings match the manifest are skipped, and the
+rest are encoded on a process pool. Requires Pillow (pip install Pillow).
+
+Run standalone, or as the last step of a render with --optimize.
+"""
+
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from comfy_runner import DST
+from render_cache import file_sha256
+
+VARIANTS_DIR = "variants"
+WIDTHS = (64, 128, 256, 512)
+QUALITY = {"webp": 82, "avif": 60}
+
+
+def available_formats() -> list[str]:
+    Image.init()
+    extensions = Image.registered_extensions()
+    if ".avif" not in extensions:
+        try:
+            import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+        except ImportError:
+            pass
+        extensions = Image.registered_extensions()
+    return [fmt for fmt in ("webp", "avif") if f".{fmt}" in extensions]
+
+
+def asset_name(rel: str) -> str:
+    """avatar/pose for avatar/pose.png, avatar/base for avatar.png."""
+    rel = rel[:-len(".png")]
+    return rel if "/" in rel else f"{rel}/base"
+
+
+def find_sources(root: str) -> dict[str, str]:
+    """avatar/pose -> path relative to root, for every PNG outside the variants dir."""
+    sources = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not (dirpath == root and d == VARIANTS_DIR))
+        for filename in sorted(filenames):
+            if filename.endswith(".png") and not filename.startswith("."):
+                rel = os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/")
+                sources[asset_name(rel)] = rel
+    return sources
+
+
+def encode(root: str, name: str, rel: str, widths: list[int], formats: list[str]) -> list[dict]:
+    """Write every width/format variant of one source (runs in a worker process)."""
+    variants = []
+    with Image.open(os.path.join(root, rel)) as src:
+        src = src.convert("RGBA" if "A" in src.getbands() else "RGB")
+        for width in sorted({min(w, src.width) for w in widths}):
+            height = round(src.height * width / src.width)
+            img = src if width == src.width else src.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                out_rel = f"{VARIANTS_DIR}/{name}-{width}.{fmt}"
+                out_path = os.path.join(root, out_rel)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                tmp = f"{out_path}.tmp"
+                options = {"quality": QUALITY[fmt]}
+                if fmt == "webp":
+                    options["method"] = 6
+                img.save(tmp, format=fmt.upper(), **options)
+                os.replace(tmp, out_path)
+                variants.append({"width": width, "height": height, "format": fmt,
+                                 "path": out_rel, "bytes": os.path.getsize(out_path)})
+    return variants
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(path: str, manifest: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def optimize(root: str = DST, widths: list[int] = WIDTHS, formats: list[str] | None = None,
+             workers: int | None = None, force: bool = False) -> int:
+    """Bring root/variants up to date with the PNGs in root. Returns the number that failed."""
+    if Image is None:
+        print("ERROR: the asset optimizer needs Pillow (pip install Pillow)")
+        return 1
+    supported = available_formats()
+    formats = [fmt for fmt in (formats or supported) if fmt in supported]
+    if not formats:
+        print("ERROR: this Pillow build can encode neither WebP nor AVIF")
+        return 1
+    settings = {"widths": sorted(widths), "formats": formats, "quality": {fmt: QUALITY[fmt] for fmt in formats}}
+    manifest_path = os.path.join(root, VARIANTS_DIR, "manifest.json")
+    old = load_manifest(manifest_path).get("assets", {})
+
+    sources = find_sources(root)
+    manifest, todo = {}, []
+    for name, rel in sources.items():
+        entry = old.get(name)
+        digest = file_sha256(os.path.join(root, rel))
+        if (not force and entry and entry["sha256"] == digest and entry.get("settings") == settings
+                and all(os.path.exists(os.path.join(root, v["path"])) for v in entry["variants"])):
+            manifest[name] = entry
+        else:
+            todo.append((name, rel, digest))
+
+    # Variants of sources that no longer exist
+    for name in old.keys() - sources.keys():
+        for variant in old[name]["variants"]:
+            try:
+                os.unlink(os.path.join(root, variant["path"]))
+            except FileNotFoundError:
+                pass
+
+    print(f"=== Optimizing {len(todo)} of {len(sources)} avatar images ({', '.join(formats)} at {settings['widths']}) ===")
+    sys.stdout.flush()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(encode, root, name, rel, settings["widths"], formats): (name, rel, digest)
+                   for name, rel, digest in todo}
+        for future in as_completed(futures):
+            name, rel, digest = futures[future]
+            try:
+                variants = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"  FAILED: {name} ({e})")
+                continue
+            manifest[name] = {"source": rel, "sha256": digest, "bytes": os.path.getsize(os.path.join(root, rel)),
+                              "settings": settings, "variants": variants}
+            print(f"  OK: {name}")
+            sys.stdout.flush()
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    write_manifest(manifest_path, {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "assets": manifest})
+    png = sum(entry["bytes"] for entry in manifest.values())
+    full = dict.fromkeys(formats, 0)
+    for entry in manifest.values():
+        widest = max(v["width"] for v in entry["variants"])
+        for v in entry["variants"]:
+            if v["width"] == widest:
+                full[v["format"]] += v["bytes"]
+    sizes = ", ".join(f"{n / 1e6:.1f} MB {fmt}" for fmt, n in full.items())
+    print(f"=== Optimized {len(manifest)} images: {png / 1e6:.1f} MB of PNG -> {sizes} at full width ({failed} failed) ===")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", nargs="?", default=DST, help="avatar directory (default: the app's public/avatars)")
+    parser.add_argument("--widths", default=",".join(map(str, WIDTHS)), help="comma-separated variant widths (default 64,128,256,512)")
+    parser.add_argument("--formats", help="comma-separated subset of webp,avif (default: every one Pillow can encode)")
+    parser.add_argument("--workers", type=int, help="encoder processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="re-encode everything, even unchanged sources")
+    args = parser.parse_args()
+    widths = [int(w) for w in args.widths.split(",") if w]
+    formats = args.formats.split(",") if args.formats else None
+    sys.exit(1 if optimize(args.root, widths, formats, args.workers, args.force) else 0)
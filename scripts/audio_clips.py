@@ -0,0 +1,63 @@
+"""Trimming, loudness normalization and encoding of spoken clips, shared by
+compress-audio.py (the word clips) and spell-audio.py (the letter clips),
+so both come out at the same level and in the same formats.
+"""
+
+import array, math, os, subprocess
+
+TARGET_DBFS = -16.0     # speech loudness target, gated RMS
+PEAK_DBFS = -1.0        # never gain a clip past this peak
+SILENCE_DBFS = -45.0    # 10 ms windows quieter than this count as silence
+PAD_MS = 60             # kept on each side of the trimmed speech
+
+ENCODERS = {
+    "opus": ["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "opus"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "48k", "-ar", "24000", "-f", "mp3"],
+}
+
+
+def dbfs(value: float) -> float:
+    return 20 * math.log10(value / 32768) if value > 0 else -math.inf
+
+
+def analyze(samples: array.array, rate: int, channels: int) -> tuple[int, int, float]:
+    """(first frame, end frame, gain) that trim the silence and normalize the loudness."""
+    window = rate // 100 * channels
+    levels = []
+    for i in range(0, len(samples), window):
+        chunk = samples[i:i + window]
+        levels.append(math.sqrt(sum(s * s for s in chunk) / len(chunk)))
+    loud = [i for i, level in enumerate(levels) if dbfs(level) > SILENCE_DBFS]
+    if not loud:
+        return 0, len(samples) // channels, 1.0
+    pad = PAD_MS // 10
+    first, last = max(loud[0] - pad, 0), min(loud[-1] + 1 + pad, len(levels))
+
+    # Loudness over 400 ms blocks, ignoring the quiet ones (like EBU R128's relative gate)
+    block = 40
+    blocks = [sum(l * l for l in levels[i:i + block]) / len(levels[i:i + block]) for i in range(first, last, block)]
+    gate = max(blocks) / 100  # -20 dB
+    gated = [b for b in blocks if b >= gate]
+    loudness = dbfs(math.sqrt(sum(gated) / len(gated)))
+    peak = dbfs(max(abs(s) for s in samples) or 1)
+    gain_db = min(TARGET_DBFS - loudness, PEAK_DBFS - peak)
+    return first * window // channels, min(last * window // channels, len(samples) // channels), 10 ** (gain_db / 20)
+
+
+def encode(pcm: bytes, rate: int, channels: int, out_base: str, formats: list[str]) -> dict[str, dict]:
+    """Encode little-endian 16-bit PCM to mono <out_base>.<fmt> for each format with ffmpeg,
+    each through a temp file; {fmt: {"path": file name, "bytes": size}}."""
+    outputs = {}
+    for fmt in formats:
+        out_path = f"{out_base}.{fmt}"
+        tmp = f"{out_path}.tmp"
+        cmd = ["ffmpeg", "-v", "error", "-y", "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-i", "-",
+               "-ac", "1", *ENCODERS[fmt], tmp]
+        result = subprocess.run(cmd, input=pcm, capture_output=True)
+        if result.returncode:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise RuntimeError(f"ffmpeg {fmt}: {result.stderr.decode(errors='replace').strip()}")
+        os.replace(tmp, out_path)
+        outputs[fmt] = {"path": os.path.basename(out_path), "bytes": os.path.getsize(out_path)}
+    return outputs
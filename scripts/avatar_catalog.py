@@ -0,0 +1,174 @@
+"""The avatar catalog (avatars.json), compiled into comfy_runner jobs.
+
+avatars.json names every avatar once: a seed, a style (one of the shared
+suffixes in "styles"), an optional descriptor repeated in every pose, and
+a scene per pose, or the name of a shared set in "scene_sets". A pose's
+prompt is "<descriptor>, <scene>, <style>". "seed_policy", catalog-wide
+or per avatar, is "same" (one seed for every pose, which keeps the
+character consistent) or "offset" (seed * 100 + the pose's index in
+"poses"). "template" holds the build_workflow settings shared by every
+graph (steps, size, loader overrides) and the SaveImage prefix pattern.
+avatars-fix-chess.json and avatars-fix-chess-v2.json keep two earlier looks
+of the chess pieces (a seed per pose, and one seed with a shared scene set)
+as catalogs of their own, for build-avatars.py --catalog.
+
+Each compiled Target knows which catalog fields its image depends on. The
+provenance file beside the PNG (<image>.provenance.json) records digests
+of those fields, the catalog and graph hashes, the seed and the image's
+sha256; stale() compares them with the catalog as it is now.
+"""
+
+import hashlib, json, os, time
+from dataclasses import dataclass
+
+from comfy_runner import DST, Job
+from render_cache import file_sha256
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "avatars.json")
+SEED_POLICIES = ("same", "offset")
+TEMPLATE_DEFAULTS = {"steps": 30, "size": 512, "loaders": {}, "prefix": "{avatar}_{pose}"}
+
+
+def digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def check(catalog: dict) -> list[str]:
+    """Everything compile() would trip over, as readable problems."""
+    problems = []
+    poses, styles, scene_sets = catalog.get("poses", []), catalog.get("styles", {}), catalog.get("scene_sets", {})
+    if catalog.get("seed_policy", "same") not in SEED_POLICIES:
+        problems.append(f"seed_policy must be one of {', '.join(SEED_POLICIES)}")
+    for name, scenes in scene_sets.items():
+        if set(scenes) - set(poses):
+            problems.append(f"scene_sets.{name}: unknown poses {sorted(set(scenes) - set(poses))}")
+    for avatar_id, avatar in catalog.get("avatars", {}).items():
+        where = f"avatars.{avatar_id}"
+        if not isinstance(avatar.get("seed"), int):
+            problems.append(f"{where}: seed must be an integer")
+        if "style" in avatar and avatar["style"] not in styles:
+            problems.append(f"{where}: unknown style {avatar['style']!r}")
+        if avatar.get("seed_policy", "same") not in SEED_POLICIES:
+            problems.append(f"{where}: seed_policy must be one of {', '.join(SEED_POLICIES)}")
+        scenes = avatar.get("scenes")
+        if isinstance(scenes, str):
+            if scenes not in scene_sets:
+                problems.append(f"{where}: unknown scene set {scenes!r}")
+        elif not isinstance(scenes, dict) or not scenes:
+            problems.append(f"{where}: scenes must map poses to scenes or name a scene set")
+        elif set(scenes) - set(poses):
+            problems.append(f"{where}: unknown poses {sorted(set(scenes) - set(poses))}")
+    return problems
+
+
+def load(path: str = CATALOG_PATH) -> dict:
+    with open(path) as f:
+        catalog = json.load(f)
+    problems = check(catalog)
+    if problems:
+        raise ValueError(f"{path}: {'; '.join(problems)}")
+    return catalog
+
+
+def image_path(dst: str, avatar: str, pose: str) -> str:
+    return f"{dst}/{avatar}.png" if pose == "base" else f"{dst}/{avatar}/{pose}.png"
+
+
+def provenance_path(out_path: str) -> str:
+    return out_path[:-len(".png")] + ".provenance.json"
+
+
+@dataclass
+class Target:
+    """One image of the catalog: its job, and the catalog fields it was compiled from."""
+    avatar: str
+    pose: str
+    job: Job
+    inputs: dict[str, str]  # catalog field -> digest of its value
+
+    @property
+    def provenance_path(self) -> str:
+        return provenance_path(self.job.out_path)
+
+
+def compile(catalog: dict, dst: str = DST) -> list[Target]:
+    poses = catalog["poses"]
+    template = {**TEMPLATE_DEFAULTS, **catalog.get("template", {})}
+    targets = []
+    for avatar_id, avatar in catalog["avatars"].items():
+        scenes, scenes_field = avatar["scenes"], f"avatars.{avatar_id}.scenes"
+        if isinstance(scenes, str):
+            scenes, scenes_field = catalog["scene_sets"][scenes], f"scene_sets.{scenes}"
+        policy_field = f"avatars.{avatar_id}.seed_policy" if "seed_policy" in avatar else "seed_policy"
+        policy = avatar.get("seed_policy", catalog.get("seed_policy", "same"))
+        style = catalog["styles"][avatar["style"]] if "style" in avatar else None
+        for index, pose in enumerate(poses):
+            if pose not in scenes:
+                continue
+            prompt = ", ".join(part for part in (avatar.get("descriptor"), scenes[pose], style) if part)
+            seed = avatar["seed"] if policy == "same" else avatar["seed"] * 100 + index
+            fields = {
+                f"avatars.{avatar_id}.seed": avatar["seed"],
+                policy_field: policy,
+                f"avatars.{avatar_id}.descriptor": avatar.get("descriptor"),
+                f"{scenes_field}.{pose}": scenes[pose],
+                "template.steps": template["steps"],
+                "template.size": template["size"],
+                "template.loaders": template["loaders"],
+            }
+            if style is not None:
+                fields[f"styles.{avatar['style']}"] = style
+            if policy == "offset":
+                fields["poses"] = poses  # the seed follows the pose's position
+            label = f"{avatar_id} (base)" if pose == "base" else f"{avatar_id}/{pose}"
+            job = Job(label, prompt, seed, template["prefix"].format(avatar=avatar_id, pose=pose),
+                      image_path(dst, avatar_id, pose), steps=template["steps"], size=template["size"],
+                      loaders=template["loaders"], root=dst)
+            targets.append(Target(avatar_id, pose, job, {k: digest(v)[:16] for k, v in fields.items()}))
+    return targets
+
+# ─── Provenance ──────────────────────────────────────────────────────
+
+def read_provenance(target: Target) -> dict | None:
+    try:
+        with open(target.provenance_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_provenance(target: Target, catalog_hash: str, rendered: Job | None = None, how: str = "rendered") -> None:
+    """Record what `target`'s image was built from. `rendered` is the job that actually
+    produced it when that differs from the compiled one (a QA retry seed, candidates)."""
+    rendered = rendered or target.job
+    record = {
+        "avatar": target.avatar, "pose": target.pose, "how": how,
+        "catalog": catalog_hash, "graph": target.job.key, "seed": rendered.seed, "prompt": target.job.prompt,
+        "inputs": target.inputs, "sha256": file_sha256(target.job.out_path),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    if rendered.key != target.job.key:
+        record["rendered_graph"] = rendered.key
+    tmp = f"{target.provenance_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(record, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, target.provenance_path)
+
+
+def stale(target: Target) -> list[str]:
+    """Why `target`'s image needs building, or [] if it is up to date."""
+    if not os.path.exists(target.job.out_path):
+        return ["missing"]
+    recorded = read_provenance(target)
+    if recorded is None:
+        return ["no provenance"]
+    if recorded.get("sha256") != file_sha256(target.job.out_path):
+        return ["image replaced outside the build"]
+    old = recorded.get("inputs", {})
+    changed = sorted(f for f in target.inputs.keys() | old.keys() if target.inputs.get(f) != old.get(f))
+    if changed:
+        return [f"{f} changed" for f in changed]
+    if recorded.get("graph") != target.job.key:
+        return ["build_workflow graph changed"]
+    return []
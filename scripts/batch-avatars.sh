@@ -1,118 +1,16 @@
 #!/bin/bash
 # Batch generate all avatar pose variants via ComfyUI Flux + PixarPerfect LoRA
-# Submits all prompts, then polls and downloads results
+# Pipes all prompts to comfy_runner.py, which submits them and downloads results as they finish
+# Extra arguments (--api, --max-in-flight, --poll) are passed through to the runner
 
-COMFY_API="http://10.0.0.239:4455"
-COMFY_SERVER="10.0.0.239"
-COMFY_OUTPUT="/mnt/tools/comfy-ui/output"
 DST="/Users/ralphyz/Tools/spelling_bee/spelling-bee/public/avatars"
+RUNNER="$(dirname "$0")/comfy_runner.py"
 
-submit_prompt() {
-  local PROMPT="$1"
-  local SEED="$2"
-  local PREFIX="$3"
-
-  local PROMPT_JSON
-  PROMPT_JSON=$(printf '%s' "$PROMPT" | python3 -c 'import sys,json; print(json.dumps(sys.stdin.read()))')
-
-  local WORKFLOW
-  WORKFLOW=$(cat <<ENDOFWORKFLOW
-{
-  "prompt": {
-    "12": {
-      "class_type": "UNETLoader",
-      "inputs": { "unet_name": "flux1-dev.safetensors", "weight_dtype": "default" }
-    },
-    "11": {
-      "class_type": "DualCLIPLoader",
-      "inputs": { "clip_name1": "flux/t5xxl_fp16.safetensors", "clip_name2": "flux/clip_l.safetensors", "type": "flux" }
-    },
-    "10": {
-      "class_type": "VAELoader",
-      "inputs": { "vae_name": "flux/ae.safetensors" }
-    },
-    "30": {
-      "class_type": "ModelSamplingFlux",
-      "inputs": { "model": ["12", 0], "max_shift": 1.15, "base_shift": 0.5, "width": 512, "height": 512 }
-    },
-    "47": {
-      "class_type": "LoraLoader",
-      "inputs": { "model": ["30", 0], "clip": ["11", 0], "lora_name": "flux/PixarPerfect_3D_Animation_Style_FLUX-000001.safetensors", "strength_model": 1.0, "strength_clip": 1.0 }
-    },
-    "6": {
-      "class_type": "CLIPTextEncode",
-      "inputs": { "clip": ["47", 1], "text": $PROMPT_JSON }
-    },
-    "26": {
-      "class_type": "FluxGuidance",
-      "inputs": { "conditioning": ["6", 0], "guidance": 3.5 }
-    },
-    "25": {
-      "class_type": "RandomNoise",
-      "inputs": { "noise_seed": $SEED }
-    },
-    "27": {
-      "class_type": "EmptySD3LatentImage",
-      "inputs": { "width": 512, "height": 512, "batch_size": 1 }
-    },
-    "16": {
-      "class_type": "KSamplerSelect",
-      "inputs": { "sampler_name": "euler" }
-    },
-    "17": {
-      "class_type": "BasicScheduler",
-      "inputs": { "model": ["30", 0], "scheduler": "beta", "steps": 30, "denoise": 1.0 }
-    },
-    "22": {
-      "class_type": "BasicGuider",
-      "inputs": { "model": ["47", 0], "conditioning": ["26", 0] }
-    },
-    "13": {
-      "class_type": "SamplerCustomAdvanced",
-      "inputs": { "noise": ["25", 0], "guider": ["22", 0], "sampler": ["16", 0], "sigmas": ["17", 0], "latent_image": ["27", 0] }
-    },
-    "8": {
-      "class_type": "VAEDecode",
-      "inputs": { "samples": ["13", 0], "vae": ["10", 0] }
-    },
-    "9": {
-      "class_type": "SaveImage",
-      "inputs": { "images": ["8", 0], "filename_prefix": "$PREFIX" }
-    }
-  }
-}
-ENDOFWORKFLOW
-)
-
-  local RESPONSE
-  RESPONSE=$(curl -s -X POST "$COMFY_API/prompt" -H "Content-Type: application/json" -d "$WORKFLOW")
-  echo "$RESPONSE" | python3 -c "import sys,json; print(json.load(sys.stdin).get('prompt_id',''))" 2>/dev/null
+# Print one comfy_runner.py job as a JSON line: PROMPT SEED PREFIX OUT_PATH LABEL
+emit_job() {
+  python3 -c 'import sys,json; print(json.dumps(dict(zip(["prompt", "seed", "prefix", "out", "label"], sys.argv[1:]))))' "$@"
 }
 
-collect_result() {
-  local PID="$1"
-  local OUT="$2"
-  local FILE
-  FILE=$(curl -s "$COMFY_API/history/$PID" | python3 -c "
-import sys, json
-h = json.load(sys.stdin)
-if '$PID' in h:
-    imgs = h['$PID'].get('outputs', {}).get('9', {}).get('images', [])
-    if imgs: print(imgs[0]['filename'])
-" 2>/dev/null)
-  if [ -n "$FILE" ]; then
-    scp -q "$COMFY_SERVER:$COMFY_OUTPUT/$FILE" "$OUT"
-    echo "OK: $OUT"
-    return 0
-  fi
-  return 1
-}
-
-# Track all jobs: "prompt_id|output_path"
-JOBS=()
-
-echo "=== Submitting all avatar poses ==="
-
 # Character descriptions and their seeds
 declare -A CHARS
 CHARS[avocado]="a cute cartoon avocado character cut in half showing the pit, with big expressive eyes and a warm smile"
@@ -155,7 +53,6 @@ POSES[options]="holding a gear or wrench, playful tinkering expression, one eyeb
 
 AVATAR_IDS=(avocado pitbull elephant chess-pawn chess-queen chess-knight chess-rook karate-girl girl-brown girl-blonde girl-redhead boy-brown boy-blonde boy-black fire cat tools bbq-ribs cross wednesday dewalt)
 
-TOTAL=0
 for ID in "${AVATAR_IDS[@]}"; do
   CHAR="${CHARS[$ID]}"
   SEED_BASE="${SEEDS[$ID]}"
@@ -164,49 +61,7 @@ for ID in "${AVATAR_IDS[@]}"; do
     POSE="${POSES[$PAGE]}"
     FULL_PROMPT="$CHAR, $POSE, Pixar style 3D character render, clean white background"
     SEED=$((SEED_BASE * 100 + POSE_NUM))
-    PREFIX="avatar_${ID}_${PAGE}"
-    OUT_PATH="$DST/$ID/$PAGE.png"
-
-    PID=$(submit_prompt "$FULL_PROMPT" "$SEED" "$PREFIX")
-    if [ -n "$PID" ]; then
-      JOBS+=("$PID|$OUT_PATH")
-      TOTAL=$((TOTAL + 1))
-      echo "[$TOTAL] Queued: $ID/$PAGE (seed=$SEED, pid=${PID:0:8}...)"
-    else
-      echo "FAILED to queue: $ID/$PAGE"
-    fi
+    emit_job "$FULL_PROMPT" "$SEED" "avatar_${ID}_${PAGE}" "$DST/$ID/$PAGE.png" "$ID/$PAGE"
     POSE_NUM=$((POSE_NUM + 1))
   done
-done
-
-echo ""
-echo "=== $TOTAL jobs queued. Waiting for completion... ==="
-
-# Poll until all done
-COMPLETED=0
-FAILED_JOBS=()
-MAX_WAIT=600  # 10 minutes per check cycle
-CHECK_INTERVAL=10
-
-while [ ${#JOBS[@]} -gt 0 ]; do
-  sleep $CHECK_INTERVAL
-  REMAINING=()
-  for JOB in "${JOBS[@]}"; do
-    PID="${JOB%%|*}"
-    OUT="${JOB##*|}"
-    if collect_result "$PID" "$OUT"; then
-      COMPLETED=$((COMPLETED + 1))
-      echo "  [$COMPLETED/$TOTAL] done"
-    else
-      REMAINING+=("$JOB")
-    fi
-  done
-  JOBS=("${REMAINING[@]}")
-
-  if [ ${#JOBS[@]} -gt 0 ]; then
-    echo "  ... ${#JOBS[@]} remaining"
-  fi
-done
-
-echo ""
-echo "=== COMPLETE: $COMPLETED/$TOTAL avatars generated ==="
+done | python3 "$RUNNER" "$@"
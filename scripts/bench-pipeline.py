@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the ComfyUI job pipeline against fake_comfy.py.
+
+Starts one or more local fake ComfyUI servers, then runs the AVATARS x
+POSES job set from batch-all-poses.py (cycled with fresh seeds up to each
+--sizes count) through comfy_runner.run_jobs, rendering into a temp dir.
+Per size it reports wall time, the client's overhead over the fake's
+own render time, client CPU time, HTTP requests per image and
+completion latency (last render finished -> image on disk).
+
+Results are appended to scripts/.bench/results.jsonl together with the
+git commit; each run is compared with the last stored run of the same
+size and settings.
+
+    python3 bench-pipeline.py --sizes 10,100,1000 --latency 0.01
+"""
+
+import argparse, asyncio, contextlib, io, json, os, runpy, shutil, subprocess, sys, tempfile, time, urllib.request
+
+import comfy_runner
+from comfy_runner import Job
+from job_telemetry import Telemetry, percentile
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(SCRIPTS_DIR, ".bench", "results.jsonl")
+
+
+def job_set(count: int, out_dir: str) -> list[Job]:
+    tables = runpy.run_path(os.path.join(SCRIPTS_DIR, "batch-all-poses.py"))
+    base = []
+    for avatar, info in tables["AVATARS"].items():
+        for pose in ["base", *tables["POSES"]]:
+            if pose in info:
+                base.append((avatar, pose, info[pose], info["seed"]))
+    jobs = []
+    for i in range(count):
+        avatar, pose, prompt, seed = base[i % len(base)]
+        round_ = i // len(base)
+        name = f"{avatar}-{round_}"
+        out_path = os.path.join(out_dir, f"{name}.png" if pose == "base" else os.path.join(name, f"{pose}.png"))
+        jobs.append(Job(f"{avatar}/{pose} #{round_}", prompt, seed + round_ * 100000, f"bench_{avatar}_{pose}", out_path,
+                        root=out_dir))
+    return jobs
+
+
+def start_fake(args) -> tuple[subprocess.Popen, str]:
+    cmd = [sys.executable, os.path.join(SCRIPTS_DIR, "fake_comfy.py"), "--port", "0",
+           "--latency", str(args.latency), "--jitter", str(args.jitter),
+           "--failure-rate", str(args.failure_rate), "--size", str(args.image_size), "--seed", "1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if "listening on " not in line:
+        proc.kill()
+        raise RuntimeError(f"fake ComfyUI did not start: {line!r}")
+    return proc, line.rsplit("listening on ", 1)[1].strip()
+
+
+def fake_stats(api: str) -> dict:
+    with urllib.request.urlopen(f"{api}/fake/stats", timeout=10) as resp:
+        return json.load(resp)
+
+
+def run_size(count: int, args) -> dict:
+    fakes = [start_fake(args) for _ in range(args.nodes)]
+    apis = [api for _, api in fakes]
+    out_dir = tempfile.mkdtemp(prefix="bench-avatars-")
+    try:
+        jobs = job_set(count, out_dir)
+        telemetry = Telemetry(os.path.join(out_dir, "telemetry.jsonl"))
+        wall, cpu = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            failed = asyncio.run(comfy_runner.run_jobs(
+                jobs, apis, max_in_flight=args.max_in_flight, poll=args.poll, node_depth=args.node_depth,
+                poll_interval=args.poll_interval, batch_poses=args.batch_poses, telemetry=telemetry))
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        stats = [fake_stats(api) for api in apis]
+    finally:
+        for proc, _ in fakes:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    requests: dict[str, int] = {}
+    for s in stats:
+        for endpoint, n in s["requests"].items():
+            requests[endpoint] = requests.get(endpoint, 0) + n
+    prompts = sum(s["rendered"] for s in stats)
+    render_time = prompts * args.latency / args.nodes
+    done = [r for r in telemetry.records if r["state"] == "done"]
+    latency = [r["download_end"] - r["exec_end"] for r in done if r.get("exec_end") is not None]
+    return {
+        "jobs": count,
+        "failed": failed,
+        "wall_s": round(wall, 3),
+        "overhead_s": round(wall - render_time, 3),
+        "client_cpu_ms_per_job": round(cpu / count * 1000, 3),
+        "requests": requests,
+        "requests_per_job": round(sum(requests.values()) / count, 2),
+        "images_per_min": round(len(done) / wall * 60, 1) if wall > 0 else 0.0,
+        "completion_p50_ms": round(percentile(latency, 50) * 1000, 1) if latency else None,
+        "completion_p95_ms": round(percentile(latency, 95) * 1000, 1) if latency else None,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def previous_results(path: str) -> list[dict]:
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated job counts, 10 to 10000 (default 10,100,1000)")
+    parser.add_argument("--nodes", type=int, default=1, help="fake ComfyUI servers to spread jobs over (default 1)")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake render seconds per prompt (default 0.01)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± seconds of fake render jitter")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of fake prompts that fail")
+    parser.add_argument("--image-size", type=int, default=32, help="fake output px (default 32)")
+    parser.add_argument("--node-depth", type=int, default=3)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--poll", action="store_true", help="benchmark /history polling instead of the websocket")
+    parser.add_argument("--poll-interval", type=float, default=10.0)
+    parser.add_argument("--batch-poses", action="store_true", help="benchmark one prompt per avatar")
+    parser.add_argument("--results", default=RESULTS_PATH, help="results log (default scripts/.bench/results.jsonl)")
+    parser.add_argument("--no-save", action="store_true", help="compare with stored results but do not append")
+    args = parser.parse_args()
+
+    settings = {k: getattr(args, k) for k in ("nodes", "latency", "jitter", "failure_rate", "image_size", "node_depth",
+                                              "max_in_flight", "poll", "poll_interval", "batch_poses")}
+    history = previous_results(args.results)
+    commit = git_commit()
+    print(f"=== Pipeline benchmark @ {commit or 'unknown commit'}: {settings} ===")
+    print(f"  {'jobs':>6} {'wall s':>8} {'overhead s':>11} {'cpu ms/job':>11} {'req/job':>8} {'img/min':>9} "
+          f"{'done p50 ms':>12} {'done p95 ms':>12}")
+    sys.stdout.flush()
+    for count in (int(n) for n in args.sizes.split(",") if n):
+        result = run_size(count, args)
+        print(f"  {count:>6} {result['wall_s']:>8.2f} {result['overhead_s']:>11.2f} {result['client_cpu_ms_per_job']:>11.2f} "
+              f"{result['requests_per_job']:>8.2f} {result['images_per_min']:>9.1f} "
+              f"{result['completion_p50_ms'] or 0:>12.1f} {result['completion_p95_ms'] or 0:>12.1f}"
+              + (f"  ({result['failed']} failed)" if result["failed"] else ""))
+        before = next((r for r in reversed(history) if r["settings"] == settings and r["result"]["jobs"] == count), None)
+        if before is not None:
+            changes = []
+            for metric in ("wall_s", "client_cpu_ms_per_job", "requests_per_job", "completion_p95_ms"):
+                old, new = before["result"].get(metric), result.get(metric)
+                if old and new is not None:
+                    changes.append(f"{metric} {(new - old) / old * 100:+.0f}%")
+            print(f"         vs {before.get('commit') or '?'} ({before['at']}): {', '.join(changes)}")
+        sys.stdout.flush()
+        if not args.no_save:
+            os.makedirs(os.path.dirname(args.results), exist_ok=True)
+            with open(args.results, "a") as f:
+                f.write(json.dumps({"at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": commit,
+                                    "settings": settings, "result": result}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
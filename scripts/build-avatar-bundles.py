@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Pack each avatar's base + pose images into one bundle file.
+
+Switching pages fetches every pose PNG separately; one bundle per avatar
+lets the app warm all of them with a single cacheable request. The
+avatars and pose order come from AVATARS/POSES in batch-all-poses.py.
+
+Bundle layout (public/avatars/bundles/<avatar>.bin):
+    b"AVB1" | uint32 big-endian index length | JSON index | image bytes
+The index is {"avatar", "parts": [{"name", "type", "offset", "length"}]}
+with offsets counted from the first image byte. Nothing time- or
+machine-dependent goes in, so an unchanged avatar rebuilds to the same
+bytes (and ETag); such bundles are not rewritten at all. bundles/index.json
+lists every bundle with its size and sha256.
+"""
+
+import argparse, hashlib, json, os, runpy, struct, sys
+
+from comfy_runner import DST
+
+MAGIC = b"AVB1"
+BUNDLE_DIR = "bundles"
+TYPES = {"png": "image/png", "webp": "image/webp", "avif": "image/avif"}
+
+
+def part_path(root: str, avatar: str, pose: str, variant: str | None) -> str:
+    """The file for one pose: the rendered PNG, or an asset_optimizer variant like "256.webp"."""
+    if variant:
+        return os.path.join(root, "variants", avatar, f"{pose}-{variant}")
+    return os.path.join(root, f"{avatar}.png" if pose == "base" else os.path.join(avatar, f"{pose}.png"))
+
+
+def build_bundle(root: str, avatar: str, poses: list[str], variant: str | None) -> tuple[bytes, list[str]]:
+    """The bundle bytes and the poses it holds (missing images are left out)."""
+    parts, payload = [], bytearray()
+    for pose in poses:
+        path = part_path(root, avatar, pose, variant)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        ext = path.rsplit(".", 1)[-1]
+        parts.append({"name": pose, "type": TYPES[ext], "offset": len(payload), "length": len(data)})
+        payload += data
+    index = json.dumps({"avatar": avatar, "parts": parts}, sort_keys=True, separators=(",", ":")).encode()
+    return MAGIC + struct.pack("!I", len(index)) + index + bytes(payload), [p["name"] for p in parts]
+
+
+def write_if_changed(path: str, data: bytes) -> bool:
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", nargs="?", default=DST, help="avatar directory (default: the app's public/avatars)")
+    parser.add_argument("--variant", metavar="WIDTH.FORMAT",
+                        help="bundle asset_optimizer variants (e.g. 256.webp) instead of the source PNGs")
+    args = parser.parse_args()
+
+    tables = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch-all-poses.py"))
+    poses = ["base", *tables["POSES"]]
+    out_dir = os.path.join(args.root, BUNDLE_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    index, written = {}, 0
+    for avatar in sorted(tables["AVATARS"]):
+        data, included = build_bundle(args.root, avatar, poses, args.variant)
+        if not included:
+            print(f"  SKIP: {avatar} (no images)")
+            continue
+        filename = f"{avatar}.bin"
+        if write_if_changed(os.path.join(out_dir, filename), data):
+            written += 1
+            print(f"  Wrote: {filename} ({len(included)} images, {len(data) / 1e3:.0f} KB)")
+        missing = [pose for pose in poses if pose not in included and pose != "base"]
+        if missing:
+            print(f"  {avatar}: missing {', '.join(missing)}")
+        index[avatar] = {"file": filename, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest(), "parts": included}
+    write_if_changed(os.path.join(out_dir, "index.json"), (json.dumps(index, indent=2, sort_keys=True) + "\n").encode())
+
+    print(f"=== Bundles: {len(index)} avatars, {written} rewritten, {len(index) - written} unchanged ===")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
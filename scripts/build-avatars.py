@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Render exactly the avatar images that are out of date with avatars.json.
+
+Compiles the catalog (see avatar_catalog.py) into build_workflow jobs and
+checks each against the provenance file beside its PNG. An image is stale
+when it is missing, has no provenance, was replaced from outside, or when
+a catalog field it depends on (its avatar's seed, descriptor or scene,
+its style, the seed policy, the template) or the graph build_workflow
+makes from them has changed. Only stale images go to ComfyUI, spread over
+the usual comfy_runner options (--api, --batch-poses, --qa, ...). An
+image the render cache already holds for the exact graph is adopted or
+restored instead of rendered. Every built image gets its provenance
+(catalog hash, graph hash, seed, inputs) written next to it.
+
+    python3 build-avatars.py --dry-run         # what is stale, and why
+    python3 build-avatars.py --api http://gpu1:8188,http://gpu2:8188
+    python3 build-avatars.py --catalog avatars-fix-chess-v2.json   # an older chess look
+"""
+
+import argparse, sys
+from dataclasses import replace
+
+import avatar_catalog
+import comfy_runner
+from render_cache import RenderCache
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", default=avatar_catalog.CATALOG_PATH, help="avatar catalog (default scripts/avatars.json)")
+    parser.add_argument("--dry-run", action="store_true", help="list the stale images and why, render nothing")
+    comfy_runner.add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        catalog = avatar_catalog.load(args.catalog)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 2
+    catalog_hash = avatar_catalog.digest(catalog)
+    targets = avatar_catalog.compile(catalog)
+    selected = {job.out_path for job in comfy_runner.select([t.job for t in targets], args.only)}
+    targets = [t for t in targets if t.job.out_path in selected]
+    cache = RenderCache(args.cache_dir)
+
+    todo, adopted = [], 0
+    for target in targets:
+        reasons = ["--force"] if args.force else avatar_catalog.stale(target)
+        if not reasons:
+            continue
+        # Rendered from this exact graph before (by any script): record it rather than render it again
+        if not args.force and reasons[0] != "missing" and cache.status(target.job.key, target.job.out_path) == "fresh":
+            if not args.dry_run:
+                avatar_catalog.write_provenance(target, catalog_hash, how="adopted")
+            adopted += 1
+            continue
+        todo.append(target)
+        print(f"  stale: {target.job.name}: {', '.join(reasons)}")
+    print(f"=== Catalog {catalog_hash[:12]}: {len(targets)} images, {len(targets) - len(todo) - adopted} up to date, "
+          f"{adopted} adopted from the render cache, {len(todo)} to build ===")
+    sys.stdout.flush()
+    if args.dry_run or not todo:
+        return 0
+
+    by_out = {t.job.out_path: t for t in todo}
+    recorded = set()
+
+    def on_done(job) -> None:
+        avatar_catalog.write_provenance(by_out[job.out_path], catalog_hash, job)
+        recorded.add(job.out_path)
+
+    failed = comfy_runner.run([t.job for t in todo], args, on_done)
+    # Images restored from the render cache never reach on_done
+    for target in todo:
+        job = replace(target.job, candidates=args.candidates)
+        if target.job.out_path not in recorded and cache.status(job.key, job.out_path) == "fresh":
+            avatar_catalog.write_provenance(target, catalog_hash, job, how="restored")
+            recorded.add(target.job.out_path)
+    print(f"=== Built {len(recorded)} of {len(todo)} stale images; provenance next to each image in {comfy_runner.DST} ===")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
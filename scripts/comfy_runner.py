@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+"""Shared asyncio job runner for the ComfyUI avatar generation scripts.
+
+Submission, status checks and downloads share one event loop and a pool of
+keep-alive HTTP connections, bounded by --max-in-flight, so hundreds of
+prompts can be queued without a slow response holding up the rest.
+Completion is event driven via comfy_ws.CompletionWatcher, and jobs whose
+exact workflow is already in the render cache (render_cache.py) are
+skipped or restored instead of re-rendered; --only/--force override that.
+Every submission is journaled (job_journal.py), so a rerun after a crash
+adopts prompts still queued on the server instead of queueing them again.
+Several --api backends can share one run; jobs go to the shortest queue.
+Jobs are grouped by loader signature (model, CLIP, VAE and LoRA settings)
+and kept on a backend that already has those weights loaded, so ComfyUI
+swaps multi-GB models as rarely as possible; the run reports the switches.
+Per-image timings go to a JSONL log (job_telemetry.py) and are summarized
+at the end of the run. With --qa each download is checked (image_qa.py)
+before it replaces the app's copy, and rejects are re-rendered with a
+new seed up to --qa-retries times.
+With --batch-poses all of an avatar's images go out as one prompt, so the
+model, CLIP, VAE and LoRA nodes load and patch once per avatar.
+--candidates N renders N variants per image in one latent batch and keeps
+the best-scoring one (image_qa.ImageQA.rank); all of them, with scores and
+a contact sheet, stay under the render cache's candidates/ folder.
+--preview gives a new avatar placeholder images first: a quick low-step,
+low-resolution pass over every missing image (base and home first) that
+completes before the full-quality renders start and replace them.
+--optimize refreshes the WebP/AVIF variants (asset_optimizer.py) at the end,
+in every root the jobs write to.
+
+Used as a library by build-avatars.py / batch-all-poses.py, or standalone with
+JSON-lines job definitions on stdin (one {"prompt", "seed", "prefix", "out"}
+object per line, optionally with "loaders" overrides for build_workflow)
+as the shell batch scripts do. Outputs go under --root (or a line's own
+"root"), laid out like the app's avatars: <root>/<avatar>.png for the
+base image and <root>/<avatar>/<pose>.png for the poses.
+"""
+
+import argparse, asyncio, fnmatch, functools, json, os, shutil, sys, tempfile, time, urllib.parse, uuid, zlib
+from collections import deque
+from dataclasses import dataclass, field, replace
+
+from comfy_ws import CompletionWatcher, history_images
+from http_pool import REQUEST_ERRORS, HTTPError, HTTPPool
+from image_qa import ImageQA, QAResult, contact_sheet, reference_paths, sibling_paths
+from job_journal import JOURNAL_PATH, JobJournal
+from job_telemetry import TELEMETRY_PATH, Telemetry
+from preflight import OBJECT_INFO_TTL, object_info, validate
+from render_cache import CACHE_DIR, RenderCache, cache_key
+
+COMFY_API = "http://10.0.0.239:4455"
+DST = "/Users/ralphyz/Tools/spelling_bee/spelling-bee/public/avatars"
+
+def build_workflow(prompt: str, seed: int, prefix: str, batch_size: int = 1, steps: int = 30, size: int = 512,
+                   loaders: dict | None = None) -> dict:
+    """The Flux + LoRA graph; `loaders` overrides loader inputs by node id, e.g. {"47": {"strength_model": 0.8}}."""
+    workflow = {
+        "prompt": {
+            "12": {"class_type": "UNETLoader", "inputs": {"unet_name": "flux1-dev.safetensors", "weight_dtype": "default"}},
+            "11": {"class_type": "DualCLIPLoader", "inputs": {"clip_name1": "flux/t5xxl_fp16.safetensors", "clip_name2": "flux/clip_l.safetensors", "type": "flux"}},
+            "10": {"class_type": "VAELoader", "inputs": {"vae_name": "flux/ae.safetensors"}},
+            "30": {"class_type": "ModelSamplingFlux", "inputs": {"model": ["12", 0], "max_shift": 1.15, "base_shift": 0.5, "width": size, "height": size}},
+            "47": {"class_type": "LoraLoader", "inputs": {"model": ["30", 0], "clip": ["11", 0], "lora_name": "flux/PixarPerfect_3D_Animation_Style_FLUX-000001.safetensors", "strength_model": 1.0, "strength_clip": 1.0}},
+            "6":  {"class_type": "CLIPTextEncode", "inputs": {"clip": ["47", 1], "text": prompt}},
+            "26": {"class_type": "FluxGuidance", "inputs": {"conditioning": ["6", 0], "guidance": 3.5}},
+            "25": {"class_type": "RandomNoise", "inputs": {"noise_seed": seed}},
+            "27": {"class_type": "EmptySD3LatentImage", "inputs": {"width": size, "height": size, "batch_size": batch_size}},
+            "16": {"class_type": "KSamplerSelect", "inputs": {"sampler_name": "euler"}},
+            "17": {"class_type": "BasicScheduler", "inputs": {"model": ["30", 0], "scheduler": "beta", "steps": steps, "denoise": 1.0}},
+            "22": {"class_type": "BasicGuider", "inputs": {"model": ["47", 0], "conditioning": ["26", 0]}},
+            "13": {"class_type": "SamplerCustomAdvanced", "inputs": {"noise": ["25", 0], "guider": ["22", 0], "sampler": ["16", 0], "sigmas": ["17", 0], "latent_image": ["27", 0]}},
+            "8":  {"class_type": "VAEDecode", "inputs": {"samples": ["13", 0], "vae": ["10", 0]}},
+            "9":  {"class_type": "SaveImage", "inputs": {"images": ["8", 0], "filename_prefix": prefix}},
+        }
+    }
+    for node, inputs in (loaders or {}).items():
+        workflow["prompt"][node]["inputs"].update(inputs)
+    return workflow
+
+
+# Nodes whose inputs decide which weights ComfyUI has loaded (and how the LoRA is patched in)
+LOADER_CLASSES = {"UNETLoader", "DualCLIPLoader", "CLIPLoader", "VAELoader", "CheckpointLoaderSimple",
+                  "LoraLoader", "LoraLoaderModelOnly"}
+
+def loader_signature(workflow: dict) -> str:
+    """Hash of the loader nodes' settings: consecutive graphs with the same signature run on
+    weights ComfyUI already has in memory, a different one makes it swap models."""
+    loaders = sorted(
+        [spec["class_type"], {k: v for k, v in spec["inputs"].items() if not isinstance(v, list)}]
+        for spec in workflow["prompt"].values() if spec.get("class_type") in LOADER_CLASSES)
+    return cache_key({"loaders": {str(i): spec for i, spec in enumerate(loaders)}})[:12]
+
+
+def count_switches(signatures: list[str]) -> int:
+    return sum(a != b for a, b in zip(signatures, signatures[1:]))
+
+
+# Loader, LoRA, sampler/scheduler and latent nodes: identical for every image of a batch
+SHARED_NODES = {"12", "11", "10", "30", "47", "16", "17", "27"}
+
+def branch_node(i: int, node: str) -> str:
+    """Id of build_workflow node `node` in the i-th branch of build_batch_workflow."""
+    return node if node in SHARED_NODES else str(100 * (i + 1) + int(node))
+
+
+def build_batch_workflow(images: list[tuple[str, int, str]], batch_size: int = 1, steps: int = 30, size: int = 512,
+                         loaders: dict | None = None) -> dict:
+    """One graph rendering several (prompt, seed, prefix) images. The shared nodes run
+    once; each image gets its own encode/noise/guider/sampler/decode/save branch,
+    wired exactly as build_workflow would, so its output matches a single render."""
+    graph = {}
+    for i, (prompt, seed, prefix) in enumerate(images):
+        for node, spec in build_workflow(prompt, seed, prefix, batch_size, steps, size, loaders)["prompt"].items():
+            inputs = {k: [branch_node(i, v[0]), v[1]] if isinstance(v, list) else v for k, v in spec["inputs"].items()}
+            graph.setdefault(branch_node(i, node), {**spec, "inputs": inputs})
+    return {"prompt": graph}
+
+
+@dataclass
+class Job:
+    label: str
+    prompt: str
+    seed: int
+    prefix: str
+    out_path: str
+    candidates: int = 1  # latent batch size; the best of them is kept (see pick_candidate)
+    steps: int = 30
+    size: int = 512
+    loaders: dict = field(default_factory=dict)  # build_workflow loader overrides
+    root: str = DST  # the avatar directory out_path is in; name is relative to it
+
+    def workflow(self) -> dict:
+        return build_workflow(self.prompt, self.seed, self.prefix, self.candidates, self.steps, self.size, self.loaders)
+
+    @property
+    def key(self) -> str:
+        return cache_key(self.workflow())
+
+    @property
+    def signature(self) -> str:
+        return loader_signature(self.workflow())
+
+    @property
+    def name(self) -> str:
+        """avatar/pose (base images are avatar/base); what --only matches against."""
+        rel = os.path.relpath(self.out_path, self.root)[:-len(".png")]
+        return rel if "/" in rel else f"{rel}/base"
+
+    def outputs(self) -> dict[str, "Job"]:
+        return {"9": self}
+
+
+@dataclass
+class Batch:
+    """Several jobs submitted as one prompt built by build_batch_workflow."""
+    jobs: list[Job]
+
+    @property
+    def label(self) -> str:
+        return f"{self.jobs[0].name.split('/')[0]} ({len(self.jobs)} images)"
+
+    @property
+    def seed(self) -> str:
+        return ",".join(dict.fromkeys(str(job.seed) for job in self.jobs))
+
+    def workflow(self) -> dict:
+        # The latent, scheduler and sampling nodes are shared, so the first job's settings apply to all
+        first = self.jobs[0]
+        return build_batch_workflow([(job.prompt, job.seed, job.prefix) for job in self.jobs],
+                                    first.candidates, first.steps, first.size, first.loaders)
+
+    @property
+    def signature(self) -> str:
+        return self.jobs[0].signature
+
+    def outputs(self) -> dict[str, Job]:
+        return {branch_node(i, "9"): job for i, job in enumerate(self.jobs)}
+
+
+def retry_seed(job: Job, attempt: int) -> int:
+    """Replacement seed for a QA retry. Deterministic, so a rerun tries the same ones, and
+    different per pose, so an avatar's retries don't all share one new seed."""
+    return (job.seed * 1_000_003 + zlib.crc32(job.name.encode()) + attempt * 7919) % (1 << 32)
+
+
+# --preview: quick placeholders for images that do not exist yet, these poses first
+PREVIEW_STEPS = 8
+PREVIEW_SIZE = 256
+PREVIEW_FIRST = ["base", "home"]
+
+def preview_jobs(jobs: list[Job], cache: RenderCache | None = None) -> list[Job]:
+    """Low-step, low-resolution renders of every job with no image on disk (or in the
+    render cache) yet, written to the same out_path; base and home images come first."""
+    missing = [job for job in jobs if not os.path.exists(job.out_path)
+               and (cache is None or cache.status(job.key, job.out_path) == "miss")]
+    missing.sort(key=lambda job: PREVIEW_FIRST.index(pose) if (pose := job.name.split("/")[1]) in PREVIEW_FIRST
+                 else len(PREVIEW_FIRST))
+    return [replace(job, label=f"{job.label} (preview)", prefix=f"{job.prefix}_preview", candidates=1,
+                    steps=PREVIEW_STEPS, size=PREVIEW_SIZE) for job in missing]
+
+
+def group_by_loaders(units: list[Job | Batch]) -> list[Job | Batch]:
+    """Stable reorder so units on the same weights are submitted back to back."""
+    first: dict[str, int] = {}
+    for i, unit in enumerate(units):
+        first.setdefault(unit.signature, i)
+    return sorted(units, key=lambda unit: first[unit.signature])
+
+
+def batch_by_avatar(jobs: list[Job]) -> list[Job | Batch]:
+    # A batch shares its loader nodes, so jobs on other weights get a batch of their own
+    groups: dict[tuple[str, str], list[Job]] = {}
+    for job in jobs:
+        groups.setdefault((job.name.split("/")[0], job.signature), []).append(job)
+    return [group[0] if len(group) == 1 else Batch(group) for group in groups.values()]
+
+# ─── ComfyUI client ──────────────────────────────────────────────────
+
+class ComfyClient:
+    def __init__(self, api: str = COMFY_API, max_in_flight: int = 8):
+        self.api = api.rstrip("/")
+        self.client_id = str(uuid.uuid4())
+        self.pool = HTTPPool(self.api, size=max_in_flight)
+
+    async def get_json(self, path: str):
+        status, _, data = await self.pool.request("GET", path)
+        if status != 200:
+            raise HTTPError(status, data)
+        return json.loads(data)
+
+    async def post_json(self, path: str, obj: dict):
+        status, _, data = await self.pool.request(
+            "POST", path, json.dumps(obj).encode(), {"Content-Type": "application/json"})
+        if status != 200:
+            raise HTTPError(status, data)
+        return json.loads(data)
+
+    async def submit(self, workflow: dict) -> str:
+        resp = await self.post_json("/prompt", {**workflow, "client_id": self.client_id})
+        return resp.get("prompt_id", "")
+
+    async def history(self, prompt_id: str) -> dict:
+        try:
+            return await self.get_json(f"/history/{prompt_id}")
+        except REQUEST_ERRORS:
+            return {}
+
+    async def queue_state(self) -> tuple[list[str], list[str]] | None:
+        """(running, pending) prompt ids in server order, or None if /queue is unreachable."""
+        try:
+            q = await self.get_json("/queue")
+        except REQUEST_ERRORS:
+            return None
+        return [item[1] for item in q.get("queue_running", [])], [item[1] for item in q.get("queue_pending", [])]
+
+    async def queued(self) -> set[str] | None:
+        """Prompt ids still pending or running on the server, or None if /queue is unreachable."""
+        state = await self.queue_state()
+        return None if state is None else {*state[0], *state[1]}
+
+    async def cancel(self, prompt_id: str) -> bool:
+        """Drop a prompt that has not started yet from the server queue. True only if it is
+        gone without having run, so it is safe to submit it somewhere else."""
+        try:
+            status, _, _ = await self.pool.request(
+                "POST", "/queue", json.dumps({"delete": [prompt_id]}).encode(), {"Content-Type": "application/json"})
+        except REQUEST_ERRORS:
+            return False
+        state = await self.queued() if status == 200 else None
+        if state is None or prompt_id in state:
+            return False
+        return not await self.history(prompt_id)
+
+    async def download(self, image: dict, out_path: str) -> None:
+        """Stream an output image from /view into a temp file beside `out_path`, fsync it,
+        then rename it into place so the app never serves a half-written PNG."""
+        query = urllib.parse.urlencode({
+            "filename": image["filename"], "subfolder": image.get("subfolder", ""), "type": image.get("type", "output")})
+        out_dir = os.path.dirname(out_path) or "."
+        os.makedirs(out_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(out_path)}.", suffix=".part", dir=out_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                status, _, body = await self.pool.request("GET", f"/view?{query}", sink=f.write)
+                if status != 200:
+                    raise HTTPError(status, body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, out_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        dir_fd = os.open(out_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+# ─── Runner ──────────────────────────────────────────────────────────
+
+async def adoptable(client: ComfyClient, units: list[Job | Batch], journal: JobJournal) -> list[tuple[Job | Batch, str]]:
+    """Jobs (or batches) a previous run already submitted to this server, as one prompt,
+    that are still queued there or already rendered, paired with their prompt_id."""
+    latest = journal.latest()
+    candidates = []
+    for unit in units:
+        recs = [latest.get((job.key, job.out_path)) for job in unit.outputs().values()]
+        rec = recs[0]
+        if (rec and rec["state"] == "submitted" and rec.get("api") == client.api
+                and all(r and r["state"] == "submitted" and r["prompt_id"] == rec["prompt_id"] for r in recs)):
+            candidates.append((unit, rec))
+    if not candidates:
+        return []
+    queued = await client.queued()
+    if queued is None:
+        return []
+    adopted = []
+    for unit, rec in candidates:
+        pid = rec["prompt_id"]
+        if pid in queued:
+            adopted.append((unit, rec))
+            continue
+        history = await client.history(pid)
+        if all(history_images(history, pid, node) for node in unit.outputs()):
+            adopted.append((unit, rec))
+    if adopted:
+        # ComfyUI only sends events to the submitting client id, so listen as that run
+        ids = [rec["client_id"] for _, rec in adopted]
+        client.client_id = max(set(ids), key=ids.count)
+    return [(unit, rec["prompt_id"]) for unit, rec in adopted]
+
+
+class Node:
+    """One ComfyUI backend in the pool: its client, completion watcher and counters."""
+
+    def __init__(self, api: str, max_in_flight: int):
+        self.client = ComfyClient(api, max_in_flight)
+        self.watcher: CompletionWatcher | None = None
+        self.depth = 0                # everything queued or running there, ours or not
+        self.waiting: list[str] = []  # our prompt ids that have not started there yet
+        self.misses = 0               # consecutive failed /queue checks
+        self.images = 0
+        self.moved_away = 0
+        self.last_image = 0.0
+        self.loaded: str | None = None  # loader signature of the last prompt we queued there
+        self.switches = 0
+        self.info: dict | None = None   # /object_info snapshot, when preflight checks are on
+
+    def accepts(self, unit: "Job | Batch") -> bool:
+        """False if preflight found something in the unit's graph this server lacks."""
+        return self.info is None or not validate(unit.workflow(), self.info)
+
+    @property
+    def api(self) -> str:
+        return self.client.api
+
+    @property
+    def up(self) -> bool:
+        return self.misses < 2
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.watcher.jobs)
+
+    async def refresh(self) -> None:
+        state = await self.client.queue_state()
+        if state is None:
+            self.misses += 1
+            return
+        running, pending = state
+        self.misses = 0
+        self.depth = len(running) + len(pending)
+        self.waiting = [pid for pid in pending if pid in self.watcher.jobs]
+
+    def take_back(self, prompt_id: str) -> Job | Batch | None:
+        """Stop tracking a prompt here; returns what is left of it to submit elsewhere."""
+        unit = self.watcher.jobs.get(prompt_id)
+        jobs = self.watcher.forget(prompt_id)
+        if not jobs:
+            return None
+        self.moved_away += 1
+        if len(jobs) == len(unit.outputs()):
+            return unit
+        return jobs[0] if len(jobs) == 1 else Batch(jobs)
+
+
+def restore_cached(jobs: list[Job], cache: RenderCache | None, force: bool) -> list[Job]:
+    """Restore what the render cache already has; return the jobs that still need rendering."""
+    todo, fresh, restored = [], 0, 0
+    for job in jobs:
+        state = "miss" if cache is None or force else cache.status(job.key, job.out_path)
+        if state == "fresh":
+            fresh += 1
+        elif state == "cached":
+            cache.restore(job.key, job.out_path)
+            restored += 1
+            print(f"  Restored from cache: {job.label}")
+        else:
+            todo.append(job)
+    if cache is not None:
+        print(f"=== Cache: {fresh} up to date, {restored} restored, {len(todo)} to render ===")
+    return todo
+
+
+def pick_candidate(scorer: ImageQA, paths: list[str], out_path: str, staged: str) -> QAResult:
+    """Rank a latent batch's candidates for `out_path`, copy the best to `staged` and leave
+    scores.json and contact-sheet.png next to the candidates for review."""
+    results = scorer.rank(paths, sibling_paths(out_path), reference_paths(out_path))
+    best = max(range(len(paths)), key=lambda i: results[i].score)
+    os.makedirs(os.path.dirname(staged), exist_ok=True)
+    shutil.copyfile(paths[best], staged)
+    review = os.path.dirname(paths[0])
+    with open(os.path.join(review, "scores.json"), "w") as f:
+        json.dump({"out_path": out_path, "kept": os.path.basename(paths[best]), "candidates": [
+            {"file": os.path.basename(p), "score": round(r.score, 4), "ok": r.ok, "reasons": r.reasons,
+             "metrics": {k: round(v, 4) if isinstance(v, float) else v for k, v in r.metrics.items()}}
+            for p, r in zip(paths, results)]}, f, indent=2)
+    contact_sheet(paths, results, best, os.path.join(review, "contact-sheet.png"))
+    results[best].metrics["candidate"] = best
+    return results[best]
+
+
+async def run_jobs(jobs: list[Job], apis: list[str] | None = None, max_in_flight: int = 8, poll: bool = False,
+                   cache: RenderCache | None = None, force: bool = False, journal: JobJournal | None = None,
+                   node_depth: int = 3, poll_interval: float = 10.0, batch_poses: bool = False,
+                   telemetry: Telemetry | None = None, qa: ImageQA | None = None, qa_retries: int = 2,
+                   scorer: ImageQA | None = None, preflight: bool = True, object_info_ttl: float = OBJECT_INFO_TTL,
+                   on_done=None) -> int:
+    """Render every job whose output is not already up to date. Returns the number that failed.
+
+    Jobs are handed out one at a time to whichever live node has the shortest server
+    queue, keeping at most `node_depth` of ours queued on each, so the rest stay
+    movable. A node that stops answering /queue gets its unfinished jobs taken back,
+    and an idle node takes over jobs still waiting behind a slower one. A job that
+    no node still up can run fails rather than waiting for one to come back. With
+    `batch_poses`, each avatar's jobs are handed out together as a single Batch.
+    With `qa`, images that fail the check never reach their out_path; they are
+    set aside and re-rendered with another seed, at most `qa_retries` times.
+    Jobs with several `candidates` keep the best one by `scorer` (default: `qa`);
+    all of them stay in the cache's candidates/ folder with a contact sheet.
+    With `preflight`, every graph is first checked against each node's /object_info
+    (cached for `object_info_ttl` s): jobs no node can run fail before anything is
+    queued, and the others only go to nodes that have what they need.
+    `on_done(job)` is called for every image that reaches its out_path (after a QA
+    retry, with the job that rendered it).
+    """
+    todo = restore_cached(jobs, cache, force)
+    if not todo:
+        return 0
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    changed = asyncio.Event()
+    nodes = [Node(api, max_in_flight) for api in apis or [COMFY_API]]
+    total, queued, completed, failed = len(todo), 0, 0, 0
+    qa_attempts: dict[str, int] = {}  # out_path -> QA rejections so far
+    rejects_dir = os.path.join(cache.root if cache is not None else CACHE_DIR, "qa-rejected")
+    review_dir = os.path.join(cache.root if cache is not None else CACHE_DIR, "candidates")
+    scorer = scorer or qa or (ImageQA() if any(job.candidates > 1 for job in todo) else None)
+    where = (lambda node: f" [{node.api}]") if len(nodes) > 1 else (lambda node: "")
+
+    def image_failed(pid: str, job: Job, error: str) -> None:
+        nonlocal failed
+        failed += 1
+        if journal is not None:
+            journal.record(job.key, job.out_path, "failed", prompt_id=pid, error=error)
+        if telemetry is not None:
+            telemetry.record(pid, job, "failed", error=error)
+        changed.set()
+
+    async def on_image(node: Node, pid: str, job: Job, images: list[dict]) -> None:
+        # Whatever goes wrong with one image (a full disk, a failing on_done hook) fails that
+        # image here; left to the watcher, it would never be counted and the run would not end
+        try:
+            await deliver(node, pid, job, images)
+        except Exception as e:
+            image_failed(pid, job, str(e))
+            print(f"  FAILED: {job.label} ({type(e).__name__}: {e})")
+            sys.stdout.flush()
+
+    async def deliver(node: Node, pid: str, job: Job, images: list[dict]) -> None:
+        nonlocal completed
+        noticed = time.time()
+        # Behind the QA gate (or a candidate pick), out_path is only replaced once an image is chosen
+        target = job.out_path
+        if qa is not None or len(images) > 1:
+            target = os.path.join(os.path.dirname(job.out_path), f".{os.path.basename(job.out_path)}.qa")
+        review = os.path.join(review_dir, *job.name.split("/"), str(job.seed))
+        candidates = [os.path.join(review, f"candidate-{i}.png") for i in range(len(images))]
+        try:
+            if len(images) > 1:
+                await asyncio.gather(*(node.client.download(image, path) for image, path in zip(images, candidates)))
+            else:
+                await node.client.download(images[0], target)
+        except Exception as e:
+            image_failed(pid, job, str(e))
+            print(f"  download FAILED: {job.label} ({e})")
+            return
+        downloaded = time.time()
+        picked = ""
+        if len(images) > 1:
+            try:
+                result = await loop.run_in_executor(None, pick_candidate, scorer, candidates, job.out_path, target)
+            except Exception as e:
+                image_failed(pid, job, str(e))
+                print(f"  FAILED to pick a candidate: {job.label} ({e}); candidates are in {review}")
+                return
+            picked = f" (candidate {result.metrics['candidate']} of {len(images)}, score {result.score:.2f})"
+        elif qa is not None:
+            try:
+                result = await loop.run_in_executor(None, qa.check, target, sibling_paths(job.out_path))
+            except Exception as e:
+                result = QAResult(False, [f"unreadable image ({e})"])
+        if qa is not None and not result.ok:
+            reject(pid, job, target, result.reasons)
+            return
+        if target != job.out_path:
+            os.replace(target, job.out_path)
+        if cache is not None:
+            cache.store(job.key, job.out_path, label=job.label, prompt=job.prompt, seed=job.seed, out_path=job.out_path)
+        if on_done is not None:
+            on_done(job)
+        if journal is not None:
+            journal.record(job.key, job.out_path, "done", prompt_id=pid)
+        if telemetry is not None:
+            # Without server timestamps, the image showing up is when its branch finished
+            ended = telemetry.prompts.get(pid, {}).get("exec_end", noticed)
+            checked = {"qa_end": time.time()} if target != job.out_path else {}
+            telemetry.record(pid, job, "done", exec_end=ended, download_start=noticed, download_end=downloaded, **checked)
+        node.images += 1
+        node.last_image = loop.time()
+        completed += 1
+        changed.set()
+        print(f"  OK [{completed}/{total}]: {job.label}{picked}{where(node)}")
+        sys.stdout.flush()
+
+    def reject(pid: str, job: Job, staged: str, reasons: list[str]) -> None:
+        nonlocal failed
+        attempt = qa_attempts[job.out_path] = qa_attempts.get(job.out_path, 0) + 1
+        os.makedirs(rejects_dir, exist_ok=True)
+        shutil.move(staged, os.path.join(rejects_dir, f"{job.name.replace('/', '_')}-{job.seed}.png"))
+        if journal is not None:
+            journal.record(job.key, job.out_path, "rejected", prompt_id=pid, reasons=reasons)
+        if telemetry is not None:
+            telemetry.record(pid, job, "rejected", reasons=reasons)
+        if attempt <= qa_retries:
+            retry = replace(job, seed=retry_seed(job, attempt))
+            pending.append(retry)
+            print(f"  QA REJECTED: {job.label}: {'; '.join(reasons)} -> retry {attempt}/{qa_retries} (seed={retry.seed})")
+        else:
+            failed += 1
+            print(f"  QA FAILED: {job.label}: {'; '.join(reasons)} (out of retries, kept the old image)")
+        changed.set()
+        sys.stdout.flush()
+
+    def on_error(node: Node, pid: str, jobs: list[Job], error: dict) -> None:
+        nonlocal failed
+        failed += len(jobs)
+        changed.set()
+        message = error.get("exception_message", "execution failed")
+        for job in jobs:
+            if journal is not None:
+                journal.record(job.key, job.out_path, "failed", prompt_id=pid, error=message)
+            if telemetry is not None:
+                telemetry.record(pid, job, "failed", error=message)
+            print(f"  ERROR: {job.label}: {message}")
+        sys.stdout.flush()
+
+    async def submit(node: Node, unit: Job | Batch) -> bool:
+        """False if the node could not be reached and the job should go elsewhere."""
+        nonlocal queued, failed
+        sent = time.time()
+        workflow = unit.workflow()
+        try:
+            pid = await node.client.submit(workflow)
+        except (HTTPError, ValueError) as e:
+            pid, reason = "", f" ({e})"
+        except REQUEST_ERRORS:
+            node.misses = 2
+            return False
+        else:
+            reason = ""
+        if not pid:
+            # The server rejected the graph itself; another node would too
+            failed += len(unit.outputs())
+            print(f"  FAILED to queue: {unit.label}{reason}")
+            return True
+        if journal is not None:
+            for job in unit.outputs().values():
+                journal.record(job.key, job.out_path, "submitted", prompt_id=pid, api=node.api, client_id=node.client.client_id)
+        if telemetry is not None:
+            telemetry.mark(pid, "submit", sent, api=node.api)
+            telemetry.mark(pid, "queued")
+        node.watcher.watch(pid, unit)
+        node.depth += 1
+        signature = loader_signature(workflow)
+        if node.loaded not in (None, signature):
+            node.switches += 1
+        node.loaded = signature
+        queued += 1
+        print(f"  [{queued}] Queued: {unit.label} (seed={unit.seed}){where(node)}")
+        sys.stdout.flush()
+        return True
+
+    units = batch_by_avatar(todo) if batch_poses else todo
+    as_given = count_switches([unit.signature for unit in units])
+    pending = deque(group_by_loaders(units))
+    configurations = len({unit.signature for unit in units})
+    for node in nodes:
+        node.watcher = CompletionWatcher(node.client, functools.partial(on_image, node), functools.partial(on_error, node),
+                                         poll_interval=poll_interval, use_ws=not poll,
+                                         on_progress=telemetry.observe if telemetry is not None else None)
+        # Adopt before the watcher connects: it has to listen under the old client id
+        if journal is not None:
+            for unit, pid in await adoptable(node.client, list(pending), journal):
+                node.watcher.watch(pid, unit)
+                node.loaded = unit.signature
+                pending.remove(unit)
+                if telemetry is not None:
+                    telemetry.mark(pid, api=node.api)
+                print(f"  Adopted from previous run: {unit.label} ({pid}){where(node)}")
+
+    # Preflight: catch missing models/LoRAs, unknown nodes and bad values before the GPU sees them
+    if preflight and pending:
+        snapshots = cache.root if cache is not None else CACHE_DIR
+        for node in nodes:
+            node.info = await object_info(node.client, snapshots, object_info_ttl)
+            if node.info is not None and not all(node.accepts(unit) for unit in pending):
+                # The snapshot may predate a model that was just installed
+                node.info = await object_info(node.client, snapshots, refresh=True) or node.info
+            elif node.info is None:
+                print(f"  ... {node.api} has no /object_info; its graphs are not checked")
+        problems: dict[str, int] = {}
+        for unit in list(pending):
+            if all(node.info is not None and not node.accepts(unit) for node in nodes):
+                pending.remove(unit)
+                failed += len(unit.outputs())
+                for problem in validate(unit.workflow(), nodes[0].info):
+                    problems[problem] = problems.get(problem, 0) + 1
+                for job in unit.outputs().values():
+                    if journal is not None:
+                        journal.record(job.key, job.out_path, "failed", error="preflight")
+        for node in nodes:
+            if node.info is not None and (refused := sum(not node.accepts(unit) for unit in pending)):
+                print(f"  ... {node.api} lacks something {refused} jobs need; they go to the other nodes")
+        if problems:
+            print(f"=== Preflight: {failed} images cannot render on any node ===")
+            for problem, count in sorted(problems.items(), key=lambda item: -item[1])[:10]:
+                print(f"  {problem}  ({count} jobs)")
+        sys.stdout.flush()
+    watching = [asyncio.create_task(node.watcher.run()) for node in nodes]
+
+    print(f"=== Scheduling {len(pending)} {'avatar batches' if batch_poses else 'image generation jobs'} on {len(nodes)} node(s), "
+          f"waiting for completion {'by polling' if poll else 'events'} ===")
+    sys.stdout.flush()
+    while completed + failed < total:
+        await asyncio.gather(*(node.refresh() for node in nodes))
+        for node in nodes:
+            if not node.up and node.outstanding:
+                moved = [node.take_back(pid) for pid in list(node.watcher.jobs)]
+                pending.extendleft(reversed(moved))
+                print(f"  ... {node.api} is not answering; moved {len(moved)} jobs back to the queue")
+        live = [node for node in nodes if node.up]
+
+        # Jobs only a node that went down could run would wait for it forever
+        if live:
+            for unit in [unit for unit in pending if not any(node.accepts(unit) for node in live)]:
+                pending.remove(unit)
+                failed += len(unit.outputs())
+                for job in unit.outputs().values():
+                    if journal is not None:
+                        journal.record(job.key, job.out_path, "failed", error="no live node can run it")
+                print(f"  FAILED: {unit.label}: no node that is still up can run it")
+
+        # The shortest server queue gets the next job: the first one in line that some node with
+        # room accepts, so a job waiting for one particular node does not hold up the rest
+        while True:
+            free = [node for node in live if node.outstanding < node_depth]
+            unit = next((unit for unit in pending if any(node.accepts(unit) for node in free)), None)
+            if unit is None:
+                break
+            # Prefer a node already on this job's weights, but an idle GPU beats saving a model swap
+            signature = unit.signature
+            node = min((node for node in free if node.accepts(unit)),
+                       key=lambda n: (n.depth > 0 and n.loaded not in (None, signature), n.depth, n.outstanding))
+            pending.remove(unit)
+            if not await submit(node, unit):
+                pending.appendleft(unit)
+                live.remove(node)
+
+        # Nothing left to hand out: idle nodes take over work stuck behind a slower one
+        if not pending:
+            for idle in [node for node in live if node.depth == 0]:
+                victim = max((n for n in live if n is not idle and n.waiting), key=lambda n: len(n.waiting), default=None)
+                if victim is None:
+                    break
+                pid = victim.waiting.pop()
+                unit = victim.watcher.jobs.get(pid)
+                if unit is None:
+                    continue  # finished or failed since the refresh
+                if idle.accepts(unit) and await victim.client.cancel(pid) and (unit := victim.take_back(pid)):
+                    victim.depth -= 1
+                    print(f"  Moved {unit.label} from {victim.api} to {idle.api}")
+                    if not await submit(idle, unit):
+                        pending.append(unit)
+
+        if completed + failed >= total:
+            break
+        changed.clear()
+        try:
+            await asyncio.wait_for(changed.wait(), poll_interval * 3)
+        except asyncio.TimeoutError:
+            pass
+
+    for node in nodes:
+        node.watcher.close()
+    await asyncio.gather(*watching)
+    for node in nodes:
+        await node.client.close()
+    if journal is not None:
+        journal.close()
+    requests = sum(node.client.pool.requests for node in nodes)
+    connections = sum(node.client.pool.connections_opened for node in nodes)
+    print(f"\n=== COMPLETE: {completed}/{total} images generated "
+          f"({requests} HTTP requests over {connections} connections) ===")
+    if len(nodes) > 1:
+        print("=== Per-node throughput ===")
+        for node in nodes:
+            span = node.last_image - started
+            rate = node.images / span * 60 if node.images and span > 0 else 0.0
+            print(f"  {node.api:<32} {node.images:>4} images  {rate:6.1f}/min  {node.moved_away} moved away  "
+                  f"{node.switches} model switches")
+    if configurations > 1:
+        print(f"=== Loaders: {configurations} model/LoRA configurations, {sum(node.switches for node in nodes)} model switches "
+              f"on our queues ({as_given} in the order given) ===")
+    if qa_attempts:
+        print(f"=== QA: {sum(qa_attempts.values())} renders rejected for {len(qa_attempts)} images "
+              f"(set aside in {rejects_dir}) ===")
+    if telemetry is not None:
+        telemetry.close()
+        for line in telemetry.summary():
+            print(line)
+        print(f"=== Per-image timings: {telemetry.path} (run {telemetry.run}) ===")
+    return total - completed
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--api", action="append", metavar="URL",
+                        help=f"ComfyUI base URL; repeat or comma-separate to spread jobs over several GPUs (default {COMFY_API})")
+    parser.add_argument("--node-depth", type=int, default=3, help="jobs of ours kept queued on each node at once (default 3)")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="concurrent HTTP requests / downloads (default 8)")
+    parser.add_argument("--poll", action="store_true", help="poll /history every 10 s instead of listening on the ComfyUI websocket")
+    parser.add_argument("--batch-poses", action="store_true",
+                        help="submit each avatar's images as one prompt so the models and LoRA load once per avatar")
+    parser.add_argument("--only", action="append", metavar="AVATAR[/POSE]",
+                        help="only these jobs, e.g. avocado or avocado/home or 'chess-*/base' (repeatable)")
+    parser.add_argument("--force", action="store_true", help="re-render even if the render cache has this exact workflow")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="render cache location (default scripts/.render-cache)")
+    parser.add_argument("--qa", action="store_true",
+                        help="check each image (white background, coverage, histogram, near-copies) before it is kept; needs numpy and Pillow")
+    parser.add_argument("--qa-retries", type=int, default=2, help="re-renders with a new seed for an image that fails --qa (default 2)")
+    parser.add_argument("--candidates", type=int, default=1, metavar="N",
+                        help="render N variants of each image in one latent batch and keep the best-scoring one; "
+                             "the rest go to <cache-dir>/candidates with a contact sheet (needs numpy and Pillow)")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"first write quick {PREVIEW_SIZE} px, {PREVIEW_STEPS}-step placeholders for images that do not exist yet "
+                             "(base and home first), then run the full renders over them")
+    parser.add_argument("--no-preflight", dest="preflight", action="store_false",
+                        help="skip checking the graphs against each server's /object_info before queueing")
+    parser.add_argument("--object-info-ttl", type=float, default=OBJECT_INFO_TTL,
+                        help=f"seconds a cached /object_info snapshot stays valid (default {OBJECT_INFO_TTL:.0f})")
+    parser.add_argument("--telemetry", default=TELEMETRY_PATH,
+                        help="per-image timing log, JSONL (default scripts/.render-cache/telemetry.jsonl)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="afterwards, refresh the WebP/AVIF avatar variants (asset_optimizer.py; needs Pillow)")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="job journal used to resume interrupted runs (default scripts/.render-cache/journal.jsonl)")
+
+
+def select(jobs: list[Job], patterns: list[str] | None) -> list[Job]:
+    if not patterns:
+        return jobs
+    return [j for j in jobs if any(fnmatch.fnmatch(j.name, p) or fnmatch.fnmatch(j.name, f"{p}/*") for p in patterns)]
+
+
+def run(jobs: list[Job], args: argparse.Namespace, on_done=None) -> int:
+    """Render `jobs` as the add_arguments() options say; the number that failed."""
+    jobs = [replace(job, candidates=args.candidates) for job in select(jobs, args.only)]
+    try:
+        scorer = ImageQA() if args.qa or args.candidates > 1 else None
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    cache, journal = RenderCache(args.cache_dir), JobJournal(args.journal)
+    try:
+        apis = [api for value in args.api or [COMFY_API] for api in value.split(",") if api]
+        if args.preview and (previews := preview_jobs(jobs, None if args.force else cache)):
+            # Every preview finishes before the first full render is queued anywhere
+            print(f"=== Preview pass: {len(previews)} placeholder images ({PREVIEW_SIZE} px, {PREVIEW_STEPS} steps) ===")
+            missed = asyncio.run(run_jobs(previews, apis, max_in_flight=args.max_in_flight, poll=args.poll, cache=cache,
+                                          journal=journal, node_depth=args.node_depth, telemetry=Telemetry(args.telemetry),
+                                          preflight=args.preflight, object_info_ttl=args.object_info_ttl))
+            print(f"=== Refine pass: full renders replace the previews{f' ({missed} previews failed)' if missed else ''} ===\n")
+        failed = asyncio.run(run_jobs(jobs, apis, max_in_flight=args.max_in_flight, poll=args.poll,
+                                      cache=cache, force=args.force, journal=journal,
+                                      node_depth=args.node_depth, batch_poses=args.batch_poses,
+                                      telemetry=Telemetry(args.telemetry), qa=scorer if args.qa else None,
+                                      qa_retries=args.qa_retries, scorer=scorer, preflight=args.preflight,
+                                      object_info_ttl=args.object_info_ttl, on_done=on_done))
+    except KeyboardInterrupt:
+        print("\n=== Interrupted. Submitted jobs are journaled; rerun to pick them up. ===")
+        sys.exit(130)
+    if args.optimize:
+        import asset_optimizer  # imports this module, so not at the top
+        for root in sorted({job.root for job in jobs}):
+            failed += asset_optimizer.optimize(root)
+    return failed
+
+
+def main(jobs: list[Job], args: argparse.Namespace) -> None:
+    sys.exit(1 if run(jobs, args) else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--root", default=DST,
+                        help="directory the jobs' \"out\" paths are under; avatar names (--only) are relative to it (default: the app's public/avatars)")
+    args = parser.parse_args()
+    jobs = []
+    for line in sys.stdin:
+        if line.strip():
+            d = json.loads(line)
+            label = d.get("label") or d["prefix"]
+            job = Job(label, d["prompt"], int(d["seed"]), d["prefix"], d["out"], loaders=d.get("loaders", {}),
+                      root=d.get("root", args.root))
+            if job.name.startswith("../") or os.path.isabs(job.name):
+                print(f"ERROR: {job.label}: {job.out_path} is not under {job.root}; pass --root or a \"root\" per job")
+                sys.exit(2)
+            jobs.append(job)
+    main(jobs, args)
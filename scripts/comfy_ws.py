@@ -0,0 +1,318 @@
+"""Event-driven ComfyUI job completion over the /ws progress socket.
+Downloads each output as soon as its SaveImage node reports "executed",
+and falls back to /history polling whenever the socket is unavailable.
+"""
+
+import asyncio, base64, hashlib, json, os, struct, urllib.parse
+from typing import Awaitable, Callable
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# ─── Minimal RFC 6455 client (stdlib only) ───────────────────────────
+
+class WebSocket:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, opcode: int, payload: bytes = b"") -> None:
+        # Client frames must always be masked
+        mask = os.urandom(4)
+        head = bytes([0x80 | opcode])
+        n = len(payload)
+        if n < 126:
+            head += bytes([0x80 | n])
+        elif n < 1 << 16:
+            head += bytes([0x80 | 126]) + struct.pack("!H", n)
+        else:
+            head += bytes([0x80 | 127]) + struct.pack("!Q", n)
+        body = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(head + mask + body)
+        await self.writer.drain()
+
+    async def recv(self) -> str | bytes | None:
+        """Next text (str) or binary (bytes) message, or None once the socket is closed."""
+        message, msg_op = bytearray(), 0
+        try:
+            while True:
+                b0, b1 = await self.reader.readexactly(2)
+                fin, op, n = b0 & 0x80, b0 & 0x0F, b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack("!H", await self.reader.readexactly(2))[0]
+                elif n == 127:
+                    n = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+                mask = await self.reader.readexactly(4) if b1 & 0x80 else None
+                payload = await self.reader.readexactly(n)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                if op == 0x8:  # close
+                    await self.send(0x8, payload[:2])
+                    return None
+                if op == 0x9:  # ping
+                    await self.send(0xA, payload)
+                    continue
+                if op == 0xA:  # pong
+                    continue
+                if op:
+                    message, msg_op = bytearray(), op
+                message += payload
+                if fin:
+                    return message.decode() if msg_op == 0x1 else bytes(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    async def close(self) -> None:
+        try:
+            await self.send(0x8, struct.pack("!H", 1000))
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+
+
+async def ws_connect(url: str, timeout: float = 10.0) -> WebSocket:
+    u = urllib.parse.urlsplit(url)
+    secure = u.scheme == "wss"
+    port = u.port or (443 if secure else 80)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(u.hostname, port, ssl=secure or None), timeout)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = u.path + (f"?{u.query}" if u.query else "")
+    writer.write((
+        f"GET {path} HTTP/1.1\r\nHost: {u.hostname}:{port}\r\n"
+        "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+    ).encode())
+    await writer.drain()
+    head = (await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)).decode("latin-1")
+    lines = head.split("\r\n")
+    headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+    expected = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+    if " 101 " not in lines[0] + " " or headers.get("sec-websocket-accept") != expected:
+        writer.close()
+        raise ConnectionError(f"websocket handshake failed: {lines[0]}")
+    return WebSocket(reader, writer)
+
+
+def ws_url(api: str, client_id: str) -> str:
+    u = urllib.parse.urlsplit(api)
+    scheme = "wss" if u.scheme == "https" else "ws"
+    return f"{scheme}://{u.netloc}/ws?clientId={urllib.parse.quote(client_id)}"
+
+# ─── Completion engine ───────────────────────────────────────────────
+
+def history_images(history: dict, prompt_id: str, node: str) -> list:
+    return history.get(prompt_id, {}).get("outputs", {}).get(node, {}).get("images", [])
+
+
+class CompletionWatcher:
+    """Tracks submitted prompts until each of their output images has been handled.
+
+    `client` needs `api`, `client_id`, `history(prompt_id)` and `queued()`
+    (see comfy_runner.ComfyClient). Jobs are added with `watch()` while `run()`
+    is going; `close()` says no more will come, and `run()` returns once every
+    watched job and every `on_image(prompt_id, job, images)` call has finished.
+    A job with an `outputs()` method ({save node id: sub-job}) gets one
+    on_image call per save node, with every image that node saved (more
+    than one for a latent batch); any other job just waits for `node`.
+    `on_progress(prompt_id, kind, data)`, if given, sees "execution_start" and
+    "execution_success" events (the latter also for "executing" with node
+    null, which carries no timestamp) and every /history entry fetched (kind
+    "history").
+    """
+
+    def __init__(
+        self,
+        client,
+        on_image: Callable[[str, object, list[dict]], Awaitable[None]],
+        on_error: Callable[[str, list, dict], None] | None = None,
+        node: str = "9",
+        poll_interval: float = 10.0,
+        use_ws: bool = True,
+        on_progress: Callable[[str, str, dict], None] | None = None,
+    ):
+        self.client = client
+        self.on_image = on_image
+        self.on_error = on_error
+        self.node = node
+        self.poll_interval = poll_interval
+        self.use_ws = use_ws
+        self.on_progress = on_progress
+        self.jobs: dict[str, object] = {}
+        self.outputs: dict[str, dict[str, object]] = {}  # save nodes still to come, per prompt
+        self.tasks: set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+        self._early: dict[str, dict[str, list]] = {}  # events that beat watch() for their prompt
+        self._early_errors: dict[str, dict] = {}
+        self._closing = False
+        self._wake = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._closing and not self.jobs and not self.tasks
+
+    def watch(self, prompt_id: str, job) -> None:
+        outputs = dict(job.outputs()) if hasattr(job, "outputs") else {self.node: job}
+        if prompt_id in self._early_errors:
+            if self.on_error:
+                self.on_error(prompt_id, list(outputs.values()), self._early_errors.pop(prompt_id))
+            return
+        self.jobs[prompt_id] = job
+        self.outputs[prompt_id] = outputs
+        if prompt_id in self._early:
+            for node, images in self._early.pop(prompt_id).items():
+                self._finish(prompt_id, node, images)
+            if prompt_id in self.jobs:
+                self._spawn(self.sweep([prompt_id]))
+
+    def forget(self, prompt_id: str) -> list:
+        """Stop watching a prompt; returns the sub-jobs it had not delivered yet."""
+        self.jobs.pop(prompt_id, None)
+        return list(self.outputs.pop(prompt_id, {}).values())
+
+    def close(self) -> None:
+        self._closing = True
+        self._wake.set()
+
+    def _spawn(self, coro: Awaitable, counted: bool = False) -> None:
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(lambda t: self._task_done(t, counted))
+
+    def _task_done(self, task: asyncio.Task, counted: bool) -> None:
+        self.tasks.discard(task)
+        if task.cancelled():
+            pass
+        elif task.exception():
+            self.failed += 1
+            print(f"  download failed: {task.exception()}")
+        elif counted:
+            self.completed += 1
+        self._wake.set()
+
+    def _finish(self, prompt_id: str, node: str, images: list) -> None:
+        outputs = self.outputs.get(prompt_id)
+        job = outputs.pop(node, None) if outputs is not None else None
+        if job is None:
+            return
+        if not outputs:
+            self.forget(prompt_id)
+        self._spawn(self.on_image(prompt_id, job, images), counted=True)
+
+    def _fail(self, prompt_id: str, error: dict) -> None:
+        jobs = self.forget(prompt_id)
+        if self.on_error:
+            self.on_error(prompt_id, jobs, error)
+        self._wake.set()
+
+    async def sweep(self, prompt_ids: list[str]) -> None:
+        # One /queue call tells us which jobs are still busy; only finished ones need /history
+        queued = await self.client.queued() if len(prompt_ids) > 1 else None
+        for pid in prompt_ids:
+            if pid not in self.jobs or (queued is not None and pid in queued):
+                continue
+            history = await self.client.history(pid)
+            if self.on_progress and pid in history:
+                self.on_progress(pid, "history", history[pid])
+            for node in list(self.outputs.get(pid, ())):
+                images = history_images(history, pid, node)
+                if images:
+                    self._finish(pid, node, images)
+            # A failed prompt never produces its outputs; don't wait for them forever
+            status = history.get(pid, {}).get("status") or {}
+            if pid in self.jobs and (status.get("status_str") == "error" or status.get("completed")):
+                error = next((info for name, info in status.get("messages", [])
+                              if name in ("execution_error", "execution_interrupted")), None)
+                if error is None:
+                    error = {"exception_message": "finished without output for save node(s) " + ", ".join(self.outputs[pid])}
+                self._fail(pid, error)
+
+    async def _idle(self, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.finished and loop.time() < deadline:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> int:
+        announced = False
+        while not self.finished:
+            ws = None
+            if self.use_ws:
+                try:
+                    ws = await ws_connect(ws_url(self.client.api, self.client.client_id))
+                    announced = False
+                except (OSError, asyncio.TimeoutError) as e:
+                    if not announced:
+                        print(f"  ... websocket unavailable ({e}), polling history")
+                        announced = True
+            if ws is None:
+                await self.sweep(list(self.jobs))
+                await self._idle(self.poll_interval)
+                continue
+            try:
+                await self._listen(ws)
+            finally:
+                await ws.close()
+        return self.completed
+
+    async def _listen(self, ws: WebSocket) -> None:
+        # Anything that finished before we were listening only shows up in history
+        await self.sweep(list(self.jobs))
+        recv = asyncio.ensure_future(ws.recv())
+        try:
+            while not self.finished:
+                self._wake.clear()
+                wake = asyncio.ensure_future(self._wake.wait())
+                done, _ = await asyncio.wait(
+                    {recv, wake}, timeout=self.poll_interval * 6, return_when=asyncio.FIRST_COMPLETED)
+                wake.cancel()
+                if recv not in done:
+                    if not done:
+                        await self.sweep(list(self.jobs))  # quiet socket: cheap safety net
+                    continue
+                msg = recv.result()
+                if msg is None:
+                    print("  ... websocket closed, reconnecting")
+                    return
+                recv = asyncio.ensure_future(ws.recv())
+                if isinstance(msg, str):  # binary frames are latent previews
+                    try:
+                        await self._handle(json.loads(msg))
+                    except ValueError:
+                        pass
+        finally:
+            recv.cancel()
+
+    async def _handle(self, event: dict) -> None:
+        data = event.get("data") or {}
+        pid = data.get("prompt_id")
+        if pid is None:
+            return
+        kind = event.get("type")
+        known = pid in self.jobs
+        if kind == "execution_start" and self.on_progress:
+            self.on_progress(pid, kind, data)
+        elif kind == "executed":
+            node = str(data.get("node"))
+            images = (data.get("output") or {}).get("images") or []
+            if known and images:
+                self._finish(pid, node, images)
+            elif images:
+                self._early.setdefault(pid, {})[node] = images
+        elif kind in ("execution_error", "execution_interrupted"):
+            if known:
+                self._fail(pid, data)
+            else:
+                self._early_errors[pid] = data
+        elif kind == "execution_success" or (kind == "executing" and data.get("node") is None):
+            if self.on_progress:
+                self.on_progress(pid, "execution_success", data if kind == "execution_success" else {})
+            # Fully cached prompts never emit "executed" for the save node
+            if known:
+                await self.sweep([pid])
+            else:
+                self._early.setdefault(pid, {})
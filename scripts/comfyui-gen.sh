@@ -3,8 +3,6 @@
 # Usage: ./comfyui-gen.sh "prompt text" output_filename.png
 
 COMFY_API="http://10.0.0.239:4455"
-COMFY_SERVER="10.0.0.239"
-COMFY_OUTPUT="/mnt/tools/comfy-ui/output"
 PROMPT="$1"
 OUTPUT_FILE="$2"
 PREFIX="spelling_bee_avatar"
@@ -173,10 +171,15 @@ print('')
 
   if [ -n "$STATUS" ]; then
     echo "Generated: $STATUS"
-    # Copy from server to local
-    scp "$COMFY_SERVER:$COMFY_OUTPUT/$STATUS" "$OUTPUT_FILE"
-    echo "Saved to: $OUTPUT_FILE"
-    exit 0
+    # Stream from ComfyUI's /view endpoint to a temp file, then rename into place
+    if curl -sfG "$COMFY_API/view" --data-urlencode "filename=$STATUS" --data-urlencode "type=output" \
+         -o "$OUTPUT_FILE.part" && mv -f "$OUTPUT_FILE.part" "$OUTPUT_FILE"; then
+      echo "Saved to: $OUTPUT_FILE"
+      exit 0
+    fi
+    rm -f "$OUTPUT_FILE.part"
+    echo "ERROR: Failed to download $STATUS"
+    exit 1
   fi
 done
 
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Archive old practice/quiz sessions out of the server's live sessions.json.
+
+server.ts reads all of sessions.json and writes it back, pretty-printed,
+on every POST, so each save gets slower as the school year goes on. This
+moves sessions older than --keep-days out of sessions.json into gzipped
+JSONL segments, one per month (session-archive/sessions-YYYY-MM.jsonl.gz,
+merged by session id so reruns never duplicate), and rebuilds
+session-archive/rollup.json from every segment: per user, their session
+counts by mode and mean score, and per "<listId>:<word>" (the progress key
+without the user) attempts, correct answers and first/last dates. The
+rollup is a summary of the archive for reading by hand; nothing in the
+app reads it, and it leaves out the live window.
+
+Nothing leaves the app's view: GET /api/sessions in server.ts serves the
+archived sessions ahead of the live ones (re-reading a segment only when
+it changes), and DELETE removes a user's sessions from the segments too,
+so achievements, quiz completion and the report still see every session.
+data.json is left alone: its progress entries are what spaced repetition
+schedules from, and the client PUTs all of them back on every change.
+
+Segments are written and fsync'd before sessions.json shrinks. It is
+replaced atomically, and only if it has not changed since it was read
+(otherwise the pass is redone; so is a pass that finds it half-written),
+so this can run against a live server; stopping the server first removes
+even that small window.
+"""
+
+import argparse, gzip, json, os, sys, time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ARCHIVE_DIR = os.path.join(REPO_DIR, "session-archive")
+LEGACY_USER = "_legacy"  # sessions saved before there were user profiles
+
+
+def read_json(path: str, default):
+    """(parsed file, (mtime_ns, size)) for the change check before replacing it.
+
+    Raises json.JSONDecodeError for a file caught mid-write (or empty).
+    """
+    try:
+        st = os.stat(path)
+        with open(path) as f:
+            return json.load(f), (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return default, None
+
+
+def replace_if_unchanged(path: str, text: str, stamp) -> bool:
+    """Atomically write `text` to `path` unless it changed since it was read as `stamp`."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    st = os.stat(path)
+    if (st.st_mtime_ns, st.st_size) != stamp:
+        os.unlink(tmp)
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def server_json(obj) -> str:
+    """JSON.stringify(obj, null, 2), the format server.ts writes."""
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def session_time(record: dict) -> datetime | None:
+    try:
+        when = datetime.fromisoformat(record["date"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+# ─── Segments ────────────────────────────────────────────────────────
+
+def read_segment(path: str) -> list[dict]:
+    try:
+        with gzip.open(path, "rt") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def write_segment(path: str, records: list[dict]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as f:
+            for record in records:
+                f.write((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+
+
+def merge_segment(path: str, records: list[dict], key) -> int:
+    """Add `records` to a segment (a later record replaces one with the same key); how many were new."""
+    merged = {key(r): r for r in read_segment(path)}
+    before = len(merged)
+    merged.update((key(r), r) for r in records)
+    write_segment(path, list(merged.values()))
+    return len(merged) - before
+
+# ─── Rollup ──────────────────────────────────────────────────────────
+
+def rollup(archive_dir: str) -> dict:
+    users: dict[str, dict] = {}
+    total = 0
+    for filename in sorted(os.listdir(archive_dir)):
+        if not (filename.startswith("sessions-") and filename.endswith(".jsonl.gz")):
+            continue
+        for s in read_segment(os.path.join(archive_dir, filename)):
+            total += 1
+            user = users.setdefault(s.get("userId") or LEGACY_USER,
+                                    {"sessions": 0, "modes": Counter(), "scoreSum": 0.0, "firstDate": None,
+                                     "lastDate": None, "words": {}})
+            date = s.get("date")
+            user["sessions"] += 1
+            user["modes"][s.get("mode", "?")] += 1
+            user["scoreSum"] += s.get("score") or 0
+            user["firstDate"] = min(filter(None, (user["firstDate"], date)), default=None)
+            user["lastDate"] = max(filter(None, (user["lastDate"], date)), default=None)
+            for result in s.get("results", []):
+                w = user["words"].setdefault(f"{s.get('listId')}:{result.get('word')}",
+                                             {"attempts": 0, "correct": 0, "firstDate": date, "lastDate": date,
+                                              "lastCorrect": None})
+                w["attempts"] += 1
+                w["correct"] += bool(result.get("correct"))
+                if date and (w["firstDate"] is None or date < w["firstDate"]):
+                    w["firstDate"] = date
+                if date and (w["lastDate"] is None or date >= w["lastDate"]):
+                    w["lastDate"], w["lastCorrect"] = date, bool(result.get("correct"))
+    for user in users.values():
+        user["meanScore"] = round(user.pop("scoreSum") / user["sessions"], 2)
+        user["modes"] = dict(sorted(user["modes"].items()))
+        user["words"] = dict(sorted(user["words"].items()))
+    return {"sessions": total, "users": dict(sorted(users.items()))}
+
+# ─── Main ────────────────────────────────────────────────────────────
+
+def compact(args, cutoff: datetime) -> dict | None:
+    """One pass; None if sessions.json changed under it or was caught half-written."""
+    try:
+        sessions, stamp = read_json(args.sessions, [])
+    except json.JSONDecodeError:
+        return None
+    report = {"sessions_before": len(sessions)}
+
+    old, keep = {}, []
+    for record in sessions:
+        when = session_time(record) if isinstance(record, dict) and record.get("id") else None
+        if when is not None and when < cutoff:
+            old.setdefault(when.strftime("%Y-%m"), []).append(record)
+        else:
+            keep.append(record)
+    report.update(archived=sum(map(len, old.values())), sessions_after=len(keep), new_in_archive=0)
+    if args.dry_run:
+        return report
+
+    os.makedirs(args.archive, exist_ok=True)
+    for month, records in sorted(old.items()):
+        report["new_in_archive"] += merge_segment(os.path.join(args.archive, f"sessions-{month}.jsonl.gz"),
+                                                  records, lambda r: r["id"])
+    if old and not replace_if_unchanged(args.sessions, server_json(keep), stamp):
+        return None
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default=os.path.join(REPO_DIR, "sessions.json"), help="server.ts sessions file")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="segment and rollup directory (default session-archive/)")
+    parser.add_argument("--keep-days", type=float, default=90, help="sessions newer than this stay live (default 90)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without writing anything")
+    args = parser.parse_args()
+    args.now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.keep_days)
+
+    size_before = os.path.getsize(args.sessions) if os.path.exists(args.sessions) else 0
+    for attempt in range(5):
+        report = compact(args, cutoff)
+        if report is not None:
+            break
+        print("  sessions.json changed (or was mid-write) while compacting; starting over")
+        sys.stdout.flush()
+        time.sleep(0.5 * (attempt + 1))
+    else:
+        print("ERROR: sessions.json kept changing or is not valid JSON; stop the server and run again")
+        return 1
+
+    if not args.dry_run and os.path.isdir(args.archive):
+        summary = rollup(args.archive)
+        tmp = os.path.join(args.archive, "rollup.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"generated_at": args.now, "through": cutoff.isoformat(timespec="seconds"), **summary},
+                      f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp, os.path.join(args.archive, "rollup.json"))
+
+    print(f"=== {'Would archive' if args.dry_run else 'Archived'} {report['archived']} sessions older than "
+          f"{cutoff:%Y-%m-%d} ({report['new_in_archive']} new to the archive) ===")
+    size = os.path.getsize(args.sessions) if os.path.exists(args.sessions) else 0
+    print(f"  {os.path.basename(args.sessions):<14} {report['sessions_before']:>6} -> {report['sessions_after']:<6} sessions  "
+          f"{size_before / 1e3:9.1f} KB -> {size / 1e3:.1f} KB")
+    if os.path.isdir(args.archive):
+        segments = [f for f in os.listdir(args.archive) if f.endswith(".jsonl.gz")]
+        size = sum(os.path.getsize(os.path.join(args.archive, f)) for f in segments)
+        print(f"  {os.path.basename(os.path.normpath(args.archive))}/ {len(segments)} segments, {size / 1e3:.1f} KB")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Trim, loudness-normalize and compress the word clips in public/audio.
+
+The *.wav clips are 44.1 kHz 16-bit PCM, 75-120 KB for a single word.
+Each one is trimmed of leading/trailing silence and gained to a common
+speech loudness (gated RMS, -16 dBFS with a -1 dBFS peak ceiling) here,
+then encoded by ffmpeg to Opus and MP3 at speech bitrates into
+public/audio/words/, beside letters/. words/manifest.json lists each
+clip's outputs, durations and byte sizes. Clips whose hash and settings
+are unchanged are skipped; the rest are processed on a process pool.
+Empty or unreadable WAVs are skipped with a warning (keeping any earlier
+encode of them), and outputs whose .wav is gone are deleted, or only
+listed with --keep-orphans.
+
+Requires ffmpeg with libopus and libmp3lame on PATH.
+"""
+
+import argparse, array, json, math, os, shutil, sys, time, wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_clips import ENCODERS, PAD_MS, PEAK_DBFS, SILENCE_DBFS, TARGET_DBFS, analyze, encode
+from render_cache import file_sha256
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "audio")
+OUT_SUBDIR = "words"
+
+def wav_problem(path: str) -> str | None:
+    """Why `path` cannot be encoded (empty, no frames, not a WAV), or None if it looks fine."""
+    if os.path.getsize(path) == 0:
+        return "empty file"
+    try:
+        with wave.open(path) as w:
+            if w.getnframes() == 0:
+                return "no audio frames"
+    except (wave.Error, EOFError) as e:
+        return f"not a readable WAV ({e})"
+    return None
+
+
+def orphans(out_dir: str, words: set[str]) -> list[str]:
+    """Encoded outputs (and leftover .tmp files) in out_dir whose source clip is gone."""
+    found = []
+    for filename in sorted(os.listdir(out_dir)):
+        stem, ext = os.path.splitext(filename.removesuffix(".tmp"))
+        if ext[1:] in ENCODERS and stem not in words:
+            found.append(filename)
+    return found
+
+
+def process(src: str, out_base: str, formats: list[str]) -> dict:
+    """Trim, normalize and encode one clip (runs in a worker process)."""
+    with wave.open(src) as w:
+        rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+        if width != 2:
+            raise ValueError(f"{width * 8}-bit PCM is not supported, only 16-bit")
+        samples = array.array("h", w.readframes(w.getnframes()))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    start, end, gain = analyze(samples, rate, channels)
+    pcm = array.array("h", (max(-32768, min(32767, round(s * gain))) for s in samples[start * channels:end * channels]))
+    if sys.byteorder == "big":
+        pcm.byteswap()
+
+    outputs = encode(pcm.tobytes(), rate, channels, out_base, formats)
+    return {
+        "duration": round((end - start) / rate, 3),
+        "trimmed": round((len(samples) // channels - (end - start)) / rate, 3),
+        "gain_db": round(20 * math.log10(gain), 2),
+        "outputs": outputs,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_dir", nargs="?", default=AUDIO_DIR, help="directory of word .wav clips (default public/audio)")
+    parser.add_argument("--formats", default="opus,mp3", help="comma-separated subset of opus,mp3 (default both)")
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="re-encode every clip, even unchanged ones")
+    parser.add_argument("--keep-orphans", action="store_true", help="list outputs whose .wav is gone instead of deleting them")
+    args = parser.parse_args()
+
+    formats = [fmt for fmt in args.formats.split(",") if fmt]
+    unknown = [fmt for fmt in formats if fmt not in ENCODERS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+    if shutil.which("ffmpeg") is None:
+        print("ERROR: ffmpeg not found on PATH (brew install ffmpeg / apt install ffmpeg)")
+        return 1
+
+    audio_dir = os.path.abspath(args.audio_dir)
+    out_dir = os.path.join(audio_dir, OUT_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            old = json.load(f).get("clips", {})
+    except (OSError, ValueError):
+        old = {}
+    settings = {"formats": formats, "target_dbfs": TARGET_DBFS, "peak_dbfs": PEAK_DBFS,
+                "silence_dbfs": SILENCE_DBFS, "pad_ms": PAD_MS, "encoders": {fmt: ENCODERS[fmt] for fmt in formats}}
+
+    clips, todo, words = {}, [], set()
+    for filename in sorted(os.listdir(audio_dir)):
+        if not filename.endswith(".wav"):
+            continue
+        word = filename[:-len(".wav")]
+        words.add(word)
+        src = os.path.join(audio_dir, filename)
+        problem = wav_problem(src)
+        if problem:
+            kept = word in old and all(os.path.exists(os.path.join(out_dir, o["path"])) for o in old[word]["outputs"].values())
+            if kept:
+                clips[word] = old[word]
+            print(f"  WARNING: skipping {filename}: {problem}{'; kept the previous encode' if kept else ''}")
+            continue
+        digest = file_sha256(src)
+        entry = old.get(word)
+        if (not args.force and entry and entry["sha256"] == digest and entry.get("settings") == settings
+                and all(os.path.exists(os.path.join(out_dir, o["path"])) for o in entry["outputs"].values())):
+            clips[word] = entry
+        else:
+            todo.append((word, src, digest))
+
+    stale = orphans(out_dir, words)
+    for filename in stale:
+        if args.keep_orphans:
+            print(f"  orphan: {OUT_SUBDIR}/{filename} (no {os.path.splitext(filename)[0]}.wav)")
+        else:
+            os.unlink(os.path.join(out_dir, filename))
+            print(f"  Removed: {OUT_SUBDIR}/{filename} (its .wav is gone)")
+    if args.keep_orphans:
+        clips.update({word: entry for word, entry in old.items() if word not in words})
+
+    print(f"=== Compressing {len(todo)} of {len(todo) + len(clips)} clips to {', '.join(formats)} ===")
+    sys.stdout.flush()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process, src, os.path.join(out_dir, word), formats): (word, src, digest)
+                   for word, src, digest in todo}
+        for future in as_completed(futures):
+            word, src, digest = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"  FAILED: {word} ({e})")
+                continue
+            clips[word] = {"source": os.path.basename(src), "sha256": digest, "bytes": os.path.getsize(src),
+                           "settings": settings, **result}
+            print(f"  OK: {word} ({result['duration']:.2f}s, {result['gain_db']:+.1f} dB)")
+            sys.stdout.flush()
+
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "clips": dict(sorted(clips.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, manifest_path)
+
+    wav = sum(clip["bytes"] for clip in clips.values())
+    print(f"\n=== {len(clips)} clips, {wav / 1e6:.1f} MB of WAV ===")
+    for fmt in formats:
+        size = sum(clip["outputs"][fmt]["bytes"] for clip in clips.values() if fmt in clip["outputs"])
+        print(f"  {fmt:<5} {size / 1e6:6.2f} MB  ({wav / size if size else 0:.0f}x smaller)")
+    if stale:
+        print(f"  {len(stale)} orphaned outputs {'kept (--keep-orphans)' if args.keep_orphans else 'removed'}")
+    if failed:
+        print(f"  {failed} FAILED")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Local stand-in for the ComfyUI HTTP + websocket API.
+
+Implements just what comfy_runner.py uses: POST /prompt, /history/{id},
+GET /queue and POST /queue {"delete": [...]}, /view, and /ws progress
+events (execution_start, executed, execution_success/execution_error,
+executing with node null). Prompts run one at a time per --workers,
+"rendering" for --latency ± --jitter seconds and failing at --failure-rate;
+every SaveImage node yields a flat --size px PNG per latent in the batch
+(EmptySD3LatentImage batch_size). GET /object_info describes the nodes
+comfy_runner's graphs use, with the real model and LoRA file names minus
+any --missing ones. GET /fake/stats returns request counts per endpoint
+for bench-pipeline.py.
+
+    python3 fake_comfy.py --port 8188 --latency 0.5
+    python3 batch-all-poses.py --api http://127.0.0.1:8188 --only avocado
+"""
+
+import argparse, asyncio, base64, hashlib, json, random, struct, sys, time, urllib.parse, uuid, zlib
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+MODELS = {
+    "unet": ["flux1-dev.safetensors", "flux1-schnell.safetensors"],
+    "clip": ["flux/t5xxl_fp16.safetensors", "flux/clip_l.safetensors"],
+    "vae": ["flux/ae.safetensors"],
+    "lora": ["flux/PixarPerfect_3D_Animation_Style_FLUX-000001.safetensors"],
+}
+
+
+def object_info(missing: set[str]) -> dict:
+    """/object_info for the node classes comfy_runner.build_workflow uses."""
+    files = {kind: [[f for f in names if f not in missing]] for kind, names in MODELS.items()}
+    image = lambda: ["INT", {"default": 1024, "min": 16, "max": 16384, "step": 8}]
+    nodes = {
+        "UNETLoader": {"unet_name": files["unet"], "weight_dtype": [["default", "fp8_e4m3fn", "fp8_e5m2"]]},
+        "DualCLIPLoader": {"clip_name1": files["clip"], "clip_name2": files["clip"], "type": [["sdxl", "sd3", "flux"]]},
+        "VAELoader": {"vae_name": files["vae"]},
+        "ModelSamplingFlux": {"model": ["MODEL"], "max_shift": ["FLOAT", {"min": 0.0, "max": 100.0}],
+                              "base_shift": ["FLOAT", {"min": 0.0, "max": 100.0}], "width": image(), "height": image()},
+        "LoraLoader": {"model": ["MODEL"], "clip": ["CLIP"], "lora_name": files["lora"],
+                       "strength_model": ["FLOAT", {"min": -100.0, "max": 100.0}],
+                       "strength_clip": ["FLOAT", {"min": -100.0, "max": 100.0}]},
+        "CLIPTextEncode": {"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]},
+        "FluxGuidance": {"conditioning": ["CONDITIONING"], "guidance": ["FLOAT", {"min": 0.0, "max": 100.0}]},
+        "RandomNoise": {"noise_seed": ["INT", {"min": 0, "max": 0xFFFFFFFFFFFFFFFF}]},
+        "EmptySD3LatentImage": {"width": image(), "height": image(), "batch_size": ["INT", {"min": 1, "max": 4096}]},
+        "KSamplerSelect": {"sampler_name": [["euler", "euler_ancestral", "dpmpp_2m", "uni_pc"]]},
+        "BasicScheduler": {"model": ["MODEL"], "scheduler": [["normal", "karras", "simple", "beta"]],
+                           "steps": ["INT", {"min": 1, "max": 10000}], "denoise": ["FLOAT", {"min": 0.0, "max": 1.0}]},
+        "BasicGuider": {"model": ["MODEL"], "conditioning": ["CONDITIONING"]},
+        "SamplerCustomAdvanced": {"noise": ["NOISE"], "guider": ["GUIDER"], "sampler": ["SAMPLER"],
+                                  "sigmas": ["SIGMAS"], "latent_image": ["LATENT"]},
+        "VAEDecode": {"samples": ["LATENT"], "vae": ["VAE"]},
+        "SaveImage": {"images": ["IMAGE"], "filename_prefix": ["STRING", {"default": "ComfyUI"}]},
+    }
+    return {cls: {"input": {"required": inputs, "hidden": {}}, "name": cls} for cls, inputs in nodes.items()}
+
+
+def make_png(size: int, seed: int) -> bytes:
+    """A white square with a coloured middle, so every output differs."""
+    rnd = random.Random(seed)
+    colour = bytes(rnd.randrange(256) for _ in range(3))
+    edge = size // 4
+    rows = []
+    for y in range(size):
+        middle = (colour if edge <= y < size - edge else b"\xff\xff\xff") * (size - 2 * edge)
+        rows.append(b"\x00" + b"\xff\xff\xff" * edge + middle + b"\xff\xff\xff" * edge)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack("!IIBBBBB", size, size, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), 6)) + chunk(b"IEND", b""))
+
+
+def ws_frame(text: str) -> bytes:
+    data = text.encode()
+    n = len(data)
+    if n < 126:
+        head = bytes([0x81, n])
+    elif n < 1 << 16:
+        head = bytes([0x81, 126]) + struct.pack("!H", n)
+    else:
+        head = bytes([0x81, 127]) + struct.pack("!Q", n)
+    return head + data
+
+
+class FakeComfy:
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, failure_rate: float = 0.0,
+                 size: int = 32, workers: int = 1, seed: int | None = None, missing: set[str] = frozenset()):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.size = size
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.pending: dict[str, tuple[dict, str]] = {}
+        self.running: dict[str, dict] = {}
+        self.history: dict[str, dict] = {}
+        self.files: dict[str, bytes] = {}
+        self.sockets: dict[str, list[asyncio.StreamWriter]] = {}
+        self.counts: dict[str, int] = {}
+        self.number = 0
+        self.object_info = object_info(set(missing))
+
+    async def emit(self, client_id: str, kind: str, data: dict) -> None:
+        # Like ComfyUI, progress only goes to the client that submitted the prompt
+        frame = ws_frame(json.dumps({"type": kind, "data": data}))
+        for writer in list(self.sockets.get(client_id, [])):
+            try:
+                writer.write(frame)
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def worker(self) -> None:
+        while True:
+            pid = await self.queue.get()
+            if pid not in self.pending:
+                continue  # deleted while queued
+            prompt, client_id = self.pending.pop(pid)
+            self.running[pid] = prompt
+            started = time.time()
+            messages = [["execution_start", {"prompt_id": pid, "timestamp": int(started * 1000)}]]
+            await self.emit(client_id, "execution_start", {"prompt_id": pid, "timestamp": int(started * 1000)})
+            await asyncio.sleep(max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0))
+            outputs, status = {}, "success"
+            if self.random.random() < self.failure_rate:
+                status = "error"
+                error = {"prompt_id": pid, "node_id": "13", "node_type": "SamplerCustomAdvanced",
+                         "exception_message": "fake failure", "exception_type": "RuntimeError",
+                         "timestamp": int(time.time() * 1000)}
+                messages.append(["execution_error", error])
+                await self.emit(client_id, "execution_error", error)
+            else:
+                batch = max((node["inputs"].get("batch_size", 1) for node in prompt.values()
+                             if node.get("class_type") == "EmptySD3LatentImage"), default=1)
+                for node_id, node in prompt.items():
+                    if node.get("class_type") != "SaveImage":
+                        continue
+                    images = []
+                    for _ in range(batch):
+                        filename = f"{node['inputs'].get('filename_prefix', 'ComfyUI')}_{len(self.files):05d}_.png"
+                        self.files[filename] = make_png(self.size, len(self.files))
+                        images.append({"filename": filename, "subfolder": "", "type": "output"})
+                    outputs[node_id] = {"images": images}
+                    await self.emit(client_id, "executed", {"node": node_id, "output": outputs[node_id], "prompt_id": pid})
+                messages.append(["execution_success", {"prompt_id": pid, "timestamp": int(time.time() * 1000)}])
+                await self.emit(client_id, "execution_success", {"prompt_id": pid, "timestamp": int(time.time() * 1000)})
+            del self.running[pid]
+            self.history[pid] = {"prompt": [self.number, pid, prompt, {}, list(outputs)], "outputs": outputs,
+                                 "status": {"status_str": status, "completed": status == "success", "messages": messages}}
+            await self.emit(client_id, "executing", {"node": None, "prompt_id": pid})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                url = urllib.parse.urlsplit(target)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                endpoint = "/" + url.path.strip("/").split("/")[0]
+                self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+                if url.path == "/ws":
+                    await self.websocket(reader, writer, headers, query.get("clientId", ""))
+                    return
+                status, content_type, out = self.route(method, url.path, query, body)
+                writer.write((f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                              f"Content-Type: {content_type}\r\nContent-Length: {len(out)}\r\n\r\n").encode() + out)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def route(self, method: str, path: str, query: dict, body: bytes) -> tuple[int, str, bytes]:
+        if path == "/prompt" and method == "POST":
+            request = json.loads(body)
+            pid = str(uuid.uuid4())
+            self.pending[pid] = (request["prompt"], request.get("client_id", ""))
+            self.queue.put_nowait(pid)
+            self.number += 1
+            return 200, "application/json", json.dumps({"prompt_id": pid, "number": self.number, "node_errors": {}}).encode()
+        if path.startswith("/history/"):
+            pid = path.rsplit("/", 1)[-1]
+            return 200, "application/json", json.dumps({pid: self.history[pid]} if pid in self.history else {}).encode()
+        if path == "/queue" and method == "POST":
+            for pid in json.loads(body).get("delete", []):
+                self.pending.pop(pid, None)
+            return 200, "application/json", b""
+        if path == "/queue":
+            return 200, "application/json", json.dumps({
+                "queue_running": [[0, pid, prompt, {}, []] for pid, prompt in self.running.items()],
+                "queue_pending": [[0, pid, prompt, {}, []] for pid, (prompt, _) in self.pending.items()],
+            }).encode()
+        if path == "/view":
+            image = self.files.get(query.get("filename", ""))
+            if image is None:
+                return 404, "text/plain", b"not found"
+            return 200, "image/png", image
+        if path == "/object_info":
+            return 200, "application/json", json.dumps(self.object_info).encode()
+        if path == "/fake/stats":
+            return 200, "application/json", json.dumps({"requests": self.counts, "rendered": len(self.history)}).encode()
+        return 404, "text/plain", b"not found"
+
+    async def websocket(self, reader, writer, headers: dict, client_id: str) -> None:
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        writer.write(ws_frame(json.dumps({"type": "status", "data": {"sid": client_id}})))
+        self.sockets.setdefault(client_id, []).append(writer)
+        try:
+            await reader.read()  # client frames are ignored; EOF ends the socket
+        finally:
+            self.sockets[client_id].remove(writer)
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        """Start the workers and the listener on the running loop; port 0 picks a free one."""
+        for _ in range(self.workers):
+            asyncio.ensure_future(self.worker())
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        # bench-pipeline.py reads the real port from this line when started with --port 0
+        print(f"fake ComfyUI listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+        sys.stdout.flush()
+        async with server:
+            await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188, help="0 picks a free port (default 8188)")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per prompt (default 0.2)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± seconds added to each prompt's latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of prompts that fail (0-1)")
+    parser.add_argument("--size", type=int, default=32, help="output image width/height in px (default 32)")
+    parser.add_argument("--workers", type=int, default=1, help="prompts executed at once (default 1, like one GPU)")
+    parser.add_argument("--seed", type=int, help="seed for jitter/failures, for repeatable runs")
+    parser.add_argument("--missing", action="append", default=[], metavar="FILE",
+                        help="leave this model/LoRA file out of /object_info (repeatable)")
+    args = parser.parse_args()
+    fake = FakeComfy(args.latency, args.jitter, args.failure_rate, args.size, args.workers, args.seed, set(args.missing))
+    try:
+        asyncio.run(fake.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Local stand-in for the dictionary APIs audioUtils.ts calls.
+
+Serves, on one port, the three URL shapes prefetch-dictionary.py uses:
+
+    /api/v3/references/<ref>/json/<word>?key=...   Merriam-Webster
+    /api/v2/entries/en/<word>                       Free Dictionary
+    /api/rest_v1/page/definition/<word>             Wiktionary
+
+with made-up but well-formed entries after --latency seconds. Words in
+--unknown get MW suggestions and 404s elsewhere; words in --proper are
+only known to Wiktionary, as a proper noun. MW wants --mw-key (403
+otherwise). Each source allows --rate-limit requests per second (429 with
+Retry-After above that) and fails --failure-rate of the rest with a 503.
+GET /fake/stats returns request counts per source.
+
+    python3 fake_dictionary.py --port 8197 --rate-limit 10 --failure-rate 0.1
+    VITE_MW_ELEMENTARY_API_KEY=test \\
+        python3 prefetch-dictionary.py --api-base http://127.0.0.1:8197 --out /tmp/dictionary.json
+"""
+
+import argparse, json, random, sys, threading, time, urllib.parse, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POS = ["noun", "verb", "adjective", "adverb"]
+
+
+def sense(word: str) -> tuple[str, str]:
+    """A part of speech and a definition that never mentions the word."""
+    n = zlib.crc32(word.lower().encode())
+    return POS[n % len(POS)], f"sense number {n % 9973} of a made-up entry"
+
+
+def mw(ref: str, word: str) -> list:
+    pos, definition = sense(word)
+    return [{"meta": {"id": f"{word}:1", "stems": [word]}, "fl": pos,
+             "hwi": {"prs": [{"sound": {"audio": f"{word[:5]}001"}}]} if ref != "learners" else {},
+             "shortdef": [f"{word} itself", f"{definition} ({ref})"]}]
+
+
+def free(word: str) -> list:
+    pos, definition = sense(word)
+    return [{"word": word, "phonetic": f"/{word}/",
+             "phonetics": [{"text": f"/{word}/", "audio": ""},
+                           {"audio": f"https://api.dictionaryapi.dev/media/pronunciations/en/{word}-us.mp3"}],
+             "meanings": [{"partOfSpeech": pos, "definitions": [
+                 {"definition": f"Something like {word}."},
+                 {"definition": f"{definition} &amp; more", "example": f"She said it was a {pos}."}]}]}]
+
+
+def wiktionary(word: str, proper: bool = False) -> dict:
+    pos, definition = sense(word)
+    if proper:
+        return {"en": [{"partOfSpeech": "Proper noun", "definitions": [
+            {"definition": f"<b>A place</b> called {word}"}, {"definition": f"A <i>{definition}</i>\nsecond line"}]}]}
+    return {"en": [{"partOfSpeech": pos.capitalize(), "definitions": [{"definition": f"<span>{definition}</span>"}]}]}
+
+
+class FakeDictionary:
+    def __init__(self, mw_key: str = "test", unknown: set[str] | None = None, proper: set[str] | None = None,
+                 latency: float = 0.05, rate_limit: float = 0.0, failure_rate: float = 0.0, seed: int | None = None):
+        self.mw_key = mw_key
+        self.unknown = {w.lower() for w in unknown or ()}
+        self.proper = {w.lower() for w in proper or ()}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows: dict[str, list[float]] = {}  # accepted request times in the last second, per source
+        self.counts: dict[str, dict[str, int]] = {}
+
+    def count(self, source: str, outcome: str) -> None:
+        with self.lock:
+            counts = self.counts.setdefault(source, {"requests": 0, "ok": 0, "not_found": 0, "throttled": 0, "failed": 0})
+            counts[outcome] += 1
+
+    def admit(self, source: str) -> bool:
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            window = self.windows[source] = [t for t in self.windows.get(source, []) if now - t < 1.0]
+            if len(window) >= self.rate_limit:
+                return False
+            window.append(now)
+            return True
+
+    def answer(self, path: str, query: dict) -> tuple[str, int, object]:
+        """(source, status, body) for a request path."""
+        parts = [urllib.parse.unquote(p) for p in path.strip("/").split("/")]
+        if parts[:3] == ["api", "v3", "references"] and len(parts) == 6:
+            if query.get("key", [""])[0] != self.mw_key:
+                return "mw", 403, "Invalid API key. Not subscribed for this reference."
+            word = parts[5]
+            if word.lower() in self.unknown | self.proper:
+                return "mw", 200, [word[::-1], word + "s"]  # suggestions
+            return "mw", 200, mw(parts[3], word)
+        if parts[:4] == ["api", "v2", "entries", "en"] and len(parts) == 5:
+            word = parts[4]
+            if word.lower() in self.unknown | self.proper:
+                return "free", 404, {"title": "No Definitions Found"}
+            return "free", 200, free(word)
+        if parts[:4] == ["api", "rest_v1", "page", "definition"] and len(parts) == 5:
+            word = parts[4]
+            if word.lower() in self.unknown:
+                return "wiktionary", 404, {"title": "Not found."}
+            return "wiktionary", 200, wiktionary(word, word.lower() in self.proper)
+        return "other", 404, {"error": "not found"}
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, body, extra: dict | None = None) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path == "/fake/stats":
+                    with fake.lock:
+                        self.reply(200, fake.counts)
+                    return
+                source, status, body = fake.answer(url.path, urllib.parse.parse_qs(url.query))
+                fake.count(source, "requests")
+                if not fake.admit(source):
+                    fake.count(source, "throttled")
+                    self.reply(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                    return
+                time.sleep(fake.latency)
+                with fake.lock:
+                    failed = fake.random.random() < fake.failure_rate
+                if failed:
+                    fake.count(source, "failed")
+                    self.reply(503, {"error": "fake failure"})
+                    return
+                fake.count(source, "ok" if status == 200 else "not_found")
+                self.reply(status, body)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8197, help="0 picks a free port (default 8197)")
+    parser.add_argument("--mw-key", default="test", help="accepted MW key, for every reference (default test)")
+    parser.add_argument("--unknown", default="", help="comma-separated words no source knows")
+    parser.add_argument("--proper", default="", help="comma-separated proper nouns only Wiktionary knows")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request (default 0.05)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second per source before 429s (default: none)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that get a 503")
+    parser.add_argument("--seed", type=int, help="seed for failures, for repeatable runs")
+    args = parser.parse_args()
+    fake = FakeDictionary(args.mw_key, set(filter(None, args.unknown.split(","))),
+                          set(filter(None, args.proper.split(","))), args.latency,
+                          args.rate_limit, args.failure_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), fake.handler())
+    print(f"fake dictionary listening on http://{args.host}:{server.server_address[1]}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
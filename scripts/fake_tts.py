@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Local stand-in for the ElevenLabs text-to-speech endpoint.
+
+Answers POST /v1/text-to-speech/<voice>?output_format=... with a small
+fake MP3 (an ID3 tag naming the text plus silent frames) after --latency
+seconds. Requests need the --api-key in xi-api-key (401 otherwise). More
+than --rate-limit requests per second get 429 with Retry-After, and
+--failure-rate of the rest get a 500, so warm-tts-cache.py's backoff can
+be exercised. GET /fake/stats returns request counts.
+
+    python3 fake_tts.py --port 8199 --rate-limit 5 --failure-rate 0.1
+    ELEVENLABS_API_KEY=test ELEVENLABS_VOICE_ID=voice \\
+        python3 warm-tts-cache.py --api-base http://127.0.0.1:8199 --cache-dir /tmp/tts-cache
+"""
+
+import argparse, json, random, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# One silent MPEG-1 layer III frame, 128 kbit/s at 44.1 kHz (417 bytes)
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def fake_mp3(text: str) -> bytes:
+    tag = text.encode()
+    frame = b"TIT2" + (len(tag) + 1).to_bytes(4, "big") + b"\x00\x00\x03" + tag
+    size = len(frame)
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + synchsafe + frame + MP3_FRAME * 8
+
+
+class FakeTTS:
+    def __init__(self, api_key: str = "test", latency: float = 0.05, rate_limit: float = 0.0,
+                 failure_rate: float = 0.0, seed: int | None = None):
+        self.api_key = api_key
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window: list[float] = []  # accepted request times in the last second
+        self.counts = {"requests": 0, "ok": 0, "throttled": 0, "failed": 0, "unauthorized": 0}
+        self.texts: list[str] = []
+
+    def count(self, outcome: str) -> None:
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def admit(self) -> bool:
+        """False if this request is over --rate-limit."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            if len(self.window) >= self.rate_limit:
+                return False
+            self.window.append(now)
+            return True
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, content_type: str, body: bytes, extra: dict | None = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/fake/stats":
+                    with fake.lock:
+                        stats = {**fake.counts, "texts": len(fake.texts)}
+                    self.reply(200, "application/json", json.dumps(stats).encode())
+                else:
+                    self.reply(404, "text/plain", b"not found")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.startswith("/v1/text-to-speech/"):
+                    self.reply(404, "text/plain", b"not found")
+                    return
+                fake.count("requests")
+                if self.headers.get("xi-api-key") != fake.api_key:
+                    fake.count("unauthorized")
+                    self.reply(401, "application/json", b'{"detail": {"status": "invalid_api_key"}}')
+                    return
+                if not fake.admit():
+                    fake.count("throttled")
+                    self.reply(429, "application/json", b'{"detail": {"status": "too_many_concurrent_requests"}}',
+                               {"Retry-After": "1"})
+                    return
+                time.sleep(fake.latency)
+                with fake.lock:
+                    failed = fake.random.random() < fake.failure_rate
+                if failed:
+                    fake.count("failed")
+                    self.reply(500, "application/json", b'{"detail": "fake failure"}')
+                    return
+                text = json.loads(body)["text"]
+                with fake.lock:
+                    fake.texts.append(text)
+                fake.count("ok")
+                self.reply(200, "audio/mpeg", fake_mp3(text))
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8199, help="0 picks a free port (default 8199)")
+    parser.add_argument("--api-key", default="test", help="accepted xi-api-key (default test)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request (default 0.05)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second before 429s (default: none)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that get a 500")
+    parser.add_argument("--seed", type=int, help="seed for failures, for repeatable runs")
+    args = parser.parse_args()
+    fake = FakeTTS(args.api_key, args.latency, args.rate_limit, args.failure_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), fake.handler())
+    print(f"fake TTS listening on http://{args.host}:{server.server_address[1]}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Content-hashed copies of the app's media for immutable caching.
+
+The app asks for fixed URLs like /avatars/avocado.png, so a re-rendered
+image is hidden behind stale browser/PWA caches unless everything is
+served with short lifetimes. This copies every file under public/avatars,
+public/audio and public/icons to public/_hashed/<same path with the first
+HASH_LEN hex digits of its sha256 before the extension>, e.g.
+
+    /avatars/avocado.png -> /_hashed/avatars/avocado.3f2a9c1b7e.png
+
+and writes public/asset-manifest.json mapping each logical path to
+{"url", "bytes", "sha256"}. A hashed URL never changes content, so
+/_hashed/ can be served with "Cache-Control: public, max-age=31536000,
+immutable", and after a render run only the changed files are new.
+
+Files whose size and mtime match the manifest are not re-hashed, and
+copies that already exist are not rewritten. Hashed copies referenced by
+neither this manifest nor the previous one are deleted, so clients still
+holding the previous manifest get one run of grace.
+"""
+
+import argparse, json, os, shutil, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+from render_cache import file_sha256
+
+PUBLIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public")
+SOURCES = ("avatars", "audio", "icons")
+HASHED_DIR = "_hashed"
+MANIFEST = "asset-manifest.json"
+HASH_LEN = 10
+
+
+def find_files(public: str, sources: list[str]) -> dict[str, str]:
+    """Logical URL path -> file path, skipping hidden and half-written files and build provenance."""
+    files = {}
+    for source in sources:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(public, source)):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if filename.startswith(".") or filename.endswith((".tmp", ".part", ".provenance.json")):
+                    continue
+                path = os.path.join(dirpath, filename)
+                files["/" + os.path.relpath(path, public).replace(os.sep, "/")] = path
+    return files
+
+
+def hashed_url(logical: str, sha256: str) -> str:
+    stem, ext = os.path.splitext(logical)
+    return f"/{HASHED_DIR}{stem}.{sha256[:HASH_LEN]}{ext}"
+
+
+def copy_atomic(src: str, dst: str) -> None:
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.tmp"
+    shutil.copyfile(src, tmp)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, dst)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("public", nargs="?", default=PUBLIC_DIR, help="the app's public/ directory")
+    parser.add_argument("--sources", default=",".join(SOURCES), help=f"comma-separated dirs under public/ (default {','.join(SOURCES)})")
+    parser.add_argument("--workers", type=int, default=8, help="hashing threads (default 8)")
+    parser.add_argument("--force", action="store_true", help="re-hash and re-copy everything")
+    args = parser.parse_args()
+
+    public = os.path.abspath(args.public)
+    manifest_path = os.path.join(public, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        old = {}
+    old_assets = {} if args.force else old.get("assets", {})
+
+    files = find_files(public, [s for s in args.sources.split(",") if s])
+    stats = {logical: os.stat(path) for logical, path in files.items()}
+
+    def entry(logical: str) -> dict:
+        st, prev = stats[logical], old_assets.get(logical)
+        if prev and prev["bytes"] == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            return prev
+        sha256 = file_sha256(files[logical])
+        return {"url": hashed_url(logical, sha256), "bytes": st.st_size, "sha256": sha256, "mtime_ns": st.st_mtime_ns}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        assets = dict(zip(files, pool.map(entry, files)))
+
+    copied, copied_bytes = 0, 0
+    for logical, asset in assets.items():
+        target = os.path.join(public, asset["url"].lstrip("/"))
+        if args.force or not os.path.exists(target):
+            copy_atomic(files[logical], target)
+            copied += 1
+            copied_bytes += asset["bytes"]
+            print(f"  {logical} -> {asset['url']}")
+
+    # Keep the previous run's copies for clients that still have its manifest
+    current = {a["url"] for a in assets.values()}
+    previous = sorted({a["url"] for a in old.get("assets", {}).values()} - current)
+    keep = current | set(previous)
+    removed = 0
+    hashed_root = os.path.join(public, HASHED_DIR)
+    for dirpath, dirnames, filenames in os.walk(hashed_root, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if "/" + os.path.relpath(path, public).replace(os.sep, "/") not in keep:
+                os.unlink(path)
+                removed += 1
+        if dirpath != hashed_root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                   "previous": previous,
+                   "assets": dict(sorted(assets.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, manifest_path)
+
+    total = sum(a["bytes"] for a in assets.values())
+    print(f"=== {len(assets)} assets ({total / 1e6:.1f} MB): {copied} new or changed ({copied_bytes / 1e6:.1f} MB), "
+          f"{len(assets) - copied} unchanged, {removed} old copies removed ===")
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Keep-alive HTTP/1.1 client pool (stdlib asyncio only), shared by the
+scripts that talk to web APIs: comfy_runner.py (ComfyUI), warm-tts-cache.py
+(ElevenLabs) and prefetch-dictionary.py. Also the retry policy the last two
+use against public APIs (Backoff), and a reader for the repo's .env the way
+Bun loads it for server.ts.
+"""
+
+import asyncio, contextlib, random, ssl, urllib.parse
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, body: bytes):
+        super().__init__(f"HTTP {status}: {body[:200].decode(errors='replace')}")
+        self.status = status
+        self.body = body
+
+
+class HTTPPool:
+    """At most `size` concurrent requests to one host, reusing idle connections."""
+
+    def __init__(self, base_url: str, size: int = 8, timeout: float = 60.0):
+        u = urllib.parse.urlsplit(base_url)
+        self.host = u.hostname
+        self.ssl = ssl.create_default_context() if u.scheme == "https" else None
+        self.port = u.port or (443 if self.ssl else 80)
+        self.timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(size)
+        self.connections_opened = 0
+        self.requests = 0
+
+    async def request(self, method: str, path: str, body: bytes | None = None,
+                      headers: dict | None = None, sink=None) -> tuple[int, dict, bytes]:
+        """Send one request. With `sink`, a 200 response body is passed to it chunk by
+        chunk instead of being returned."""
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                conn = self._idle.pop() if reused else await self._open()
+                started = [False]
+                try:
+                    status, resp_headers, data, keep = await asyncio.wait_for(
+                        self._roundtrip(conn, method, path, body, headers or {}, started, sink), self.timeout)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    conn[1].close()
+                    # An idle keep-alive socket the server already closed: retry on a fresh one
+                    if reused and not started[0]:
+                        continue
+                    raise
+                self.requests += 1
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    conn[1].close()
+                return status, resp_headers, data
+
+    async def _open(self):
+        conn = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+        self.connections_opened += 1
+        return conn
+
+    async def _roundtrip(self, conn, method, path, body, headers, started, sink):
+        reader, writer = conn
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        if body is not None:
+            head.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (body or b""))
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        started[0] = True
+        version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+        resp_headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            k, _, v = line.decode("latin-1").partition(":")
+            resp_headers[k.strip().lower()] = v.strip()
+        keep = version == "HTTP/1.1" and resp_headers.get("connection", "").lower() != "close"
+
+        # Successful bodies go straight to the sink when there is one; errors are always buffered
+        data = bytearray()
+        emit = sink if sink is not None and status == "200" else data.extend
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                while size:
+                    chunk = await reader.read(min(size, CHUNK_SIZE))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b"", size)
+                    emit(chunk)
+                    size -= len(chunk)
+                await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # trailers
+        elif "content-length" in resp_headers:
+            left = int(resp_headers["content-length"])
+            while left:
+                chunk = await reader.read(min(left, CHUNK_SIZE))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", left)
+                emit(chunk)
+                left -= len(chunk)
+        else:
+            keep = False
+            while chunk := await reader.read(CHUNK_SIZE):
+                emit(chunk)
+        return int(status), resp_headers, bytes(data), keep
+
+    async def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+# What a request through the pool can fail with, short of a bug
+REQUEST_ERRORS = (OSError, ValueError, HTTPError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+
+class Backoff:
+    """Retries a request on 429, 5xx and network errors, up to `retries` times, after
+    jittered delays that double from `backoff` s (at least Retry-After on a 429).
+    `on_throttle(delay)` hears about every 429, e.g. to hold back other requests."""
+
+    def __init__(self, retries: int = 4, backoff: float = 1.0, on_throttle=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.on_throttle = on_throttle
+        self.throttled = 0
+
+    async def request(self, pool: HTTPPool, method: str, path: str, body: bytes | None = None,
+                      headers: dict | None = None, gate=None) -> tuple[int, dict, bytes]:
+        """The first response that is not worth retrying; ValueError once retries run out.
+        Each attempt runs inside `gate()`, an async context manager, when given."""
+        for attempt in range(self.retries + 1):
+            async with gate() if gate is not None else contextlib.nullcontext():
+                try:
+                    status, resp_headers, data = await pool.request(method, path, body, headers)
+                except REQUEST_ERRORS as e:
+                    status, resp_headers, error = None, {}, f"{type(e).__name__}: {e}"
+            if status is not None:
+                if status != 429 and status < 500:
+                    return status, resp_headers, data
+                error = f"HTTP {status}: {data[:200].decode(errors='replace')}"
+            if attempt == self.retries:
+                break
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+            if status == 429:
+                self.throttled += 1
+                try:
+                    delay = max(delay, float(resp_headers.get("retry-after", 0)))
+                except ValueError:
+                    pass
+                if self.on_throttle is not None:
+                    self.on_throttle(delay)
+            await asyncio.sleep(delay)
+        raise ValueError(error)
+
+
+def load_env(path: str) -> dict[str, str]:
+    """KEY=VALUE lines of a .env file (what Bun loads for server.ts)."""
+    env = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, sep, value = line.strip().partition("=")
+                if sep and not key.startswith("#"):
+                    env[key.strip().removeprefix("export ").strip()] = value.strip().strip("'\"")
+    except FileNotFoundError:
+        pass
+    return env
@@ -0,0 +1,222 @@
+"""Quality gate for rendered avatar images (needs NumPy and Pillow).
+
+Every prompt asks for a clean white background, so a usable render has
+light, unsaturated top/left/right edges (portraits may be cut off at the
+bottom), a subject covering a sensible share of the frame and a histogram
+that is neither blank nor mostly black. A 64-bit DCT perceptual hash
+catches a pose that came out as a near-copy of one of the avatar's other
+images. The statistics are whole-array NumPy operations on a 2x
+subsampled frame; decoding the PNG costs more than checking it.
+
+rank() orders the candidates of a latent batch: a clean background plus a
+subject whose colour palette matches the avatar's reference images (its
+base image, or for a base image its poses); failing the checks above
+sinks a candidate. contact_sheet() lays them out for review.
+"""
+
+import os
+from dataclasses import dataclass, field
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = Image = None
+
+LIMITS = {
+    "border_px": 16,           # width of the top/left/right edges that must be background
+    "light_level": 200,        # background pixels have every channel at least this...
+    "max_spread": 30,          # ...and channels within this of each other (no tint)
+    "border_min": 0.60,        # share of edge pixels that must be background
+    "coverage_min": 0.03,      # share of the frame the subject covers
+    "coverage_max": 0.95,
+    "dark_max": 0.40,          # share of near-black (luma < 24) pixels
+    "contrast_min": 12.0,      # luma standard deviation
+    "duplicate_bits": 4,       # pHash Hamming distance at or below this is a near-copy
+}
+
+# rank(): weight of palette similarity to the reference images vs. clean background edges
+SIMILARITY_WEIGHT = 0.6
+PALETTE_BITS = 3               # per channel, so 512 colour bins
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _dct_matrix(n: int):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+@dataclass
+class QAResult:
+    ok: bool
+    reasons: list[str] = field(default_factory=list)
+    metrics: dict = field(default_factory=dict)
+    phash: int = 0
+    score: float = 0.0
+
+
+class ImageQA:
+    def __init__(self, limits: dict | None = None):
+        if np is None:
+            raise RuntimeError("the image QA gate needs NumPy and Pillow (pip install numpy Pillow)")
+        self.limits = {**LIMITS, **(limits or {})}
+        self._dct = _dct_matrix(32)
+        self._hashes: dict[str, tuple[float, int]] = {}  # path -> (mtime, phash)
+        self._palettes: dict[str, tuple[float, object]] = {}  # path -> (mtime, histogram)
+
+    def load(self, path: str):
+        with Image.open(path) as img:
+            return np.asarray(img.convert("RGB"))
+
+    def phash(self, rgb) -> int:
+        gray = Image.fromarray(rgb).convert("L").resize((32, 32), Image.BILINEAR)
+        coeffs = (self._dct @ np.asarray(gray, dtype=np.float32) @ self._dct.T)[:8, :8].ravel()[1:]
+        bits = coeffs > np.median(coeffs)
+        return int("".join("1" if b else "0" for b in bits), 2)
+
+    def file_phash(self, path: str) -> int | None:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._hashes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self.phash(self.load(path)))
+            self._hashes[path] = cached
+        return cached[1]
+
+    def palette(self, rgb):
+        """Normalized colour histogram of the non-background pixels."""
+        lim = self.limits
+        px = rgb[::2, ::2].astype(np.int32)
+        lo, hi = px.min(axis=2), px.max(axis=2)
+        subject = px[~((lo >= lim["light_level"]) & (hi - lo <= lim["max_spread"]))]
+        shift = 8 - PALETTE_BITS
+        bins = ((subject[:, 0] >> shift) << 2 * PALETTE_BITS) | ((subject[:, 1] >> shift) << PALETTE_BITS) | (subject[:, 2] >> shift)
+        hist = np.bincount(bins, minlength=1 << 3 * PALETTE_BITS).astype(np.float64)
+        return hist / hist.sum() if hist.sum() else hist
+
+    def file_palette(self, path: str):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._palettes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self.palette(self.load(path)))
+            self._palettes[path] = cached
+        return cached[1]
+
+    def rank(self, paths: list[str], siblings: list[str] = (), references: list[str] = ()) -> list[QAResult]:
+        """check() every candidate and score it; results in the order of `paths`."""
+        refs = [h for h in (self.file_palette(p) for p in references) if h is not None]
+        reference = np.mean(refs, axis=0) if refs else None
+        results = []
+        for path in paths:
+            rgb = self.load(path)
+            result = self._check(rgb, siblings)
+            clean = result.metrics["border_white"]
+            if reference is None:
+                result.score = clean
+            else:
+                similarity = float(np.minimum(self.palette(rgb), reference).sum())
+                result.metrics["palette_similarity"] = similarity
+                result.score = SIMILARITY_WEIGHT * similarity + (1 - SIMILARITY_WEIGHT) * clean
+            if not result.ok:
+                result.score -= 1.0
+            results.append(result)
+        return results
+
+    def check(self, path: str, siblings: list[str] = ()) -> QAResult:
+        """Check the image at `path`; `siblings` are the avatar's other images to compare with."""
+        return self._check(self.load(path), siblings)
+
+    def _check(self, rgb, siblings: list[str]) -> QAResult:
+        lim = self.limits
+        px = rgb[::2, ::2].astype(np.int32)
+        lo, hi = px.min(axis=2), px.max(axis=2)
+        background = (lo >= lim["light_level"]) & (hi - lo <= lim["max_spread"])
+        luma = (77 * px[..., 0] + 150 * px[..., 1] + 29 * px[..., 2]) >> 8
+
+        b = lim["border_px"] // 2
+        edges = np.concatenate([background[:b].ravel(), background[b:, :b].ravel(), background[b:, -b:].ravel()])
+        metrics = {
+            "border_white": float(edges.mean()),
+            "coverage": float(1 - background.mean()),
+            "dark": float((luma < 24).mean()),
+            "contrast": float(luma.std()),
+        }
+        reasons = []
+        if metrics["border_white"] < lim["border_min"]:
+            reasons.append(f"background not white ({metrics['border_white']:.0%} of edges)")
+        if metrics["coverage"] < lim["coverage_min"]:
+            reasons.append(f"nearly empty ({metrics['coverage']:.1%} coverage)")
+        elif metrics["coverage"] > lim["coverage_max"]:
+            reasons.append(f"subject fills the frame ({metrics['coverage']:.0%} coverage)")
+        if metrics["dark"] > lim["dark_max"]:
+            reasons.append(f"mostly black ({metrics['dark']:.0%})")
+        if metrics["contrast"] < lim["contrast_min"]:
+            reasons.append(f"flat image (luma std {metrics['contrast']:.1f})")
+
+        phash = self.phash(rgb)
+        distances = {}
+        for other in siblings:
+            other_hash = self.file_phash(other)
+            if other_hash is not None:
+                distances[other] = bin(phash ^ other_hash).count("1")
+        if distances:
+            closest = min(distances, key=distances.get)
+            metrics["closest_pose"] = os.path.basename(closest)
+            metrics["closest_bits"] = distances[closest]
+            if distances[closest] <= lim["duplicate_bits"]:
+                reasons.append(f"near-copy of {os.path.basename(closest)} ({distances[closest]} bits apart)")
+        return QAResult(not reasons, reasons, metrics, phash)
+
+
+def sibling_paths(out_path: str) -> list[str]:
+    """The avatar's other images: <avatar>.png plus the poses in <avatar>/."""
+    parent = os.path.dirname(out_path)
+    if os.path.exists(f"{parent}.png"):  # a pose, DST/avatar/pose.png
+        pose_dir, paths = parent, [f"{parent}.png"]
+    else:                                # a base image, DST/avatar.png
+        pose_dir, paths = out_path[:-len(".png")], []
+    if os.path.isdir(pose_dir):
+        paths += [os.path.join(pose_dir, f) for f in sorted(os.listdir(pose_dir)) if f.endswith(".png") and not f.startswith(".")]
+    return [p for p in paths if os.path.abspath(p) != os.path.abspath(out_path)]
+
+
+def reference_paths(out_path: str) -> list[str]:
+    """What a candidate should look like: a pose's base image, or a base image's poses."""
+    parent = os.path.dirname(out_path)
+    if os.path.exists(f"{parent}.png"):
+        return [f"{parent}.png"]
+    return [p for p in sibling_paths(out_path) if os.path.dirname(p) == out_path[:-len(".png")]]
+
+
+def contact_sheet(paths: list[str], results: list[QAResult], chosen: int, out_path: str, thumb: int = 256) -> None:
+    """A grid of the candidates with their scores; the kept one framed green, QA failures red."""
+    from PIL import ImageDraw
+
+    cols = min(len(paths), 4)
+    rows = -(-len(paths) // cols)
+    caption = 36
+    sheet = Image.new("RGB", (cols * (thumb + 8) + 8, rows * (thumb + caption + 8) + 8), "white")
+    draw = ImageDraw.Draw(sheet)
+    for i, (path, result) in enumerate(zip(paths, results)):
+        x, y = 8 + i % cols * (thumb + 8), 8 + i // cols * (thumb + caption + 8)
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            img.thumbnail((thumb, thumb))
+            sheet.paste(img, (x + (thumb - img.width) // 2, y + (thumb - img.height) // 2))
+        colour = (0, 160, 0) if i == chosen else (200, 0, 0) if not result.ok else (190, 190, 190)
+        draw.rectangle([x - 3, y - 3, x + thumb + 2, y + thumb + 2], outline=colour, width=3)
+        label = f"#{i} score {result.score:.2f}" + ("  KEPT" if i == chosen else "")
+        draw.text((x, y + thumb + 4), label, fill=(0, 0, 0))
+        if result.reasons:
+            draw.text((x, y + thumb + 18), result.reasons[0][:40], fill=(200, 0, 0))
+    sheet.save(out_path)
@@ -0,0 +1,48 @@
+"""Append-only journal of ComfyUI jobs, one JSON object per line.
+
+Each line records a job (render cache key + output path) moving to a new
+state: "submitted" (with prompt_id, api and client_id), "done" or "failed".
+A restarted run replays it to find prompts that are still queued on, or
+already rendered by, the server and adopts them instead of resubmitting.
+"""
+
+import json, os, time
+
+from render_cache import CACHE_DIR
+
+JOURNAL_PATH = os.path.join(CACHE_DIR, "journal.jsonl")
+
+
+class JobJournal:
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self._file = None
+
+    def latest(self) -> dict[tuple[str, str], dict]:
+        """Last record per (key, out_path)."""
+        state = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    state[(rec["key"], rec["out_path"])] = rec
+        except FileNotFoundError:
+            pass
+        return state
+
+    def record(self, key: str, out_path: str, state: str, **fields) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        rec = {"key": key, "out_path": out_path, "state": state, "at": time.time(), **fields}
+        self._file.write(json.dumps(rec) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
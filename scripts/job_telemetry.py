@@ -0,0 +1,125 @@
+"""Per-job timing for ComfyUI runs, appended to a JSONL log.
+
+Each rendered (or failed) image gets one line with wall-clock timestamps:
+submit (POST /prompt sent), queued (prompt accepted), exec_start and
+exec_end (websocket events or the history status messages),
+download_start / download_end, and qa_end when the QA gate or a
+candidate pick looked at the image.
+summary() turns a run into per-phase p50/p95/max, images per minute and
+GPU idle time per backend.
+"""
+
+import json, math, os, time, uuid
+
+from render_cache import CACHE_DIR
+
+TELEMETRY_PATH = os.path.join(CACHE_DIR, "telemetry.jsonl")
+
+# (label, from, to) pairs reported by summary()
+PHASES = [
+    ("submit", "submit", "queued"),
+    ("queue wait", "queued", "exec_start"),
+    ("execution", "exec_start", "exec_end"),
+    ("noticed after", "exec_end", "download_start"),
+    ("download", "download_start", "download_end"),
+    ("check / pick", "download_end", "qa_end"),
+    ("total", "submit", "download_end"),
+]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+class Telemetry:
+    def __init__(self, path: str = TELEMETRY_PATH):
+        self.path = path
+        self.run = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.prompts: dict[str, dict] = {}  # prompt_id -> times shared by its images
+        self.records: list[dict] = []
+        self._file = None
+
+    def mark(self, prompt_id: str, phase: str | None = None, at: float | None = None, **fields) -> None:
+        """Record when a prompt reached `phase` (plus any fields); the first report wins."""
+        times = self.prompts.setdefault(prompt_id, {})
+        if phase is not None:
+            times.setdefault(phase, time.time() if at is None else at)
+        for k, v in fields.items():
+            times.setdefault(k, v)
+
+    def observe(self, prompt_id: str, kind: str, data: dict) -> None:
+        """CompletionWatcher on_progress hook: websocket events and history entries."""
+        # Events carry the server's time (ms) when ComfyUI is new enough; otherwise it is when they arrived
+        stamp = data.get("timestamp")
+        at = stamp / 1000 if stamp is not None else None
+        if kind == "execution_start":
+            self.mark(prompt_id, "exec_start", at)
+        elif kind == "execution_success":
+            self.mark(prompt_id, "exec_end", at)
+        elif kind == "history":
+            # Server-side timestamps (ms); they matter when we only poll
+            for name, info in (data.get("status") or {}).get("messages", []):
+                stamp = (info or {}).get("timestamp")
+                if stamp is None:
+                    continue
+                if name == "execution_start":
+                    self.mark(prompt_id, "exec_start", stamp / 1000)
+                elif name in ("execution_success", "execution_error", "execution_interrupted"):
+                    self.mark(prompt_id, "exec_end", stamp / 1000)
+
+    def record(self, prompt_id: str, job, state: str, **fields) -> None:
+        """Write one image's line: the prompt's times plus this image's own."""
+        rec = {"run": self.run, "label": job.label, "out_path": job.out_path, "key": job.key, "seed": job.seed,
+               "prompt_id": prompt_id, "state": state, **self.prompts.get(prompt_id, {}), **fields}
+        self.records.append(rec)
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(rec) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> list[str]:
+        done = [r for r in self.records if r["state"] == "done"]
+        if not done:
+            return []
+        lines = [f"=== Timing per image (s)  {'p50':>7} {'p95':>7} {'max':>7}   n ==="]
+        for label, start, end in PHASES:
+            spans = [r[end] - r[start] for r in done if r.get(start) is not None and r.get(end) is not None]
+            if spans:
+                lines.append(f"  {label:<22} {percentile(spans, 50):7.2f} {percentile(spans, 95):7.2f} {max(spans):7.2f} {len(spans):>4}")
+
+        first = min(r.get("submit") or r["download_start"] for r in done)
+        last = max(r["download_end"] for r in done)
+        span = last - first
+        rate = len(done) / span * 60 if span > 0 else 0.0
+        lines.append(f"=== {len(done)} images in {span:.1f} s: {rate:.1f} images/min ===")
+
+        # Idle GPU: gaps between our executions on each backend while the run was going
+        by_api: dict[str, dict[str, tuple[float, float]]] = {}
+        for r in done:
+            if r.get("exec_start") is not None and r.get("exec_end") is not None:
+                intervals = by_api.setdefault(r.get("api", "?"), {})
+                _, end = intervals.get(r["prompt_id"], (None, r["exec_end"]))
+                intervals[r["prompt_id"]] = (r["exec_start"], max(end, r["exec_end"]))
+        for api, intervals in sorted(by_api.items()):
+            busy, cursor = 0.0, None
+            for start, end in sorted(intervals.values()):
+                if cursor is None or start > cursor:
+                    busy += end - start
+                    cursor = end
+                elif end > cursor:
+                    busy += end - cursor
+                    cursor = end
+            begin = min(r.get("submit") or r["exec_start"] for r in done if r["prompt_id"] in intervals)
+            window = max(end for _, end in intervals.values()) - begin
+            idle = max(window - busy, 0.0)
+            share = idle / window * 100 if window > 0 else 0.0
+            lines.append(f"  GPU idle {idle:6.1f} s of {window:6.1f} s ({share:.0f}%)  {api}")
+        return lines
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Resolve every word in the word lists against the dictionaries ahead of time.
+
+fetchWordData() in src/utils/audioUtils.ts asks Merriam-Webster (four
+references), the Free Dictionary API and, as a fallback, Wiktionary for
+one word at a time from the browser, so adding a 20-word list means dozens
+of sequential round-trips. This runs the same lookups for every word in
+data.json (or default-data.json) in bulk, keeping connections open per
+host, a bounded number of words in flight and a request rate per source,
+and merges the answers with the same rules as fetchWordData(). The result
+is one compact file, dictionary.json next to data.json, keyed by word with
+WordEntry fields. server.ts serves it whole at GET /api/dictionary, and
+fetchWordData() uses a word's entry from it (unless a source failed for
+that word, or it has no definition) before asking any dictionary.
+
+Words already in the index are skipped unless a source failed for them or
+the entry is older than --max-age days. MW keys come from the environment
+or .env (VITE_MW_*_API_KEY, as for the app); references without a key are
+skipped. --api-base points every source at a stand-in (fake_dictionary.py).
+"""
+
+import argparse, asyncio, html, json, os, re, sys, time, urllib.parse
+
+from http_pool import Backoff, HTTPPool, load_env
+from word_lists import REPO_DIR, data_path, list_words
+
+INDEX_FILE = os.path.join(REPO_DIR, "dictionary.json")
+USER_AGENT = "spelling-bee-prefetch/1.0 (offline word list cache)"  # Wikimedia asks for one
+
+# Base URL, requests per second; the public APIs publish no hard limits, so stay polite
+SOURCES = {
+    "mw": ("https://www.dictionaryapi.com", 5.0),
+    "free": ("https://api.dictionaryapi.dev", 2.0),
+    "wiktionary": ("https://en.wiktionary.org", 10.0),
+}
+# src/config/dictionaries.ts, in the order fetchMWEntry() prefers them
+MW_REFS = [("sd2", "VITE_MW_ELEMENTARY_API_KEY"), ("sd3", "VITE_MW_INTERMEDIATE_API_KEY"),
+           ("learners", "VITE_MW_LEARNERS_API_KEY"), ("collegiate", "VITE_MW_COLLEGIATE_API_KEY")]
+MW_AUDIO_BASE = "https://media.merriam-webster.com/audio/prons/en/us/mp3"
+
+# ─── Normalizing (ported from audioUtils.ts) ─────────────────────────
+
+SUFFIXES = ["ically", "ously", "ively", "fully", "lessly", "ingly", "edly", "ably", "ibly",
+            "ation", "ition", "ness", "ment", "ence", "ance", "able", "ible",
+            "ful", "less", "ous", "ive", "ity",
+            "ing", "ly", "ed", "er", "est", "en", "al", "es", "s"]
+
+
+def encode_uri_component(text: str) -> str:
+    return urllib.parse.quote(text, safe="!*'()~")
+
+
+def strip_html(text: str) -> str:
+    return html.unescape(re.sub(r"\n.*", "", re.sub(r"<[^>]+>", "", text)).strip())
+
+
+def word_stems(word: str) -> set[str]:
+    lower = word.lower()
+    stems = {lower}
+    for suffix in SUFFIXES:
+        if lower.endswith(suffix) and len(lower) - len(suffix) >= 3:
+            stem = lower[:-len(suffix)]
+            stems.add(stem)
+            if len(stem) >= 4 and stem[-1] == stem[-2]:
+                stems.add(stem[:-1])  # "running" -> "runn" -> "run"
+            if stem.endswith("i"):
+                stems.add(stem[:-1] + "y")  # "happiness" -> "happi" -> "happy"
+    return stems
+
+
+def references_word(word: str, definition: str) -> bool:
+    """True if the definition is circular ("night" for "nighttime", "a running thing" for "run")."""
+    lower = definition.lower()
+    return lower in word.lower() or any(stem in lower for stem in word_stems(word))
+
+
+def mw_audio_url(filename: str) -> str:
+    if filename.startswith("bix"):
+        subdir = "bix"
+    elif filename.startswith("gg"):
+        subdir = "gg"
+    elif filename[:1].isdigit():
+        subdir = "number"
+    else:
+        subdir = filename[0]
+    return f"{MW_AUDIO_BASE}/{subdir}/{filename}.mp3"
+
+
+def empty_entry() -> dict:
+    return {"definition": "", "partOfSpeech": "", "example": "", "audioUrl": None, "phonetic": ""}
+
+
+def from_mw(data, word: str) -> dict | None:
+    """fetchMWFrom(): None when MW answers with suggestions instead of entries."""
+    if not isinstance(data, list) or not data or isinstance(data[0], str):
+        return None
+    entry = data[0]
+    audio_url = None
+    headword = re.sub(r":.*$", "", entry.get("meta", {}).get("id", "")).lower()
+    audio = ((entry.get("hwi", {}).get("prs") or [{}])[0].get("sound") or {}).get("audio")
+    if audio and headword == word.lower():
+        audio_url = mw_audio_url(audio)
+    definition = next((html.unescape(sd) for e in data if isinstance(e, dict) for sd in e.get("shortdef", [])
+                       if not references_word(word, html.unescape(sd))), "")
+    return {**empty_entry(), "definition": definition, "partOfSpeech": entry.get("fl", ""), "audioUrl": audio_url}
+
+
+def from_free(data, word: str) -> dict:
+    """extractWordEntry()."""
+    if not isinstance(data, list) or not data:
+        return empty_entry()
+    entry = data[0]
+    phonetics = entry.get("phonetics") or []
+    audio_url = (next((p["audio"] for p in phonetics if p.get("audio") and "-us" in p["audio"]), None)
+                 or next((p["audio"] for p in phonetics if p.get("audio")), None))
+    phonetic = entry.get("phonetic") or next((p["text"] for p in phonetics if p.get("text")), "")
+    meanings = entry.get("meanings") or []
+    for meaning in meanings:
+        for d in meaning.get("definitions", []):
+            if not d.get("definition"):
+                continue
+            cleaned = html.unescape(d["definition"])
+            if references_word(word, cleaned):
+                continue
+            return {"definition": cleaned, "partOfSpeech": meaning.get("partOfSpeech", ""),
+                    "example": html.unescape(d.get("example", "")), "audioUrl": audio_url, "phonetic": phonetic}
+    return {**empty_entry(), "partOfSpeech": meanings[0].get("partOfSpeech", "") if meanings else "",
+            "audioUrl": audio_url, "phonetic": phonetic}
+
+
+def from_wiktionary(data, word: str, pos: str | None = None) -> str | None:
+    """fetchWiktionaryDefinition(): up to two non-circular senses, preferring `pos`."""
+    entries = (data or {}).get("en") or []
+
+    def senses(entry: dict) -> str | None:
+        defs = [d for d in (strip_html(x.get("definition", "")) for x in entry.get("definitions", []))
+                if d and not references_word(word, d)][:2]
+        return "; ".join(defs) or None
+
+    if pos:
+        match = next((e for e in entries if e.get("partOfSpeech", "").lower() == pos.lower()), None)
+        if match and (found := senses(match)):
+            return found
+    return next((found for e in entries if (found := senses(e))), None)
+
+# ─── Fetching ────────────────────────────────────────────────────────
+
+class RateLimit:
+    """Spaces request starts 1/rate seconds apart (`async with` waits for the next
+    slot). A 429 pushes the next slot back and halves the rate for the rest of the run."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next = 0.0
+        self.paused_until = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self.next)
+        self.next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def __aenter__(self) -> None:
+        await self.wait()
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        if now >= self.paused_until:  # the first 429 of a burst, not the ones already in flight
+            self.interval = min(max(self.interval * 2, 0.05), 10.0)
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.next = max(self.next, self.paused_until)
+
+
+class AuthError(ValueError):
+    pass
+
+
+class Source:
+    def __init__(self, base_url: str, rate: float, connections: int = 4, retries: int = 4, backoff: float = 1.0):
+        self.pool = HTTPPool(base_url, size=connections, timeout=30.0)
+        self.prefix = urllib.parse.urlsplit(base_url).path.rstrip("/")
+        self.limit = RateLimit(rate)
+        self.retry = Backoff(retries, backoff, on_throttle=self.limit.pause)
+
+    @property
+    def throttled(self) -> int:
+        return self.retry.throttled
+
+    async def get_json(self, path: str):
+        """Parsed JSON of a 200, None for a 404; ValueError once retries run out."""
+        headers = {"Accept": "application/json", "User-Agent": USER_AGENT}
+        status, _, data = await self.retry.request(self.pool, "GET", self.prefix + path, None, headers,
+                                                   gate=lambda: self.limit)
+        if status == 200:
+            return json.loads(data)
+        if status == 404:
+            return None
+        error = f"HTTP {status}: {data[:120].decode(errors='replace')}"
+        if status in (401, 403):
+            raise AuthError(error)
+        raise ValueError(error)  # bad key or request: retrying won't help
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class Prefetcher:
+    def __init__(self, sources: dict[str, Source], mw_keys: dict[str, str]):
+        self.sources = sources
+        self.mw_keys = mw_keys
+        self.rejected: dict[str, str] = {}  # MW reference -> why its key was refused
+
+    async def _get(self, name: str, path: str, errors: list[str]):
+        try:
+            return await self.sources[name].get_json(path)
+        except ValueError as e:
+            if isinstance(e, AuthError) and name == "mw":
+                raise
+            errors.append(f"{name}: {e}")
+            return None
+
+    async def mw(self, ref: str, word: str, errors: list[str]) -> dict | None:
+        """One MW reference; a refused key drops the reference for the rest of the run, as the
+        app treats a missing key."""
+        if ref in self.rejected:
+            return None
+        path = f"/api/v3/references/{ref}/json/{encode_uri_component(word.lower())}?key={self.mw_keys[ref]}"
+        try:
+            return from_mw(await self._get("mw", path, errors), word)
+        except AuthError as e:
+            if ref not in self.rejected:
+                self.rejected[ref] = str(e)
+                print(f"  WARNING: MW {ref} key refused ({e}); skipping that reference")
+            return None
+
+    async def free(self, word: str, errors: list[str]) -> dict:
+        return from_free(await self._get("free", f"/api/v2/entries/en/{encode_uri_component(word.lower())}", errors), word)
+
+    async def wiktionary(self, word: str, errors: list[str], pos: str | None = None) -> str | None:
+        data = await self._get("wiktionary", f"/api/rest_v1/page/definition/{encode_uri_component(word)}", errors)
+        return from_wiktionary(data, word, pos)
+
+    async def lookup(self, word: str) -> dict:
+        """fetchWordData(): MW for the definition, Free Dictionary for example and phonetics,
+        Wiktionary only when neither had a definition."""
+        errors: list[str] = []
+        *mw_results, free = await asyncio.gather(*(self.mw(ref, word, errors) for ref in self.mw_keys
+                                                   if ref not in self.rejected),
+                                                 self.free(word, errors))
+        best = next((r for r in mw_results if r and r["definition"]), None) or next((r for r in mw_results if r), None)
+        if best and not best["audioUrl"]:
+            best = {**best, "audioUrl": next((r["audioUrl"] for r in mw_results if r and r["audioUrl"]), None)}
+        result = {
+            "definition": (best or {}).get("definition") or free["definition"],
+            "partOfSpeech": (best or {}).get("partOfSpeech") or free["partOfSpeech"],
+            "example": free["example"],
+            "audioUrl": (best or {}).get("audioUrl") or free["audioUrl"],
+            "phonetic": free["phonetic"],
+        }
+        proper = word[:1] != word[:1].lower()
+        if proper and not result["definition"]:
+            result["definition"] = await self.wiktionary(word, errors, "Proper noun") or f"{word} (proper noun)"
+            result["partOfSpeech"] = "proper noun"
+        elif not result["definition"]:
+            result["definition"] = await self.wiktionary(word.lower(), errors) or ""
+        result["fetchedAt"] = int(time.time())
+        if errors:
+            result["errors"] = errors
+        return result
+
+    async def close(self) -> None:
+        for source in self.sources.values():
+            await source.close()
+
+# ─── Main ────────────────────────────────────────────────────────────
+
+def write_index(path: str, words: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": 1, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                   "words": dict(sorted(words.items()))}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+async def prefetch(todo: list[str], prefetcher: Prefetcher, concurrency: int, index: dict, save) -> int:
+    """Look up every word in `todo` into `index`, saving every 25 words; the number that had errors."""
+    slots = asyncio.Semaphore(concurrency)
+    done = failed = 0
+
+    async def one(word: str) -> None:
+        nonlocal done, failed
+        async with slots:
+            entry = await prefetcher.lookup(word)
+        index[word] = entry
+        done += 1
+        if entry.get("errors"):
+            failed += 1
+            print(f"  PARTIAL: {word} ({'; '.join(entry['errors'])})")
+        else:
+            print(f"  {word}: {entry['partOfSpeech'] or '?'}, {entry['definition'][:60]!r}"
+                  + (", audio" if entry["audioUrl"] else ""))
+        if done % 25 == 0:
+            save()
+        sys.stdout.flush()
+
+    try:
+        await asyncio.gather(*(one(word) for word in todo))
+    finally:
+        await prefetcher.close()
+    return failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="app data file (default: data.json, else default-data.json)")
+    parser.add_argument("--list", action="append", dest="lists", metavar="ID", help="only this word list id (repeatable)")
+    parser.add_argument("--out", default=INDEX_FILE, help="index file (default: dictionary.json in the repo)")
+    parser.add_argument("--api-base", help="send every source to this base URL instead (a stand-in server)")
+    parser.add_argument("--concurrency", type=int, default=8, help="words in flight (default 8)")
+    for name, (_, rate) in SOURCES.items():
+        parser.add_argument(f"--{name}-rate", type=float, default=rate, help=f"{name} requests per second (default {rate:g})")
+    parser.add_argument("--retries", type=int, default=4, help="retries per request on 429/5xx/network errors (default 4)")
+    parser.add_argument("--max-age", type=float, default=90, help="refetch entries older than this many days (default 90)")
+    parser.add_argument("--refresh", action="store_true", help="refetch every word")
+    args = parser.parse_args()
+
+    data_file = data_path(args.data)
+    words = list(dict.fromkeys(word.strip() for word in list_words(data_file, args.lists)))
+    try:
+        with open(args.out) as f:
+            index = json.load(f).get("words", {})
+    except (OSError, ValueError):
+        index = {}
+    stale_before = time.time() - args.max_age * 86400
+    todo = [w for w in words if args.refresh or w not in index or index[w].get("errors")
+            or index[w].get("fetchedAt", 0) < stale_before]
+    print(f"=== Dictionary: {len(words)} words in {os.path.basename(data_file)}, "
+          f"{len(words) - len(todo)} indexed, {len(todo)} to fetch ===")
+    sys.stdout.flush()
+    if not todo:
+        return 0
+
+    env = {**load_env(os.path.join(REPO_DIR, ".env")), **os.environ}
+    mw_keys = {ref: env[var] for ref, var in MW_REFS if env.get(var)}
+    if not mw_keys:
+        print("  no VITE_MW_*_API_KEY set: Free Dictionary and Wiktionary only")
+    sources = {name: Source(args.api_base or base, getattr(args, f"{name}_rate"), retries=args.retries)
+               for name, (base, _) in SOURCES.items()}
+
+    started = time.time()
+    failed = asyncio.run(prefetch(todo, Prefetcher(sources, mw_keys), args.concurrency, index,
+                                  lambda: write_index(args.out, index)))
+    write_index(args.out, index)
+
+    defined = sum(1 for w in words if index.get(w, {}).get("definition"))
+    throttled = sum(s.throttled for s in sources.values())
+    print(f"=== {len(todo)} looked up in {time.time() - started:.1f} s "
+          f"({', '.join(f'{n} {s.pool.requests} requests on {s.pool.connections_opened} connections' for n, s in sources.items())})"
+          + (f", throttled {throttled}x" if throttled else "") + " ===")
+    print(f"  {defined}/{len(words)} words defined, {failed} with source errors (retried next run), "
+          f"{os.path.getsize(args.out) / 1e3:.0f} KB in {args.out}")
+    sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
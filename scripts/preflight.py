@@ -0,0 +1,93 @@
+"""Check workflow graphs against a ComfyUI server's /object_info before queueing.
+
+/object_info describes every node class the server has: its required and
+optional inputs, their types, numeric ranges and, for model, LoRA, sampler
+and scheduler pickers, the allowed values (the files actually on disk).
+A misspelled or missing name would otherwise fail each prompt one at a
+time on the GPU box. The snapshot is several MB, so it is cached per
+server under the render cache for `ttl` seconds.
+"""
+
+import json, os, time, urllib.parse
+
+from render_cache import CACHE_DIR
+
+OBJECT_INFO_TTL = 3600.0
+
+
+def snapshot_path(api: str, cache_dir: str = CACHE_DIR) -> str:
+    u = urllib.parse.urlsplit(api)
+    return os.path.join(cache_dir, "object_info", f"{u.hostname}_{u.port or 80}.json")
+
+
+async def object_info(client, cache_dir: str = CACHE_DIR, ttl: float = OBJECT_INFO_TTL, refresh: bool = False) -> dict | None:
+    """The server's /object_info, from the local snapshot while it is younger than `ttl`.
+    None if the server does not answer it (then nothing can be checked)."""
+    path = snapshot_path(client.api, cache_dir)
+    if not refresh:
+        try:
+            if time.time() - os.path.getmtime(path) < ttl:
+                with open(path) as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+    try:
+        info = await client.get_json("/object_info")
+    except Exception:
+        return None
+    if not isinstance(info, dict):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(info, f)
+    os.replace(tmp, path)
+    return info
+
+
+def choices(spec) -> list | None:
+    """Allowed values of an input spec: old style [[...], opts] or "COMBO" with {"options": [...]}."""
+    if not isinstance(spec, list) or not spec:
+        return None
+    if isinstance(spec[0], list):
+        return spec[0]
+    if spec[0] == "COMBO" and len(spec) > 1 and isinstance(spec[1], dict):
+        return spec[1].get("options")
+    return None
+
+
+def validate(workflow: dict, info: dict) -> list[str]:
+    """Everything about `workflow` this server would reject, as readable problems."""
+    graph = workflow.get("prompt", workflow)
+    problems = []
+    for node_id, node in graph.items():
+        cls = node.get("class_type")
+        where = f"node {node_id} ({cls})"
+        if cls not in info:
+            problems.append(f"{where}: unknown node class")
+            continue
+        spec = info[cls].get("input", {})
+        known = {**spec.get("optional", {}), **spec.get("required", {})}
+        inputs = node.get("inputs", {})
+        for name in spec.get("required", {}):
+            if name not in inputs:
+                problems.append(f"{where}: missing input {name!r}")
+        for name, value in inputs.items():
+            if name not in known:
+                if name not in spec.get("hidden", {}):
+                    problems.append(f"{where}: unknown input {name!r}")
+                continue
+            if isinstance(value, list):
+                if len(value) != 2 or str(value[0]) not in graph:
+                    problems.append(f"{where}: input {name!r} links to missing node {value[0]!r}")
+                continue
+            allowed = choices(known[name])
+            if allowed is not None:
+                if value not in allowed:
+                    problems.append(f"{where}: {name} {value!r} is not on the server")
+                continue
+            opts = known[name][1] if len(known[name]) > 1 and isinstance(known[name][1], dict) else {}
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if "min" in opts and value < opts["min"] or "max" in opts and value > opts["max"]:
+                    problems.append(f"{where}: {name} {value} outside {opts.get('min')}..{opts.get('max')}")
+    return problems
@@ -0,0 +1,71 @@
+"""Content-addressed cache of rendered ComfyUI images.
+
+The key is a hash of the full workflow graph (prompt, seed, model/LoRA
+names, steps, guidance, resolution...) minus SaveImage's filename_prefix,
+which only names the file. Entries live under <root>/<key[:2]>/<key>.png
+with a <key>.json metadata file beside them.
+"""
+
+import copy, hashlib, json, os, shutil, time
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".render-cache")
+
+
+def cache_key(workflow: dict) -> str:
+    graph = copy.deepcopy(workflow.get("prompt", workflow))
+    for node in graph.values():
+        if node.get("class_type") == "SaveImage":
+            node["inputs"].pop("filename_prefix", None)
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = root
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{ext}")
+
+    def meta(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key, "json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(self._path(key, "png")) else None
+
+    def status(self, key: str, out_path: str) -> str:
+        """"fresh" if out_path already holds the cached render, "cached" if it can be
+        restored from the cache, "miss" if it has to be rendered."""
+        meta = self.meta(key)
+        if meta is None:
+            return "miss"
+        if os.path.exists(out_path) and file_sha256(out_path) == meta["sha256"]:
+            return "fresh"
+        return "cached"
+
+    def restore(self, key: str, out_path: str) -> None:
+        tmp = f"{out_path}.tmp"
+        shutil.copyfile(self._path(key, "png"), tmp)
+        os.replace(tmp, out_path)
+
+    def store(self, key: str, src_path: str, **meta) -> None:
+        os.makedirs(os.path.dirname(self._path(key, "png")), exist_ok=True)
+        # Copy, never link: later renders overwrite the output file in place
+        tmp = self._path(key, "png.tmp")
+        shutil.copyfile(src_path, tmp)
+        os.replace(tmp, self._path(key, "png"))
+        meta.update(key=key, sha256=file_sha256(src_path), bytes=os.path.getsize(src_path),
+                    rendered_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"))
+        with open(self._path(key, "json.tmp"), "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(self._path(key, "json.tmp"), self._path(key, "json"))
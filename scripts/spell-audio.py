@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Build one spelled-out audio clip per word from public/audio/letters.
+
+The app spells a word by playing letters/<x>.mp3 clips one after another
+(capital.mp3 first for an uppercase letter), one fetch/decode/start per
+letter. This joins them ahead of time: every letter clip is decoded once,
+trimmed and loudness-normalized the same way as compress-audio.py, and
+each word in data.json / default-data.json becomes a single clip with
+even spacing (GAP_MS between letters, CAPITAL_GAP_MS after "capital",
+WORD_GAP_MS at a space or hyphen), encoded to Opus and MP3 in
+public/audio/spelled/. spelled/manifest.json maps each word to its files.
+
+The letter clips and settings are hashed together; only words that are
+new, or every word when that hash changes, are rebuilt, on a process
+pool. Clips of words no list has any more are removed. Requires ffmpeg
+on PATH.
+"""
+
+import argparse, array, hashlib, json, os, re, shutil, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_clips import ENCODERS, PAD_MS, PEAK_DBFS, SILENCE_DBFS, TARGET_DBFS, analyze, encode
+from render_cache import file_sha256
+from word_lists import REPO_DIR, data_path, load_word_lists
+
+LETTERS_DIR = os.path.join(REPO_DIR, "public", "audio", "letters")
+OUT_DIR = os.path.join(REPO_DIR, "public", "audio", "spelled")
+
+RATE = 24000            # mono; the MP3 encoder resamples to this anyway
+GAP_MS = 150            # between letters, as useSpeech.ts waits after each one
+CAPITAL_GAP_MS = 100    # between "capital" and its letter
+WORD_GAP_MS = 400       # at a space or hyphen
+
+
+def decode(path: str) -> array.array:
+    """An audio file as native-endian 16-bit mono PCM at RATE."""
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(RATE), "-"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode:
+        raise RuntimeError(f"ffmpeg {os.path.basename(path)}: {result.stderr.decode(errors='replace').strip()}")
+    samples = array.array("h", result.stdout)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def load_letters(letters_dir: str) -> dict[str, array.array]:
+    """Every clip in letters_dir (a.mp3 ... z.mp3, capital.mp3), trimmed and normalized."""
+    clips = {}
+    for filename in sorted(os.listdir(letters_dir)):
+        name, ext = os.path.splitext(filename)
+        if ext != ".mp3":
+            continue
+        samples = decode(os.path.join(letters_dir, filename))
+        start, end, gain = analyze(samples, RATE, 1)
+        clips[name] = array.array("h", (max(-32768, min(32767, round(s * gain))) for s in samples[start:end]))
+    return clips
+
+
+def spelled_name(word: str) -> str:
+    """Output file stem: the word itself when it is plain lowercase, otherwise a safe form
+    plus a short hash, so "Paris" and "paris" stay apart on case-insensitive disks."""
+    if re.fullmatch(r"[a-z0-9]+", word):
+        return word
+    safe = re.sub(r"[^a-z0-9]+", "_", word.lower()).strip("_") or "word"
+    return f"{safe}-{hashlib.sha1(word.encode()).hexdigest()[:6]}"
+
+
+def sequence(word: str, letters: set[str]) -> tuple[list[tuple[str, int]], list[str]]:
+    """(clip, silence after it in ms) steps for a word, and the characters without a clip."""
+    steps, skipped = [], []
+    for ch in word:
+        if ch in " -":
+            if steps:
+                steps[-1] = (steps[-1][0], WORD_GAP_MS)
+            continue
+        if ch.lower() not in letters:
+            skipped.append(ch)
+            continue
+        if ch.isupper() and "capital" in letters:
+            steps.append(("capital", CAPITAL_GAP_MS))
+        steps.append((ch.lower(), GAP_MS))
+    if steps:
+        steps[-1] = (steps[-1][0], 0)
+    return steps, skipped
+
+# ─── Worker processes ────────────────────────────────────────────────
+
+_letters: dict[str, array.array] = {}
+
+def _init(letters: dict[str, array.array]) -> None:
+    global _letters
+    _letters = letters
+
+
+def render(steps: list[tuple[str, int]], out_base: str, formats: list[str]) -> dict:
+    """Join the letter clips with their gaps and encode the result (runs in a worker process)."""
+    pcm = array.array("h")
+    for clip, gap in steps:
+        pcm += _letters[clip]
+        pcm += array.array("h", bytes(RATE * gap // 1000 * 2))
+    if sys.byteorder == "big":
+        pcm.byteswap()
+    outputs = encode(pcm.tobytes(), RATE, 1, out_base, formats)
+    return {"duration": round(len(pcm) / RATE, 3), "outputs": outputs}
+
+# ─── Main ────────────────────────────────────────────────────────────
+
+def digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="app data file (default: data.json, else default-data.json)")
+    parser.add_argument("--letters", default=LETTERS_DIR, help="letter clips (default public/audio/letters)")
+    parser.add_argument("--out", default=OUT_DIR, help="output directory (default public/audio/spelled)")
+    parser.add_argument("--formats", default="opus,mp3", help="comma-separated subset of opus,mp3 (default both)")
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="rebuild every word, even unchanged ones")
+    args = parser.parse_args()
+
+    formats = [fmt for fmt in args.formats.split(",") if fmt]
+    unknown = [fmt for fmt in formats if fmt not in ENCODERS]
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(unknown)}")
+    if shutil.which("ffmpeg") is None:
+        print("ERROR: ffmpeg not found on PATH (brew install ffmpeg / apt install ffmpeg)")
+        return 1
+    word_lists = load_word_lists(data_path(args.data))
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        old = {}
+    letter_files = {name: file_sha256(os.path.join(args.letters, name)) for name in sorted(os.listdir(args.letters))
+                    if name.endswith(".mp3")}
+    settings = digest({"letters": letter_files, "rate": RATE, "gaps": [GAP_MS, CAPITAL_GAP_MS, WORD_GAP_MS],
+                       "formats": formats, "encoders": {fmt: ENCODERS[fmt] for fmt in formats},
+                       "loudness": [TARGET_DBFS, PEAK_DBFS, SILENCE_DBFS, PAD_MS]})
+    old_words = old.get("words", {}) if old.get("settings") == settings and not args.force else {}
+
+    def built(word: str) -> bool:
+        entry = old_words.get(word)
+        return bool(entry) and all(os.path.exists(os.path.join(args.out, o["path"])) for o in entry["outputs"].values())
+
+    lists, words, todo = {}, {}, {}
+    for word_list in word_lists:
+        list_words = sorted({w["word"] for w in word_list.get("words", []) if isinstance(w, dict) and w.get("word")})
+        lists[word_list["id"]] = {"name": word_list.get("name", ""), "words": list_words}
+        for word in list_words:
+            if word in words or word in todo:
+                continue
+            if built(word):
+                words[word] = old_words[word]
+            else:
+                todo[word] = None
+
+    print(f"=== Spelling {len(todo)} words ({len(words)} up to date) from {len(lists)} lists ===")
+    sys.stdout.flush()
+    failed = 0
+    if todo:
+        letters = load_letters(args.letters)
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init, initargs=(letters,)) as pool:
+            futures = {}
+            for word in todo:
+                steps, skipped = sequence(word, set(letters))
+                if skipped:
+                    print(f"  {word}: no clip for {''.join(dict.fromkeys(skipped))!r}, left out")
+                if not steps:
+                    failed += 1
+                    print(f"  FAILED: {word} (nothing to spell)")
+                    continue
+                futures[pool.submit(render, steps, os.path.join(args.out, spelled_name(word)), formats)] = word
+            for future in as_completed(futures):
+                word = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  FAILED: {word} ({e})")
+                    continue
+                words[word] = result
+                print(f"  OK: {word} ({result['duration']:.2f}s)")
+                sys.stdout.flush()
+
+    # Clips of words that left every list
+    keep = {o["path"] for entry in words.values() for o in entry["outputs"].values()}
+    removed = 0
+    for filename in os.listdir(args.out):
+        if filename.endswith(tuple(f".{fmt}" for fmt in ENCODERS)) and filename not in keep:
+            os.unlink(os.path.join(args.out, filename))
+            removed += 1
+
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "settings": settings,
+                   "lists": lists, "words": dict(sorted(words.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, manifest_path)
+
+    print(f"\n=== {len(words)} spelled words in {args.out}" + (f", {removed} stale files removed" if removed else "") + " ===")
+    for fmt in formats:
+        size = sum(entry["outputs"][fmt]["bytes"] for entry in words.values() if fmt in entry["outputs"])
+        print(f"  {fmt:<5} {size / 1e6:6.2f} MB")
+    if failed:
+        print(f"  {failed} FAILED")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,17 @@
+"""Tests for the scripts against the local stand-in servers (fake_comfy.py,
+fake_tts.py, fake_dictionary.py), each started on a free port. Stdlib only:
+
+    cd scripts && python3 -m unittest discover tests
+"""
+
+import importlib.util, os
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(filename: str):
+    """Import one of the hyphenated command-line scripts as a module."""
+    spec = importlib.util.spec_from_file_location(filename[:-len(".py")].replace("-", "_"), os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,28 @@
+"""The stand-in servers on free local ports, for the tests."""
+
+import asyncio, contextlib, threading
+from http.server import ThreadingHTTPServer
+
+
+@contextlib.contextmanager
+def http_server(fake):
+    """Serve a FakeTTS/FakeDictionary from a background thread; yields its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), fake.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.asynccontextmanager
+async def comfy_server(fake):
+    """Serve a FakeComfy on the running event loop; yields its base URL."""
+    server = await fake.start("127.0.0.1", 0)
+    try:
+        yield f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    finally:
+        server.close()
+        await asyncio.sleep(0.05)  # let handlers see their clients hang up before the loop goes away
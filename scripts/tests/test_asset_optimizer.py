@@ -0,0 +1,77 @@
+import contextlib, importlib.util, io, json, os, tempfile, unittest
+
+import asset_optimizer
+from fake_comfy import make_png
+
+
+@unittest.skipUnless(importlib.util.find_spec("PIL"), "needs Pillow")
+class OptimizeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "avocado"))
+        self.write("avocado.png", 1)
+        self.write("avocado/home.png", 2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel: str, seed: int) -> None:
+        with open(os.path.join(self.root, rel), "wb") as f:
+            f.write(make_png(128, seed))
+
+    def optimize(self, **options) -> str:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            failed = asset_optimizer.optimize(self.root, **{"widths": [64, 128], "formats": ["webp"], "workers": 1,
+                                                            **options})
+        self.assertEqual(failed, 0, out.getvalue())
+        return out.getvalue()
+
+    def manifest(self) -> dict:
+        with open(os.path.join(self.root, "variants", "manifest.json")) as f:
+            return json.load(f)["assets"]
+
+    def variant_times(self) -> dict[str, int]:
+        return {v["path"]: os.stat(os.path.join(self.root, v["path"])).st_mtime_ns
+                for entry in self.manifest().values() for v in entry["variants"]}
+
+    def test_writes_every_width_of_every_source(self):
+        self.assertIn("Optimizing 2 of 2", self.optimize())
+        self.assertEqual(sorted(self.variant_times()), [
+            "variants/avocado/base-128.webp", "variants/avocado/base-64.webp",
+            "variants/avocado/home-128.webp", "variants/avocado/home-64.webp"])
+
+    def test_unchanged_sources_are_skipped(self):
+        self.optimize()
+        before = self.variant_times()
+        self.assertIn("Optimizing 0 of 2", self.optimize())
+        self.assertEqual(self.variant_times(), before)
+
+    def test_only_changed_sources_are_encoded_again(self):
+        self.optimize()
+        before = self.variant_times()
+        self.write("avocado/home.png", 3)
+        out = self.optimize()
+        self.assertIn("Optimizing 1 of 2", out)
+        self.assertIn("OK: avocado/home", out)
+        after = self.variant_times()
+        self.assertEqual(after["variants/avocado/base-64.webp"], before["variants/avocado/base-64.webp"])
+
+    def test_new_settings_or_missing_variants_encode_again(self):
+        self.optimize()
+        self.assertIn("Optimizing 2 of 2", self.optimize(widths=[64]))
+        os.unlink(os.path.join(self.root, "variants", "avocado", "home-64.webp"))
+        self.assertIn("Optimizing 1 of 2", self.optimize(widths=[64]))
+
+    def test_variants_of_removed_sources_are_deleted(self):
+        self.optimize()
+        os.unlink(os.path.join(self.root, "avocado", "home.png"))
+        self.assertIn("Optimizing 0 of 1", self.optimize())
+        self.assertEqual(list(self.manifest()), ["avocado/base"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "variants", "avocado"))),
+                         ["base-128.webp", "base-64.webp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import glob, os, unittest
+
+import avatar_catalog
+from tests import SCRIPTS_DIR
+
+CATALOGS = sorted(glob.glob(os.path.join(SCRIPTS_DIR, "avatars*.json")))
+
+
+class CatalogTest(unittest.TestCase):
+    def test_every_catalog_compiles(self):
+        self.assertIn(avatar_catalog.CATALOG_PATH, CATALOGS)
+        for path in CATALOGS:
+            with self.subTest(os.path.basename(path)):
+                targets = avatar_catalog.compile(avatar_catalog.load(path), "/tmp/avatars")
+                self.assertTrue(targets)
+                self.assertEqual(len({t.job.out_path for t in targets}), len(targets))
+                self.assertTrue(all(t.job.name == f"{t.avatar}/{t.pose}" for t in targets))
+
+    def test_offset_seeds_follow_the_pose_order(self):
+        catalog = avatar_catalog.load(os.path.join(SCRIPTS_DIR, "avatars-fix-chess.json"))
+        seeds = {(t.avatar, t.pose): t.job.seed for t in avatar_catalog.compile(catalog)}
+        self.assertEqual(seeds["chess-pawn", "base"], 700100)
+        self.assertEqual(seeds["chess-rook", "options"], 700405)
+        self.assertIn("poses", next(iter(avatar_catalog.compile(catalog))).inputs)
+
+    def test_shared_scene_set(self):
+        catalog = avatar_catalog.load(os.path.join(SCRIPTS_DIR, "avatars-fix-chess-v2.json"))
+        targets = [t for t in avatar_catalog.compile(catalog) if t.pose == "quiz"]
+        self.assertEqual(len(targets), 4)
+        self.assertTrue(all(t.job.prompt.endswith(", under a dramatic single spotlight from above, intense focus, "
+                                                  "Pixar style 3D render, clean white background") for t in targets))
+        self.assertEqual({t.job.seed for t in targets}, {770001, 770002, 770003, 770004})
+        self.assertIn("scene_sets.chess.quiz", targets[0].inputs)
+
+
+if __name__ == "__main__":
+    unittest.main()
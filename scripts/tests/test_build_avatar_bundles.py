@@ -0,0 +1,74 @@
+import json, os, struct, subprocess, sys, tempfile, unittest
+
+from fake_comfy import make_png
+from tests import SCRIPTS_DIR, load_script
+
+bundles = load_script("build-avatar-bundles.py")
+
+
+def unpack(data: bytes) -> dict[str, bytes]:
+    """The images in a bundle by pose, read back the way the app does."""
+    assert data[:4] == bundles.MAGIC
+    (length,) = struct.unpack("!I", data[4:8])
+    index = json.loads(data[8:8 + length])
+    payload = data[8 + length:]
+    return {part["name"]: payload[part["offset"]:part["offset"] + part["length"]] for part in index["parts"]}
+
+
+class BuildBundlesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.images = {"base": make_png(64, 1), "home": make_png(64, 2), "quiz": make_png(64, 3)}
+        os.makedirs(os.path.join(self.root, "avocado"))
+        for pose, data in self.images.items():
+            with open(bundles.part_path(self.root, "avocado", pose, None), "wb") as f:
+                f.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self) -> str:
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "build-avatar-bundles.py"), self.root],
+                             capture_output=True, text=True, timeout=60)
+        self.assertEqual(run.returncode, 0, run.stdout + run.stderr)
+        return run.stdout
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.root, bundles.BUNDLE_DIR, name), "rb") as f:
+            return f.read()
+
+    def test_bundle_holds_every_image_in_pose_order(self):
+        data, included = bundles.build_bundle(self.root, "avocado", ["base", "home", "learn", "quiz"], None)
+        self.assertEqual(included, ["base", "home", "quiz"])
+        self.assertEqual(unpack(data), self.images)
+
+    def test_same_images_build_the_same_bytes(self):
+        first, _ = bundles.build_bundle(self.root, "avocado", ["base", "home", "quiz"], None)
+        for pose in self.images:  # new mtimes, same content
+            path = bundles.part_path(self.root, "avocado", pose, None)
+            os.utime(path, (0, 0))
+        second, _ = bundles.build_bundle(self.root, "avocado", ["base", "home", "quiz"], None)
+        self.assertEqual(first, second)
+
+    def test_rebuild_rewrites_nothing_until_an_image_changes(self):
+        out = self.build()
+        self.assertIn("Wrote: avocado.bin (3 images", out)
+        self.assertIn("1 avatars, 1 rewritten", out)
+        bundle, index = self.read("avocado.bin"), self.read("index.json")
+        stamp = os.stat(os.path.join(self.root, bundles.BUNDLE_DIR, "avocado.bin")).st_mtime_ns
+
+        self.assertIn("1 avatars, 0 rewritten, 1 unchanged", self.build())
+        self.assertEqual(self.read("avocado.bin"), bundle)
+        self.assertEqual(self.read("index.json"), index)
+        self.assertEqual(os.stat(os.path.join(self.root, bundles.BUNDLE_DIR, "avocado.bin")).st_mtime_ns, stamp)
+
+        with open(bundles.part_path(self.root, "avocado", "home", None), "wb") as f:
+            f.write(make_png(64, 4))
+        self.assertIn("1 avatars, 1 rewritten", self.build())
+        self.assertEqual(unpack(self.read("avocado.bin"))["home"], make_png(64, 4))
+        self.assertNotEqual(self.read("index.json"), index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,402 @@
+import asyncio, contextlib, importlib.util, io, json, os, subprocess, sys, tempfile, unittest
+from dataclasses import replace
+
+from comfy_runner import (SHARED_NODES, Batch, Job, batch_by_avatar, branch_node, build_batch_workflow, build_workflow,
+                          PREVIEW_SIZE, PREVIEW_STEPS, count_switches, group_by_loaders, pick_candidate, preview_jobs,
+                          run_jobs, select)
+from fake_comfy import MODELS, FakeComfy
+from image_qa import ImageQA, available as qa_available
+from job_journal import JobJournal
+from job_telemetry import Telemetry
+from render_cache import RenderCache
+from tests.servers import comfy_server
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def job(root: str, avatar: str, pose: str) -> Job:
+    out = os.path.join(root, f"{avatar}.png" if pose == "base" else os.path.join(avatar, f"{pose}.png"))
+    return Job(f"{avatar}/{pose}", f"{avatar} {pose}", 7, f"{avatar}_{pose}", out, root=root)
+
+
+class JobNameTest(unittest.TestCase):
+    def test_name_is_relative_to_the_jobs_root(self):
+        self.assertEqual(job("/tmp/avatars", "avocado", "base").name, "avocado/base")
+        self.assertEqual(job("/tmp/avatars", "avocado", "home").name, "avocado/home")
+
+    def test_only_batches_and_previews_use_the_name(self):
+        jobs = [job("/tmp/avatars", a, p) for a in ("avocado", "chess-pawn") for p in ("quiz", "home", "base")]
+        self.assertEqual([j.name for j in select(jobs, ["chess-*/base"])], ["chess-pawn/base"])
+        self.assertEqual([j.name for j in select(jobs, ["avocado"])], ["avocado/quiz", "avocado/home", "avocado/base"])
+        batches = batch_by_avatar(jobs)
+        self.assertEqual([len(b.jobs) for b in batches if isinstance(b, Batch)], [3, 3])
+        self.assertEqual([j.name.split("/")[1] for j in preview_jobs(jobs)][:4], ["base", "base", "home", "home"])
+
+    def test_stdin_job_outside_root_is_refused(self):
+        line = json.dumps({"prompt": "p", "seed": 1, "prefix": "x", "out": "/tmp/elsewhere/avocado.png"})
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "comfy_runner.py"), "--root", "/tmp/avatars"],
+                             input=line, capture_output=True, text=True, timeout=30)
+        self.assertEqual(run.returncode, 2)
+        self.assertIn("is not under /tmp/avatars", run.stdout)
+
+
+class PreviewTest(unittest.TestCase):
+    def test_missing_images_only_base_and_home_first(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RenderCache(os.path.join(tmp, "cache"))
+            jobs = [replace(job(tmp, a, p), candidates=3) for a in ("avocado", "kiwi") for p in ("quiz", "home", "learn", "base")]
+            os.makedirs(os.path.join(tmp, "avocado"))
+            with open(jobs[0].out_path, "wb") as f:  # avocado/quiz is on disk
+                f.write(b"png")
+            cache.store(jobs[6].key, jobs[0].out_path)  # kiwi/learn is in the cache
+            previews = preview_jobs(jobs, cache)
+        self.assertEqual([p.name for p in previews],
+                         ["avocado/base", "kiwi/base", "avocado/home", "kiwi/home", "avocado/learn", "kiwi/quiz"])
+        first = previews[0]
+        self.assertEqual((first.steps, first.size, first.candidates), (PREVIEW_STEPS, PREVIEW_SIZE, 1))
+        self.assertEqual((first.label, first.prefix), ("avocado/base (preview)", "avocado_base_preview"))
+        self.assertEqual(first.out_path, jobs[3].out_path)
+        self.assertNotEqual(first.key, jobs[3].key)
+
+    def test_previews_finish_before_the_full_renders_start(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [job(tmp, "avocado", pose) for pose in ("quiz", "base")]
+            lines = "".join(json.dumps({"prompt": j.prompt, "seed": j.seed, "prefix": j.prefix, "out": j.out_path}) + "\n"
+                            for j in jobs)
+
+            async def run() -> str:
+                async with comfy_server(FakeComfy(latency=0.05)) as api:
+                    proc = await asyncio.create_subprocess_exec(
+                        sys.executable, os.path.join(SCRIPTS_DIR, "comfy_runner.py"), "--api", api, "--preview",
+                        "--root", tmp, "--cache-dir", os.path.join(tmp, "cache"),
+                        "--journal", os.path.join(tmp, "journal.jsonl"), "--telemetry", os.path.join(tmp, "telemetry.jsonl"),
+                        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+                    out, _ = await asyncio.wait_for(proc.communicate(lines.encode()), 60)
+                self.assertEqual(proc.returncode, 0, out.decode())
+                return out.decode()
+
+            out = asyncio.run(run())
+        queued = [line.split("Queued: ")[1].split(" (seed")[0] for line in out.splitlines() if "Queued: " in line]
+        self.assertEqual(queued, ["avocado_base (preview)", "avocado_quiz (preview)", "avocado_quiz", "avocado_base"])
+        self.assertLess(out.index("Queued: avocado_quiz (preview)"), out.index("Refine pass"))
+        self.assertLess(out.index("Refine pass"), out.index("Queued: avocado_quiz (seed"))
+
+
+class GoesDownComfy(FakeComfy):
+    """A server that stops answering after accepting its first prompt (which never finishes)."""
+
+    def route(self, method: str, path: str, query: dict, body: bytes) -> tuple[int, str, bytes]:
+        if self.history or self.pending or self.running:
+            return 503, "text/plain", b"down"
+        return super().route(method, path, query, body)
+
+
+class EventLogComfy(FakeComfy):
+    """Keeps the data of every websocket event it sends, by (type, prompt id)."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.sent: dict[tuple[str, str], dict] = {}
+
+    async def emit(self, client_id: str, kind: str, data: dict) -> None:
+        self.sent[kind, data["prompt_id"]] = data
+        await super().emit(client_id, kind, data)
+
+
+def on_schnell(j: Job) -> Job:
+    """The job on the other UNET, which a FakeComfy(missing={SCHNELL}) cannot run."""
+    return replace(j, loaders={"12": {"unet_name": SCHNELL}})
+
+
+SCHNELL = MODELS["unet"][1]
+
+
+async def render(fakes: list[FakeComfy], jobs: list[Job], cache_dir: str, **options) -> tuple[int, str]:
+    """run_jobs over one fake_comfy per entry in `fakes`: (failed, what it printed)."""
+    async with contextlib.AsyncExitStack() as stack:
+        apis = [await stack.enter_async_context(comfy_server(fake)) for fake in fakes]
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            failed = await asyncio.wait_for(run_jobs(jobs, apis, cache=RenderCache(cache_dir), poll_interval=0.2,
+                                                     **options), 30)
+    return failed, out.getvalue()
+
+
+class MultiBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "avatars")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.jobs = [job(self.root, f"avatar{i}", pose) for i in range(4) for pose in ("base", "home")]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_rendered(self, jobs: list[Job]) -> None:
+        for j in jobs:
+            with open(j.out_path, "rb") as f:
+                self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n", j.name)
+
+    def test_jobs_spread_over_backends(self):
+        fakes = [FakeComfy(latency=0.1, seed=1), FakeComfy(latency=0.1, seed=2)]
+        failed, out = asyncio.run(render(fakes, self.jobs, self.cache_dir))
+        self.assertEqual(failed, 0, out)
+        self.assert_rendered(self.jobs)
+        self.assertTrue(all(fake.history for fake in fakes), out)
+        self.assertEqual(sum(len(fake.history) for fake in fakes), len(self.jobs))
+
+    def test_idle_backend_takes_over_waiting_jobs(self):
+        fakes = [FakeComfy(latency=0.05, seed=1), FakeComfy(latency=1.0, seed=2)]
+        failed, out = asyncio.run(render(fakes, self.jobs, self.cache_dir, node_depth=3))
+        self.assertEqual(failed, 0, out)
+        self.assert_rendered(self.jobs)
+        self.assertIn("Moved ", out)
+        self.assertLess(len(fakes[1].history), 3, out)
+
+    def test_preflight_keeps_jobs_off_a_backend_missing_their_lora(self):
+        fakes = [FakeComfy(latency=0.05, missing={MODELS["lora"][0]}), FakeComfy(latency=0.05)]
+        failed, out = asyncio.run(render(fakes, self.jobs, self.cache_dir))
+        self.assertEqual(failed, 0, out)
+        self.assertEqual(len(fakes[0].history), 0, out)
+        self.assertEqual(len(fakes[1].history), len(self.jobs))
+
+    def test_failures_are_counted_not_retried_elsewhere(self):
+        fakes = [FakeComfy(latency=0.05, failure_rate=1.0), FakeComfy(latency=0.05, failure_rate=1.0)]
+        failed, out = asyncio.run(render(fakes, self.jobs, self.cache_dir))
+        self.assertEqual(failed, len(self.jobs), out)
+        self.assertEqual(sum(len(fake.history) for fake in fakes), len(self.jobs))
+
+    def test_jobs_behind_one_waiting_for_a_busy_node_go_to_an_idle_one(self):
+        # Only the slow node has the UNET the first jobs need; the rest must not wait behind them
+        fakes = [FakeComfy(latency=0.05, missing={SCHNELL}), FakeComfy(latency=0.5)]
+        jobs = [on_schnell(j) for j in self.jobs[:3]] + self.jobs[3:6]
+        failed, out = asyncio.run(render(fakes, jobs, self.cache_dir, node_depth=1))
+        self.assertEqual(failed, 0, out)
+        self.assert_rendered(jobs)
+        self.assertEqual(len(fakes[0].history), 3, out)
+        self.assertEqual(len(fakes[1].history), 3, out)
+        # All three went out while the slow node was still on its first job
+        self.assertLess(out.index("Queued: avatar2/home"), out.index("Queued: avatar0/home"), out)
+
+    def test_jobs_only_a_dead_node_can_run_fail_instead_of_waiting(self):
+        fakes = [GoesDownComfy(latency=60), FakeComfy(latency=0.05, missing={SCHNELL})]
+        jobs = [on_schnell(j) for j in self.jobs[:2]] + self.jobs[2:4]
+        failed, out = asyncio.run(render(fakes, jobs, self.cache_dir, node_depth=1))
+        self.assertEqual(failed, 2, out)
+        self.assertIn("is not answering", out)
+        self.assertEqual(out.count("no node that is still up can run it"), 2, out)
+        self.assert_rendered(jobs[2:])
+
+    def test_an_error_handling_an_image_fails_that_job_and_the_run_ends(self):
+        def on_done(j: Job) -> None:
+            if j.name == "avatar1/base":
+                raise OSError(28, "No space left on device")
+
+        failed, out = asyncio.run(render([FakeComfy(latency=0.05)], self.jobs, self.cache_dir, on_done=on_done))
+        self.assertEqual(failed, 1, out)
+        self.assertIn("FAILED: avatar1/base (OSError: [Errno 28] No space left on device)", out)
+
+    def test_execution_end_comes_from_the_websocket_event(self):
+        fake = EventLogComfy(latency=0.3)
+        telemetry = Telemetry(os.path.join(self.tmp.name, "telemetry.jsonl"))
+        failed, out = asyncio.run(render([fake], self.jobs[:3], self.cache_dir, telemetry=telemetry))
+        self.assertEqual(failed, 0, out)
+        self.assertEqual(len(telemetry.records), 3)
+        for r in telemetry.records:
+            self.assertEqual(r["exec_end"], fake.sent["execution_success", r["prompt_id"]]["timestamp"] / 1000)
+            self.assertGreaterEqual(r["exec_end"] - r["exec_start"], 0.29)
+        self.assertIn("noticed after", out)
+
+
+class LoaderOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = os.path.join(self.tmp.name, "avatars")
+        # Every other avatar is on the other UNET, so the order given swaps models each time
+        jobs = [job(root, f"avatar{i}", "base") for i in range(4)]
+        self.jobs = [on_schnell(j) if i % 2 else j for i, j in enumerate(jobs)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grouping_is_stable_within_each_signature(self):
+        grouped = group_by_loaders(self.jobs)
+        self.assertEqual([j.name for j in grouped], ["avatar0/base", "avatar2/base", "avatar1/base", "avatar3/base"])
+        self.assertEqual(count_switches([j.signature for j in self.jobs]), 3)
+        self.assertEqual(count_switches([j.signature for j in grouped]), 1)
+        self.assertEqual(group_by_loaders(grouped), grouped)
+
+    def test_batches_group_by_their_jobs_weights(self):
+        jobs = [replace(j, out_path=j.out_path.replace(".png", f"/{pose}.png")) for j in self.jobs for pose in ("home", "quiz")]
+        grouped = group_by_loaders(batch_by_avatar(jobs))
+        self.assertEqual([unit.label for unit in grouped],
+                         [f"avatar{i} (2 images)" for i in (0, 2, 1, 3)])
+
+    def test_run_reports_the_switches_it_saved(self):
+        fake = FakeComfy(latency=0.05)
+        failed, out = asyncio.run(render([fake], self.jobs, os.path.join(self.tmp.name, "cache")))
+        self.assertEqual(failed, 0, out)
+        self.assertIn("=== Loaders: 2 model/LoRA configurations, 1 model switches on our queues (3 in the order given) ===", out)
+        queued = [line.split("Queued: ")[1].split(" (seed")[0] for line in out.splitlines() if "Queued: " in line]
+        self.assertEqual(queued, ["avatar0/base", "avatar2/base", "avatar1/base", "avatar3/base"])
+
+
+class BatchPosesTest(unittest.TestCase):
+    def test_each_branch_is_wired_like_a_single_render(self):
+        images = [("avocado base", 7, "avocado_base"), ("avocado home", 7, "avocado_home"), ("avocado quiz", 9, "avocado_quiz")]
+        graph = build_batch_workflow(images, steps=20, size=256)["prompt"]
+        singles = [build_workflow(*image, steps=20, size=256)["prompt"] for image in images]
+        self.assertEqual(len(graph), len(SHARED_NODES) + len(images) * (len(singles[0]) - len(SHARED_NODES)))
+        for i, single in enumerate(singles):
+            for node, spec in single.items():
+                inputs = {k: [branch_node(i, v[0]), v[1]] if isinstance(v, list) else v for k, v in spec["inputs"].items()}
+                self.assertEqual(graph[branch_node(i, node)], {**spec, "inputs": inputs}, (i, node))
+
+    def test_one_prompt_per_avatar(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "avatars")
+            jobs = [job(root, f"avatar{i}", pose) for i in range(2) for pose in ("base", "home", "quiz")]
+            fake = FakeComfy(latency=0.05)
+            failed, out = asyncio.run(render([fake], jobs, os.path.join(tmp, "cache"), batch_poses=True))
+            self.assertEqual(failed, 0, out)
+            self.assertEqual(fake.counts["/prompt"], 2, out)
+            outputs = set()
+            for j in jobs:
+                with open(j.out_path, "rb") as f:
+                    outputs.add(f.read())
+            self.assertEqual(len(outputs), len(jobs))  # every branch saved its own image
+
+
+@unittest.skipUnless(qa_available(), "needs NumPy and Pillow")
+class CandidatesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "avatars")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pick_keeps_the_candidate_that_looks_like_the_avatar(self):
+        import numpy as np
+        from PIL import Image
+        from tests.test_image_qa import avatar
+
+        os.makedirs(os.path.join(self.root, "avocado"))
+        Image.fromarray(avatar(colour=(60, 160, 40))).save(os.path.join(self.root, "avocado.png"))
+        review = os.path.join(self.tmp.name, "candidates", "avocado", "home", "7")
+        os.makedirs(review)
+        paths = [os.path.join(review, f"{i}.png") for i in range(3)]
+        black = np.zeros((512, 512, 3), dtype=np.uint8)
+        for path, rgb in zip(paths, [avatar(colour=(40, 60, 200)), avatar(colour=(70, 150, 50), radius=90), black]):
+            Image.fromarray(rgb).save(path)
+
+        staged = os.path.join(self.tmp.name, "staged", "home.png")
+        result = pick_candidate(ImageQA(), paths, os.path.join(self.root, "avocado", "home.png"), staged)
+        self.assertEqual(result.metrics["candidate"], 1)
+        self.assertTrue(result.ok)
+        with open(staged, "rb") as a, open(paths[1], "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        with open(os.path.join(review, "scores.json")) as f:
+            scores = json.load(f)
+        self.assertEqual(scores["kept"], "1.png")
+        self.assertEqual([c["ok"] for c in scores["candidates"]], [True, True, False])
+        self.assertTrue(os.path.exists(os.path.join(review, "contact-sheet.png")))
+
+    def test_run_keeps_one_image_of_each_latent_batch(self):
+        jobs = [replace(job(self.root, "avocado", pose), candidates=3) for pose in ("base", "home")]
+        cache_dir = os.path.join(self.tmp.name, "cache")
+        failed, out = asyncio.run(render([FakeComfy(latency=0.05)], jobs, cache_dir))
+        self.assertEqual(failed, 0, out)
+        for j in jobs:
+            review = os.path.join(cache_dir, "candidates", *j.name.split("/"), str(j.seed))
+            with open(os.path.join(review, "scores.json")) as f:
+                kept = json.load(f)["kept"]
+            with open(j.out_path, "rb") as a, open(os.path.join(review, kept), "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+
+async def crash_then_rerun(fake: FakeComfy, jobs: list[Job], tmp: str, prompts: int,
+                           *flags: str, **options) -> tuple[int, int, str]:
+    """Run comfy_runner.py on `jobs`, kill it once `prompts` prompts are queued, then rerun the
+    jobs in-process on the same journal: (prompts queued by the rerun, failed, what it printed)."""
+    cache_dir, journal = os.path.join(tmp, "cache"), os.path.join(tmp, "journal.jsonl")
+    lines = "".join(json.dumps({"prompt": j.prompt, "seed": j.seed, "prefix": j.prefix, "out": j.out_path,
+                                "root": j.root}) + "\n" for j in jobs)
+    async with comfy_server(fake) as api:
+        first = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(SCRIPTS_DIR, "comfy_runner.py"), "--api", api, "--node-depth", "10",
+            "--cache-dir", cache_dir, "--journal", journal, "--telemetry", os.path.join(tmp, "telemetry.jsonl"),
+            *flags, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL)
+        first.stdin.write(lines.encode())
+        first.stdin.close()
+        # Kill it once every job's submission is journaled, not just sent: that is what a rerun can adopt
+        while fake.counts.get("/prompt", 0) < prompts or len(JobJournal(journal).latest()) < len(jobs):
+            await asyncio.sleep(0.02)
+        first.kill()
+        await first.wait()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            failed = await asyncio.wait_for(run_jobs(jobs, [api], cache=RenderCache(cache_dir), journal=JobJournal(journal),
+                                                     node_depth=10, poll_interval=0.2, **options), 30)
+    return fake.counts["/prompt"] - prompts, failed, out.getvalue()
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = os.path.join(self.tmp.name, "avatars")
+        self.jobs = [job(root, f"avatar{i}", pose) for i in range(2) for pose in ("base", "home", "quiz")]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_rendered(self) -> None:
+        for j in self.jobs:
+            with open(j.out_path, "rb") as f:
+                self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n", j.name)
+
+    def test_rerun_adopts_queued_jobs_instead_of_resubmitting(self):
+        resubmitted, failed, out = asyncio.run(crash_then_rerun(FakeComfy(latency=0.3), self.jobs, self.tmp.name,
+                                                                len(self.jobs)))
+        self.assertEqual(resubmitted, 0, out)
+        self.assertEqual(failed, 0, out)
+        self.assertEqual(out.count("Adopted from previous run"), len(self.jobs), out)
+        self.assert_rendered()
+
+    def test_rerun_adopts_batched_poses(self):
+        resubmitted, failed, out = asyncio.run(crash_then_rerun(FakeComfy(latency=0.5), self.jobs, self.tmp.name, 2,
+                                                                "--batch-poses", batch_poses=True))
+        self.assertEqual(resubmitted, 0, out)
+        self.assertEqual(failed, 0, out)
+        self.assertIn("Adopted from previous run: avatar0 (3 images)", out)
+        self.assertIn("Adopted from previous run: avatar1 (3 images)", out)
+        self.assert_rendered()
+
+
+@unittest.skipUnless(importlib.util.find_spec("PIL"), "needs Pillow")
+class OptimizeTest(unittest.TestCase):
+    def test_variants_are_refreshed_in_every_root_the_jobs_wrote_to(self):
+        async def render_and_optimize(tmp: str, jobs: list[Job]) -> subprocess.CompletedProcess:
+            lines = "".join(json.dumps({"prompt": j.prompt, "seed": j.seed, "prefix": j.prefix, "out": j.out_path,
+                                        "root": j.root}) + "\n" for j in jobs)
+            async with comfy_server(FakeComfy(latency=0.05)) as api:
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, os.path.join(SCRIPTS_DIR, "comfy_runner.py"), "--api", api, "--optimize",
+                    "--root", os.path.join(tmp, "unused"), "--cache-dir", os.path.join(tmp, "cache"),
+                    "--journal", os.path.join(tmp, "journal.jsonl"), "--telemetry", os.path.join(tmp, "telemetry.jsonl"),
+                    stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+                out, _ = await asyncio.wait_for(proc.communicate(lines.encode()), 60)
+            return subprocess.CompletedProcess(proc, proc.returncode, out.decode())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            roots = [os.path.join(tmp, "avatars"), os.path.join(tmp, "staging")]
+            run = asyncio.run(render_and_optimize(tmp, [job(roots[0], "avocado", "base"), job(roots[1], "kiwi", "home")]))
+            self.assertEqual(run.returncode, 0, run.stdout)
+            for root, name in zip(roots, ("avocado/base", "kiwi/home")):
+                with open(os.path.join(root, "variants", "manifest.json")) as f:
+                    self.assertEqual(list(json.load(f)["assets"]), [name])
+            self.assertFalse(os.path.exists(os.path.join(tmp, "unused")))
+
+
+if __name__ == "__main__":
+    unittest.main()
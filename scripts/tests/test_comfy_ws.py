@@ -0,0 +1,124 @@
+import asyncio, os, tempfile, unittest
+
+from comfy_runner import ComfyClient, Job
+from comfy_ws import CompletionWatcher
+from fake_comfy import FakeComfy
+from tests.servers import comfy_server
+
+
+class NoSocketComfy(FakeComfy):
+    """A server whose /ws refuses the upgrade, like ComfyUI behind a proxy without websockets."""
+
+    async def websocket(self, reader, writer, headers: dict, client_id: str) -> None:
+        writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+
+
+def job(candidates: int = 1) -> Job:
+    return Job("avocado (base)", "an avocado, Pixar style 3D render", 7, "avocado_base", "/unused/avocado.png",
+               candidates=candidates, steps=4, size=64)
+
+
+async def watch(fake: FakeComfy, jobs: list[Job], out_dir: str | None = None, **options) -> dict:
+    """Submit `jobs` to `fake`, watch them to the end; what each callback saw."""
+    seen = {"images": {}, "errors": {}}
+    async with comfy_server(fake) as api:
+        client = ComfyClient(api)
+
+        async def on_image(pid: str, job: Job, images: list[dict]) -> None:
+            seen["images"][pid] = images
+            if out_dir is not None:
+                await client.download(images[0], os.path.join(out_dir, f"{pid}.png"))
+
+        def on_error(pid: str, jobs: list, error: dict) -> None:
+            seen["errors"][pid] = (jobs, error)
+
+        watcher = CompletionWatcher(client, on_image, on_error, **options)
+        for j in jobs:
+            watcher.watch(await client.submit(j.workflow()), j)
+        watcher.close()
+        seen["completed"] = await asyncio.wait_for(watcher.run(), 10)
+        seen["failed"] = watcher.failed
+        await client.close()
+    return seen
+
+
+class CompletionWatcherTest(unittest.TestCase):
+    def test_websocket_events_complete_without_polling(self):
+        fake = FakeComfy(latency=0.3, seed=1)
+        with tempfile.TemporaryDirectory() as out_dir:
+            seen = asyncio.run(watch(fake, [job(), job()], out_dir, poll_interval=30))
+            self.assertEqual(seen["completed"], 2)
+            for pid in seen["images"]:
+                with open(os.path.join(out_dir, f"{pid}.png"), "rb") as f:
+                    self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(fake.counts["/ws"], 1)
+        # The poll interval is far longer than the test: only the sweep on connect reads history
+        self.assertLessEqual(fake.counts.get("/history", 0), 2)
+
+    def test_latent_batch_delivers_every_image(self):
+        seen = asyncio.run(watch(FakeComfy(latency=0.1), [job(candidates=3)], poll_interval=30))
+        [images] = seen["images"].values()
+        self.assertEqual(len(images), 3)
+
+    def test_history_polling(self):
+        fake = FakeComfy(latency=0.1)
+        seen = asyncio.run(watch(fake, [job(), job(), job()], use_ws=False, poll_interval=0.05))
+        self.assertEqual(seen["completed"], 3)
+        self.assertNotIn("/ws", fake.counts)
+        self.assertGreaterEqual(fake.counts["/history"], 3)
+
+    def test_falls_back_to_history_without_websocket(self):
+        fake = NoSocketComfy(latency=0.1)
+        seen = asyncio.run(watch(fake, [job(), job()], poll_interval=0.05))
+        self.assertEqual(seen["completed"], 2)
+        self.assertGreaterEqual(fake.counts["/ws"], 1)
+        self.assertGreaterEqual(fake.counts["/history"], 2)
+
+    def test_execution_error_over_websocket(self):
+        seen = asyncio.run(watch(FakeComfy(latency=0.1, failure_rate=1.0), [job()], poll_interval=30))
+        self.assertEqual(seen["completed"], 0)
+        [(jobs, error)] = seen["errors"].values()
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(error["exception_message"], "fake failure")
+
+    def test_execution_error_from_history(self):
+        seen = asyncio.run(watch(FakeComfy(latency=0.1, failure_rate=1.0), [job(), job()],
+                                 use_ws=False, poll_interval=0.05))
+        self.assertEqual(seen["completed"], 0)
+        self.assertEqual(len(seen["errors"]), 2)
+        self.assertTrue(all(error["exception_message"] == "fake failure" for _, error in seen["errors"].values()))
+
+    def test_download_replaces_the_output_with_the_servers_bytes(self):
+        fake = FakeComfy(latency=0.05, size=256)
+        with tempfile.TemporaryDirectory() as out_dir:
+            seen = asyncio.run(watch(fake, [job()], out_dir, poll_interval=30))
+            (pid, images), = seen["images"].items()
+            path = os.path.join(out_dir, f"{pid}.png")
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), fake.files[images[0]["filename"]])
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+            self.assertEqual(os.listdir(out_dir), [f"{pid}.png"])  # no .part file left behind
+
+    def test_failed_download_is_counted(self):
+        async def broken_view(fake: FakeComfy) -> dict:
+            async with comfy_server(fake) as api:
+                client = ComfyClient(api)
+
+                async def on_image(pid: str, job: Job, images: list[dict]) -> None:
+                    await client.download({**images[0], "filename": "gone.png"}, os.path.join(out_dir, "gone.png"))
+
+                watcher = CompletionWatcher(client, on_image, poll_interval=30)
+                watcher.watch(await client.submit(job().workflow()), job())
+                watcher.close()
+                completed = await asyncio.wait_for(watcher.run(), 10)
+                await client.close()
+                return completed, watcher.failed
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            self.assertEqual(asyncio.run(broken_view(FakeComfy(latency=0.1))), (0, 1))
+            self.assertEqual(os.listdir(out_dir), [])  # the .part file is removed
+
+
+if __name__ == "__main__":
+    unittest.main()
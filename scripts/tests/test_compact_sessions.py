@@ -0,0 +1,99 @@
+import argparse, gzip, json, os, subprocess, sys, tempfile, unittest
+from datetime import datetime, timedelta, timezone
+
+from tests import SCRIPTS_DIR, load_script
+
+compact_sessions = load_script("compact-sessions.py")
+
+NOW = datetime.now(timezone.utc)
+
+
+def session(sid: str, days_ago: float, user: str = "u1") -> dict:
+    date = (NOW - timedelta(days=days_ago)).isoformat()
+    return {"id": sid, "userId": user, "listId": "l1", "mode": "quiz", "date": date, "score": 80,
+            "results": [{"word": "apple", "correct": True}]}
+
+
+class CompactSessionsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sessions = os.path.join(self.tmp.name, "sessions.json")
+        self.archive = os.path.join(self.tmp.name, "session-archive")
+        self.old = [session("a", 200), session("b", 120, user="u2"), session("c", 100)]
+        self.recent = [session("d", 10), session("e", 1)]
+        self.write(self.old + self.recent)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, sessions: list[dict]) -> None:
+        with open(self.sessions, "w") as f:
+            f.write(json.dumps(sessions, indent=2))
+
+    def compact(self, *args: str) -> str:
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "compact-sessions.py"),
+                              "--sessions", self.sessions, "--archive", self.archive, "--keep-days", "90", *args],
+                             capture_output=True, text=True, timeout=30)
+        self.assertEqual(run.returncode, 0, run.stdout + run.stderr)
+        return run.stdout
+
+    def archived(self) -> list[dict]:
+        records = []
+        for name in sorted(os.listdir(self.archive)):
+            if name.endswith(".jsonl.gz"):
+                with gzip.open(os.path.join(self.archive, name), "rt") as f:
+                    records += [json.loads(line) for line in f]
+        return records
+
+    def test_sessions_past_the_cutoff_move_to_monthly_segments(self):
+        out = self.compact()
+        self.assertIn("Archived 3 sessions", out)
+        self.assertEqual(sorted(r["id"] for r in self.archived()), ["a", "b", "c"])
+        months = {(NOW - timedelta(days=d)).strftime("%Y-%m") for d in (200, 120, 100)}
+        self.assertEqual(sorted(os.listdir(self.archive)),
+                         ["rollup.json", *sorted(f"sessions-{m}.jsonl.gz" for m in months)])
+        with open(os.path.join(self.archive, "rollup.json")) as f:
+            rollup = json.load(f)
+        self.assertEqual(rollup["sessions"], 3)
+        self.assertEqual(rollup["users"]["u1"]["words"]["l1:apple"]["attempts"], 2)
+
+    def test_live_file_is_rewritten_in_the_servers_format(self):
+        self.compact()
+        with open(self.sessions) as f:
+            self.assertEqual(f.read(), json.dumps(self.recent, indent=2))  # JSON.stringify(sessions, null, 2)
+
+    def test_rerun_adds_no_duplicates(self):
+        self.compact()
+        # A session the server wrote back while it was also being archived
+        self.write(self.old[:1] + self.recent)
+        out = self.compact()
+        self.assertIn("Archived 1 sessions", out)
+        self.assertIn("(0 new to the archive)", out)
+        self.assertEqual(sorted(r["id"] for r in self.archived()), ["a", "b", "c"])
+        self.assertIn("Archived 0 sessions", self.compact())
+
+    def test_dry_run_writes_nothing(self):
+        self.assertIn("Would archive 3 sessions", self.compact("--dry-run"))
+        self.assertFalse(os.path.exists(self.archive))
+        with open(self.sessions) as f:
+            self.assertEqual(len(json.load(f)), 5)
+
+    def test_replace_loses_the_race_to_a_server_write(self):
+        _, stamp = compact_sessions.read_json(self.sessions, [])
+        self.write(self.old + self.recent + [session("f", 0)])  # the server saved a new session meanwhile
+        self.assertFalse(compact_sessions.replace_if_unchanged(self.sessions, "[]", stamp))
+        with open(self.sessions) as f:
+            self.assertEqual(len(json.load(f)), 6)
+        self.assertEqual(os.listdir(self.tmp.name), ["sessions.json"])
+
+    def test_half_written_file_is_retried_not_fatal(self):
+        args = argparse.Namespace(sessions=self.sessions, archive=self.archive, dry_run=False)
+        for text in ("", '[\n  {\n    "id": "a",'):
+            with open(self.sessions, "w") as f:
+                f.write(text)
+            self.assertIsNone(compact_sessions.compact(args, NOW - timedelta(days=90)))
+        self.assertFalse(os.path.exists(self.archive))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import array, json, math, os, shutil, subprocess, sys, tempfile, unittest, wave
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "compress-audio.py")
+
+
+def write_wav(path: str, seconds: float, rate: int = 44100) -> None:
+    tone = array.array("h", (round(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(seconds * rate))))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(tone.tobytes())
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg on PATH")
+class CompressAudioTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.audio = self.tmp.name
+        self.words = os.path.join(self.audio, "words")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def compress(self, *args: str) -> tuple[int, str, dict]:
+        run = subprocess.run([sys.executable, SCRIPT, self.audio, "--formats", "mp3", "--workers", "2", *args],
+                             capture_output=True, text=True, timeout=120)
+        with open(os.path.join(self.words, "manifest.json")) as f:
+            return run.returncode, run.stdout, json.load(f)["clips"]
+
+    def test_empty_wavs_are_skipped_with_a_warning(self):
+        write_wav(os.path.join(self.audio, "apple.wav"), 0.5)
+        open(os.path.join(self.audio, "blank.wav"), "wb").close()
+        write_wav(os.path.join(self.audio, "silent.wav"), 0)
+        code, out, clips = self.compress()
+        self.assertEqual(code, 0, out)
+        self.assertEqual(list(clips), ["apple"])
+        self.assertIn("WARNING: skipping blank.wav: empty file", out)
+        self.assertIn("WARNING: skipping silent.wav: no audio frames", out)
+
+    def test_outputs_of_deleted_clips_are_pruned(self):
+        for word in ("apple", "banana"):
+            write_wav(os.path.join(self.audio, f"{word}.wav"), 0.3)
+        self.compress()
+        os.unlink(os.path.join(self.audio, "banana.wav"))
+
+        code, out, clips = self.compress("--keep-orphans")
+        self.assertIn("orphan: words/banana.mp3", out)
+        self.assertTrue(os.path.exists(os.path.join(self.words, "banana.mp3")))
+
+        code, out, clips = self.compress()
+        self.assertEqual(code, 0, out)
+        self.assertEqual(list(clips), ["apple"])
+        self.assertEqual(sorted(os.listdir(self.words)), ["apple.mp3", "manifest.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
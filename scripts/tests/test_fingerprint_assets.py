@@ -0,0 +1,87 @@
+import hashlib, json, os, subprocess, sys, tempfile, unittest
+
+from tests import SCRIPTS_DIR
+
+
+class FingerprintAssetsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = self.tmp.name
+        self.write("avatars/avocado.png", b"avocado")
+        self.write("avatars/avocado/home.png", b"avocado at home")
+        self.write("audio/apple.mp3", b"apple")
+        self.write("icons/icon-192.png", b"icon")
+        # Not assets: hidden, half-written and provenance files
+        self.write("avatars/.DS_Store", b"")
+        self.write("avatars/kiwi.png.tmp", b"half")
+        self.write("avatars/avocado.provenance.json", b"{}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel: str, data: bytes) -> None:
+        path = os.path.join(self.public, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def fingerprint(self, *args: str) -> str:
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "fingerprint-assets.py"), self.public, *args],
+                             capture_output=True, text=True, timeout=60)
+        self.assertEqual(run.returncode, 0, run.stdout + run.stderr)
+        return run.stdout
+
+    def manifest(self) -> dict:
+        with open(os.path.join(self.public, "asset-manifest.json")) as f:
+            return json.load(f)
+
+    def hashed_files(self) -> dict[str, int]:
+        root = os.path.join(self.public, "_hashed")
+        return {os.path.relpath(os.path.join(d, f), root): os.stat(os.path.join(d, f)).st_mtime_ns
+                for d, _, files in os.walk(root) for f in files}
+
+    def test_every_asset_gets_a_content_hashed_copy(self):
+        self.assertIn("4 assets", self.fingerprint())
+        assets = self.manifest()["assets"]
+        self.assertEqual(list(assets), ["/audio/apple.mp3", "/avatars/avocado.png", "/avatars/avocado/home.png",
+                                        "/icons/icon-192.png"])
+        digest = hashlib.sha256(b"avocado").hexdigest()
+        self.assertEqual(assets["/avatars/avocado.png"]["url"], f"/_hashed/avatars/avocado.{digest[:10]}.png")
+        self.assertEqual(assets["/avatars/avocado.png"]["sha256"], digest)
+        for asset in assets.values():
+            with open(os.path.join(self.public, asset["url"].lstrip("/")), "rb") as f:
+                self.assertEqual(hashlib.sha256(f.read()).hexdigest(), asset["sha256"])
+
+    def test_rerun_keeps_the_manifest_and_copies(self):
+        self.fingerprint()
+        before, copies = self.manifest(), self.hashed_files()
+        self.assertIn("0 new or changed", self.fingerprint())
+        self.assertEqual(self.manifest()["assets"], before["assets"])
+        self.assertEqual(self.hashed_files(), copies)
+
+    def test_touched_file_keeps_its_url(self):
+        self.fingerprint()
+        urls = {k: a["url"] for k, a in self.manifest()["assets"].items()}
+        self.write("avatars/avocado.png", b"avocado")
+        self.assertIn("0 new or changed", self.fingerprint())
+        self.assertEqual({k: a["url"] for k, a in self.manifest()["assets"].items()}, urls)
+
+    def test_changed_file_gets_a_new_url_and_the_old_one_one_run_of_grace(self):
+        self.fingerprint()
+        old = self.manifest()["assets"]["/avatars/avocado.png"]["url"]
+        self.write("avatars/avocado.png", b"avocado, re-rendered")
+        self.assertIn("1 new or changed", self.fingerprint())
+        manifest = self.manifest()
+        new = manifest["assets"]["/avatars/avocado.png"]["url"]
+        self.assertNotEqual(new, old)
+        self.assertEqual(manifest["previous"], [old])
+        self.assertTrue(os.path.exists(os.path.join(self.public, old.lstrip("/"))))
+
+        self.assertIn("1 old copies removed", self.fingerprint())
+        self.assertEqual(self.manifest()["previous"], [])
+        self.assertFalse(os.path.exists(os.path.join(self.public, old.lstrip("/"))))
+        self.assertTrue(os.path.exists(os.path.join(self.public, new.lstrip("/"))))
+
+
+if __name__ == "__main__":
+    unittest.main()
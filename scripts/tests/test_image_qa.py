@@ -0,0 +1,99 @@
+import os, tempfile, unittest
+
+import image_qa
+
+if image_qa.available():
+    import numpy as np
+    from PIL import Image
+
+
+def avatar(colour=(200, 60, 40), background=(255, 255, 255), radius: int = 140, size: int = 512):
+    """A shaded disc with eyes and a mouth on a plain background, roughly what a render looks like."""
+    y, x = np.mgrid[:size, :size]
+    rgb = np.empty((size, size, 3), dtype=np.uint8)
+    rgb[:] = background
+    disc = (x - size / 2) ** 2 + (y - size / 2) ** 2 < radius ** 2
+    shade = (0.6 + 0.4 * x / size)[disc][:, None]
+    rgb[disc] = (np.array(colour) * shade).astype(np.uint8)
+    c = size // 2
+    rgb[c - 76:c - 36, c - 66:c - 26] = (30, 30, 30)
+    rgb[c + 44:c + 74, c - 56:c + 74] = (120, 20, 20)
+    return rgb
+
+
+@unittest.skipUnless(image_qa.available(), "needs NumPy and Pillow")
+class ImageQATest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.qa = image_qa.ImageQA()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save(self, name: str, rgb) -> str:
+        path = os.path.join(self.tmp.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(rgb).save(path)
+        return path
+
+    def assert_rejected(self, rgb, reason: str) -> None:
+        result = self.qa.check(self.save("candidate.png", rgb))
+        self.assertFalse(result.ok, result.metrics)
+        self.assertTrue(any(r.startswith(reason) for r in result.reasons), result.reasons)
+
+    def test_clean_render_passes(self):
+        result = self.qa.check(self.save("avocado.png", avatar()))
+        self.assertTrue(result.ok, result.reasons)
+        self.assertEqual(result.metrics["border_white"], 1.0)
+        self.assertAlmostEqual(result.metrics["coverage"], np.pi * 140 ** 2 / 512 ** 2, places=2)
+
+    def test_subject_cut_off_at_the_bottom_passes(self):
+        rgb = avatar(radius=200)
+        rgb[400:] = (90, 50, 30)
+        self.assertTrue(self.qa.check(self.save("avocado.png", rgb)).ok)
+
+    def test_black_frame_is_rejected(self):
+        self.assert_rejected(np.zeros((512, 512, 3), dtype=np.uint8), "mostly black")
+
+    def test_blank_frame_is_rejected(self):
+        self.assert_rejected(np.full((512, 512, 3), 255, dtype=np.uint8), "nearly empty")
+
+    def test_tinted_background_is_rejected(self):
+        self.assert_rejected(avatar(background=(240, 200, 150)), "background not white")
+
+    def test_subject_filling_the_frame_is_rejected(self):
+        noise = np.random.default_rng(1).integers(40, 200, (512, 512, 3), dtype=np.uint8)
+        self.assert_rejected(noise, "background not white")
+        self.assert_rejected(noise, "subject fills the frame")
+
+    def test_flat_image_is_rejected(self):
+        self.assert_rejected(np.full((512, 512, 3), 128, dtype=np.uint8), "flat image")
+
+    def test_near_copy_of_a_sibling_is_rejected(self):
+        base = self.save("avocado.png", avatar())
+        other = self.save("avocado/quiz.png", avatar(colour=(40, 90, 200), radius=60))
+        pose = self.save("avocado/home.png", avatar(colour=(210, 70, 40)))
+        self.assertEqual(image_qa.sibling_paths(pose), [base, other])
+        result = self.qa.check(pose, image_qa.sibling_paths(pose))
+        self.assertFalse(result.ok)
+        self.assertEqual(result.metrics["closest_pose"], "avocado.png")
+        self.assertIn("near-copy of avocado.png", result.reasons[0])
+
+    def test_rank_prefers_the_palette_of_the_reference(self):
+        base = self.save("avocado.png", avatar(colour=(60, 160, 40)))
+        candidates = [self.save(f"c{i}.png", rgb) for i, rgb in enumerate(
+            [avatar(colour=(40, 60, 200)), avatar(colour=(60, 160, 40), radius=120), np.zeros((512, 512, 3), np.uint8)])]
+        results = self.qa.rank(candidates, references=[base])
+        self.assertEqual(max(range(3), key=lambda i: results[i].score), 1)
+        self.assertGreater(results[1].metrics["palette_similarity"], results[0].metrics["palette_similarity"])
+        self.assertLess(results[2].score, 0)  # failing the checks sinks a candidate
+
+    def test_references_are_the_base_image_or_its_poses(self):
+        base = self.save("avocado.png", avatar())
+        poses = [self.save(f"avocado/{pose}.png", avatar()) for pose in ("home", "quiz")]
+        self.assertEqual(image_qa.reference_paths(poses[0]), [base])
+        self.assertEqual(image_qa.reference_paths(base), poses)
+
+
+if __name__ == "__main__":
+    unittest.main()
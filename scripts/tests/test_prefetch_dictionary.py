@@ -0,0 +1,89 @@
+import json, os, subprocess, sys, tempfile, unittest
+
+from fake_dictionary import FakeDictionary, sense
+from tests import SCRIPTS_DIR, load_script
+from tests.servers import http_server
+
+prefetch = load_script("prefetch-dictionary.py")
+
+WORDS = ["apple", "running", "Paris", "zzyzx"]
+
+
+def fake_sense(word: str) -> str:
+    return sense(word)[1]
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_definitions_that_give_the_word_away_are_skipped(self):
+        self.assertTrue(prefetch.references_word("running", "the act of someone who runs"))
+        self.assertFalse(prefetch.references_word("apple", "a round fruit"))
+        entry = prefetch.from_mw([{"meta": {"id": "apple:1"}, "fl": "noun",
+                                   "shortdef": ["an apple tree's fruit", "a round fruit"]}], "apple")
+        self.assertEqual(entry["definition"], "a round fruit")
+
+    def test_suggestions_are_not_an_entry(self):
+        self.assertIsNone(prefetch.from_mw(["apply", "apples"], "appel"))
+
+
+class PrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data = os.path.join(self.tmp.name, "data.json")
+        self.out = os.path.join(self.tmp.name, "dictionary.json")
+        with open(self.data, "w") as f:
+            json.dump({"wordLists": [{"id": "l1", "words": [{"word": w} for w in WORDS]}]}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_prefetch(self, api: str, mw_key: str = "test", *args: str) -> tuple[subprocess.CompletedProcess, dict]:
+        env = {k: v for k, v in os.environ.items() if not k.startswith("VITE_MW_")}
+        env["VITE_MW_ELEMENTARY_API_KEY"] = env["VITE_MW_COLLEGIATE_API_KEY"] = mw_key
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "prefetch-dictionary.py"), "--data", self.data,
+                              "--out", self.out, "--api-base", api, *args],
+                             env=env, capture_output=True, text=True, timeout=120)
+        with open(self.out) as f:
+            return run, json.load(f)["words"]
+
+    def test_index_follows_fetch_word_data(self):
+        fake = FakeDictionary(unknown={"zzyzx"}, proper={"Paris"}, latency=0.01)
+        with http_server(fake) as api:
+            run, words = self.run_prefetch(api)
+            self.assertEqual(run.returncode, 0, run.stdout)
+            self.assertEqual(sorted(words), sorted(WORDS))
+            apple = words["apple"]
+            self.assertTrue(apple["definition"].endswith("(sd2)"))  # the elementary reference wins
+            self.assertEqual(apple["phonetic"], "/apple/")
+            self.assertTrue(apple["audioUrl"].startswith(prefetch.MW_AUDIO_BASE))
+            self.assertEqual(words["Paris"]["partOfSpeech"], "proper noun")
+            self.assertEqual(words["Paris"]["definition"], "A " + fake_sense("Paris"))  # not the one naming it
+            self.assertEqual(words["zzyzx"]["definition"], "")
+
+            requests = fake.counts["free"]["requests"]
+            run, _ = self.run_prefetch(api)
+            self.assertIn(f"{len(WORDS)} indexed, 0 to fetch", run.stdout)
+            self.assertEqual(fake.counts["free"]["requests"], requests)
+
+    def test_refused_mw_key_falls_back_to_free_dictionary(self):
+        fake = FakeDictionary(latency=0.01)
+        with http_server(fake) as api:
+            run, words = self.run_prefetch(api, "wrong", "--concurrency", "1")
+        self.assertEqual(run.returncode, 0, run.stdout)
+        self.assertEqual(run.stdout.count("key refused"), 2)  # once per reference
+        self.assertNotIn("errors", words["apple"])
+        # Free Dictionary's first sense names the word; HTML entities are decoded
+        self.assertEqual(words["apple"]["definition"], fake_sense("apple") + " & more")
+        self.assertEqual(fake.counts["mw"]["requests"], 2)
+
+    def test_throttling_and_server_errors_are_retried(self):
+        fake = FakeDictionary(latency=0.01, rate_limit=4, failure_rate=0.2, seed=3)
+        with http_server(fake) as api:
+            run, words = self.run_prefetch(api, "test", "--retries", "8", "--free-rate", "20", "--mw-rate", "20")
+        self.assertEqual(run.returncode, 0, run.stdout)
+        self.assertFalse([w for w, entry in words.items() if entry.get("errors")])
+        self.assertGreater(sum(c["throttled"] for c in fake.counts.values()), 0)
+        self.assertGreater(sum(c["failed"] for c in fake.counts.values()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
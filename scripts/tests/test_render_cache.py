@@ -0,0 +1,98 @@
+import asyncio, os, tempfile, unittest
+
+from comfy_runner import Job, build_workflow
+from fake_comfy import FakeComfy
+from render_cache import RenderCache, cache_key
+from tests.test_comfy_runner import job, render
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_filename_prefix_only_names_the_file(self):
+        self.assertEqual(cache_key(build_workflow("an avocado", 7, "avocado_base")),
+                         cache_key(build_workflow("an avocado", 7, "renamed/elsewhere")))
+
+    def test_key_ignores_node_order(self):
+        workflow = build_workflow("an avocado", 7, "avocado_base")
+        reordered = {"prompt": dict(reversed(workflow["prompt"].items()))}
+        self.assertEqual(cache_key(workflow), cache_key(reordered))
+        self.assertEqual(cache_key(workflow), cache_key(workflow["prompt"]))
+
+    def test_anything_that_changes_the_image_changes_the_key(self):
+        base = cache_key(build_workflow("an avocado", 7, "avocado_base"))
+        changed = [
+            build_workflow("an avocado, waving", 7, "avocado_base"),
+            build_workflow("an avocado", 8, "avocado_base"),
+            build_workflow("an avocado", 7, "avocado_base", steps=8),
+            build_workflow("an avocado", 7, "avocado_base", size=256),
+            build_workflow("an avocado", 7, "avocado_base", batch_size=4),
+            build_workflow("an avocado", 7, "avocado_base", loaders={"47": {"strength_model": 0.8}}),
+        ]
+        keys = {cache_key(workflow) for workflow in changed}
+        self.assertEqual(len(keys), len(changed))
+        self.assertNotIn(base, keys)
+
+    def test_the_key_does_not_change_with_the_workflow_passed_in(self):
+        workflow = build_workflow("an avocado", 7, "avocado_base")
+        cache_key(workflow)
+        self.assertEqual(workflow["prompt"]["9"]["inputs"]["filename_prefix"], "avocado_base")
+
+
+class RenderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = RenderCache(os.path.join(self.tmp.name, "cache"))
+        self.src = os.path.join(self.tmp.name, "render.png")
+        self.out = os.path.join(self.tmp.name, "avocado.png")
+        with open(self.src, "wb") as f:
+            f.write(b"rendered")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_miss_then_fresh_then_cached(self):
+        self.assertEqual(self.cache.status("ab12", self.out), "miss")
+        self.cache.store("ab12", self.src, label="avocado")
+        self.assertEqual(self.cache.meta("ab12")["label"], "avocado")
+        self.assertEqual(self.cache.status("ab12", self.out), "cached")
+        self.cache.restore("ab12", self.out)
+        self.assertEqual(self.cache.status("ab12", self.out), "fresh")
+        with open(self.out, "wb") as f:
+            f.write(b"edited by hand")
+        self.assertEqual(self.cache.status("ab12", self.out), "cached")
+
+    def test_stored_copy_is_not_the_output_file(self):
+        self.cache.store("ab12", self.src)
+        with open(self.src, "wb") as f:
+            f.write(b"overwritten by the next render")
+        self.cache.restore("ab12", self.out)
+        with open(self.out, "rb") as f:
+            self.assertEqual(f.read(), b"rendered")
+
+    def test_entry_without_its_image_is_a_miss(self):
+        self.cache.store("ab12", self.src)
+        os.unlink(os.path.join(self.cache.root, "ab", "ab12.png"))
+        self.assertIsNone(self.cache.meta("ab12"))
+        self.assertEqual(self.cache.status("ab12", self.out), "miss")
+
+
+class CachedRunTest(unittest.TestCase):
+    def test_unchanged_jobs_are_not_rendered_again(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root, cache_dir = os.path.join(tmp, "avatars"), os.path.join(tmp, "cache")
+            jobs = [job(root, "avocado", pose) for pose in ("base", "home")]
+            failed, out = asyncio.run(render([FakeComfy(latency=0.05)], jobs, cache_dir))
+            self.assertEqual(failed, 0, out)
+
+            fake = FakeComfy(latency=0.05)
+            failed, out = asyncio.run(render([fake], jobs, cache_dir))
+            self.assertIn("2 up to date, 0 restored, 0 to render", out)
+            os.unlink(jobs[0].out_path)
+            renamed = [Job(j.label, j.prompt, j.seed, f"{j.prefix}_v2", j.out_path, root=root) for j in jobs]
+            failed, out = asyncio.run(render([fake], renamed, cache_dir))
+            self.assertIn("1 up to date, 1 restored, 0 to render", out)
+            self.assertEqual(fake.counts.get("/prompt", 0), 0)
+            self.assertTrue(os.path.exists(jobs[0].out_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
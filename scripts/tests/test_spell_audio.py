@@ -0,0 +1,49 @@
+import json, os, shutil, subprocess, sys, tempfile, unittest
+
+from tests import SCRIPTS_DIR
+from tests.test_compress_audio import write_wav
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "needs ffmpeg on PATH")
+class SpellAudioTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.letters = os.path.join(self.tmp.name, "letters")
+        self.out = os.path.join(self.tmp.name, "spelled")
+        self.data = os.path.join(self.tmp.name, "data.json")
+        os.makedirs(self.letters)
+        wav = os.path.join(self.tmp.name, "tone.wav")
+        write_wav(wav, 0.2)
+        for name in ("a", "b", "c", "capital"):
+            subprocess.run(["ffmpeg", "-v", "error", "-i", wav, os.path.join(self.letters, f"{name}.mp3")], check=True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def spell(self, *lists: list[str]) -> tuple[str, dict]:
+        with open(self.data, "w") as f:
+            json.dump({"wordLists": [{"id": f"l{i}", "words": [{"word": w} for w in words]}
+                                     for i, words in enumerate(lists)]}, f)
+        run = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "spell-audio.py"), "--data", self.data,
+                              "--letters", self.letters, "--out", self.out, "--formats", "mp3"],
+                             capture_output=True, text=True, timeout=120)
+        self.assertEqual(run.returncode, 0, run.stdout + run.stderr)
+        with open(os.path.join(self.out, "manifest.json")) as f:
+            return run.stdout, json.load(f)
+
+    def test_only_new_words_are_built_and_gone_ones_removed(self):
+        out, manifest = self.spell(["cab", "Abba"], ["cab"])
+        self.assertIn("Spelling 2 words (0 up to date)", out)
+        self.assertEqual(sorted(manifest["words"]), ["Abba", "cab"])
+
+        out, manifest = self.spell(["cab", "Abba", "bad"])
+        self.assertIn("Spelling 1 words (2 up to date)", out)
+        self.assertIn("no clip for 'd'", out)
+
+        out, manifest = self.spell(["cab"])
+        self.assertIn("Spelling 0 words (1 up to date)", out)
+        self.assertEqual(sorted(os.listdir(self.out)), ["cab.mp3", "manifest.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio, contextlib, io, json, os, subprocess, sys, tempfile, unittest
+
+from fake_tts import FakeTTS, fake_mp3
+from tests import SCRIPTS_DIR, load_script
+from tests.servers import http_server
+
+warm_tts = load_script("warm-tts-cache.py")
+
+WORDS = ["apple", "banana", "Don't", "ice cream", "naïve", "apple"]
+
+
+class CacheNameTest(unittest.TestCase):
+    def test_matches_server_ts(self):
+        self.assertEqual(warm_tts.tts_cache_name("Don't"), "don_t.mp3")
+        self.assertEqual(warm_tts.tts_cache_name("ice cream"), "ice_cream.mp3")
+        self.assertEqual(warm_tts.tts_cache_name("naïve"), "na_ve.mp3")
+        self.assertEqual(warm_tts.tts_cache_name("bee🐝"), "bee__.mp3")  # one UTF-16 surrogate pair
+
+
+class WarmTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "tts-cache")
+        self.data = os.path.join(self.tmp.name, "data.json")
+        with open(self.data, "w") as f:
+            json.dump({"wordLists": [{"id": "l1", "words": [{"word": w} for w in WORDS]}]}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def warm_cache(self, api: str, key: str = "test", *args: str) -> subprocess.CompletedProcess:
+        env = {**os.environ, "ELEVENLABS_API_KEY": key, "ELEVENLABS_VOICE_ID": "voice"}
+        return subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "warm-tts-cache.py"), "--data", self.data,
+                               "--cache-dir", self.cache_dir, "--api-base", api, "--backoff", "0.05", *args],
+                              env=env, capture_output=True, text=True, timeout=60)
+
+    def test_fetches_only_missing_words(self):
+        fake = FakeTTS(latency=0.01)
+        with http_server(fake) as api:
+            run = self.warm_cache(api)
+            self.assertEqual(run.returncode, 0, run.stdout)
+            self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                             ["apple.mp3", "banana.mp3", "don_t.mp3", "ice_cream.mp3", "na_ve.mp3"])
+            with open(os.path.join(self.cache_dir, "don_t.mp3"), "rb") as f:
+                self.assertEqual(f.read(), fake_mp3("Don't"))
+            self.assertEqual(fake.counts["ok"], 5)
+
+            run = self.warm_cache(api)
+            self.assertEqual(run.returncode, 0, run.stdout)
+            self.assertIn("5 cached, 0 missing", run.stdout)
+            self.assertEqual(fake.counts["requests"], 5)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        fake = FakeTTS(latency=0.01, rate_limit=8, failure_rate=0.2, seed=4)
+        words = {warm_tts.tts_cache_name(f"word{i}"): f"word{i}" for i in range(20)}
+        os.makedirs(self.cache_dir)
+        with http_server(fake) as api:
+            warmer = warm_tts.Warmer(api, "test", "voice", concurrency=4, retries=8, backoff=0.05)
+            with contextlib.redirect_stdout(io.StringIO()):
+                fetched, _, failures = asyncio.run(warm_tts.warm(words, self.cache_dir, warmer))
+        self.assertEqual((fetched, failures), (20, []))
+        self.assertGreater(fake.counts["throttled"], 0)
+        self.assertGreater(fake.counts["failed"], 0)
+        self.assertGreater(warmer.throttled, 0)
+
+    def test_rejected_key_stops_early(self):
+        fake = FakeTTS(latency=0.01)
+        with http_server(fake) as api:
+            run = self.warm_cache(api, "wrong", "--concurrency", "2")
+        self.assertEqual(run.returncode, 1)
+        self.assertIn("HTTP 401", run.stdout)
+        self.assertLessEqual(fake.counts["unauthorized"], 2)
+        self.assertFalse(os.listdir(self.cache_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import json, os, tempfile, unittest
+
+import word_lists
+
+
+class WordListsTest(unittest.TestCase):
+    def test_each_word_once_in_list_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "data.json")
+            with open(path, "w") as f:
+                json.dump({"wordLists": [
+                    {"id": "l1", "words": [{"word": "pear"}, {"word": "apple"}, {"word": " "}, {"word": None}]},
+                    {"id": "l2", "words": [{"word": "apple"}, {"word": "Apple"}, "not an entry"]},
+                ]}, f)
+            self.assertEqual(word_lists.list_words(path), ["pear", "apple", "Apple"])
+            self.assertEqual(word_lists.list_words(path, ["l2"]), ["apple", "Apple"])
+
+    def test_data_file_falls_back_to_the_seed(self):
+        self.assertEqual(word_lists.data_path("/tmp/mine.json"), "/tmp/mine.json")
+        self.assertIn(os.path.basename(word_lists.data_path()), ("data.json", "default-data.json"))
+        self.assertTrue(os.path.exists(word_lists.data_path()))
+
+
+if __name__ == "__main__":
+    unittest.main()
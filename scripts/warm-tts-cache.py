@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Fill server.ts's ElevenLabs disk cache (tts-cache/) for every word list.
+
+server.ts only writes tts-cache/<key>.mp3 when /api/tts is first asked
+for a word, so the first child to practise a new list waits on an
+ElevenLabs round-trip per word. This reads the word lists from data.json
+(or default-data.json), works out the exact file names ttsCacheKey()
+uses, and fetches only the missing ones: a few at a time, backing off on
+429/5xx (honouring Retry-After), each written to a temp file and renamed
+into place so the server never serves a partial MP3. Safe to run nightly:
+
+    15 3 * * *  cd /path/to/spelling-bee/scripts && python3 warm-tts-cache.py
+
+ELEVENLABS_API_KEY / ELEVENLABS_VOICE_ID come from the environment or the
+repo's .env, like the server. --api-base points it at a stand-in
+(fake_tts.py) for testing.
+"""
+
+import argparse, asyncio, contextlib, json, os, re, sys, tempfile, time, urllib.parse
+
+from http_pool import Backoff, HTTPPool, load_env
+from word_lists import REPO_DIR, data_path, list_words
+
+CACHE_DIR = os.path.join(REPO_DIR, "tts-cache")
+ELEVENLABS_API = "https://api.elevenlabs.io"
+MODEL_ID = "eleven_turbo_v2_5"       # what server.ts asks for
+OUTPUT_FORMAT = "mp3_44100_128"
+MAX_TEXT = 200                       # server.ts rejects longer text
+
+
+def tts_cache_name(text: str) -> str:
+    """ttsCacheKey() from server.ts: lowercase, every char outside [a-z0-9] -> "_".
+    JS replaces per UTF-16 code unit, so characters outside the BMP become "__"."""
+    return re.sub(r"[^a-z0-9]", lambda m: "__" if ord(m.group()) > 0xFFFF else "_", text.lower()) + ".mp3"
+
+
+def js_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def cache_names(words: list[str]) -> dict[str, str]:
+    """Cache file name -> text for every word the server would speak. The first spelling of
+    a word wins, as on the server, where whichever request comes first fills the cache."""
+    names = {}
+    for text in words:
+        if js_length(text) <= MAX_TEXT:
+            names.setdefault(tts_cache_name(text), text)
+    return names
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".part", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# ─── Fetching ────────────────────────────────────────────────────────
+
+class AuthError(Exception):
+    pass
+
+
+class Warmer:
+    def __init__(self, api_base: str, api_key: str, voice_id: str, concurrency: int = 4,
+                 retries: int = 5, backoff: float = 1.0):
+        self.pool = HTTPPool(api_base, size=concurrency)
+        self.slots = asyncio.Semaphore(concurrency)  # so a word waiting for a slot still sees auth_error
+        self.prefix = urllib.parse.urlsplit(api_base).path.rstrip("/")
+        self.api_key = api_key
+        self.voice_id = voice_id
+        self.retry = Backoff(retries, backoff, on_throttle=self.pause)
+        self.resume_at = 0.0  # a 429 pauses every request until then, not just the one that got it
+        self.auth_error: str | None = None  # a rejected key fails every word; stop asking
+
+    @property
+    def throttled(self) -> int:
+        return self.retry.throttled
+
+    def pause(self, delay: float) -> None:
+        self.resume_at = max(self.resume_at, time.monotonic() + delay)
+
+    @contextlib.asynccontextmanager
+    async def turn(self):
+        async with self.slots:
+            if self.auth_error:
+                raise AuthError(self.auth_error)
+            if (wait := self.resume_at - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            yield
+
+    async def fetch(self, text: str) -> bytes:
+        path = f"{self.prefix}/v1/text-to-speech/{urllib.parse.quote(self.voice_id)}?output_format={OUTPUT_FORMAT}"
+        body = json.dumps({"text": text, "model_id": MODEL_ID}).encode()
+        headers = {"xi-api-key": self.api_key, "Content-Type": "application/json", "Accept": "audio/mpeg"}
+        status, resp_headers, data = await self.retry.request(self.pool, "POST", path, body, headers, gate=self.turn)
+        if status == 200 and data and resp_headers.get("content-type", "audio/").startswith("audio/"):
+            return data
+        error = f"HTTP {status}: {data[:200].decode(errors='replace')}"
+        if status in (401, 403):
+            self.auth_error = self.auth_error or error
+            raise AuthError(self.auth_error)
+        raise ValueError(error)  # bad text, empty or non-audio reply: retrying won't help
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+async def warm(words: dict[str, str], cache_dir: str, warmer: Warmer) -> tuple[int, int, list[str]]:
+    """Fetch every word whose cache file is missing; (fetched, bytes, failures)."""
+    fetched, size, failures = 0, 0, []
+
+    async def one(name: str, text: str) -> None:
+        nonlocal fetched, size
+        try:
+            data = await warmer.fetch(text)
+        except AuthError:
+            failures.append(text)
+            return
+        except ValueError as e:
+            print(f"  FAILED: {text!r}: {e}")
+            failures.append(text)
+            return
+        write_atomic(os.path.join(cache_dir, name), data)
+        fetched += 1
+        size += len(data)
+        print(f"  Cached: {name} ({len(data) / 1e3:.0f} KB)")
+        sys.stdout.flush()
+
+    await asyncio.gather(*(one(name, text) for name, text in words.items()))
+    await warmer.close()
+    if warmer.auth_error:
+        print(f"  ERROR: {warmer.auth_error}; check ELEVENLABS_API_KEY / ELEVENLABS_VOICE_ID")
+    return fetched, size, failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="app data file (default: data.json, else default-data.json)")
+    parser.add_argument("--list", action="append", dest="lists", metavar="ID", help="only this word list id (repeatable)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="server.ts TTS cache (default: the repo's tts-cache/)")
+    parser.add_argument("--api-base", default=ELEVENLABS_API, help=f"TTS API base URL (default {ELEVENLABS_API})")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight (default 4)")
+    parser.add_argument("--retries", type=int, default=5, help="retries per word on 429/5xx/network errors (default 5)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="first retry delay in seconds, doubling (default 1)")
+    parser.add_argument("--dry-run", action="store_true", help="report hits and misses without fetching")
+    args = parser.parse_args()
+
+    data_file = data_path(args.data)
+    words = cache_names(list_words(data_file, args.lists))
+    os.makedirs(args.cache_dir, exist_ok=True)
+    missing = {name: text for name, text in words.items() if not os.path.exists(os.path.join(args.cache_dir, name))}
+    print(f"=== TTS cache: {len(words)} words in {os.path.basename(data_file)}, "
+          f"{len(words) - len(missing)} cached, {len(missing)} missing ===")
+    sys.stdout.flush()
+    if not missing:
+        return 0
+    if args.dry_run:
+        for name, text in sorted(missing.items()):
+            print(f"  missing: {name} ({text})")
+        return 0
+
+    env = {**load_env(os.path.join(REPO_DIR, ".env")), **os.environ}
+    api_key, voice_id = env.get("ELEVENLABS_API_KEY", ""), env.get("ELEVENLABS_VOICE_ID", "")
+    if not api_key or not voice_id:
+        print("ERROR: ELEVENLABS_API_KEY and ELEVENLABS_VOICE_ID must be set (environment or .env)")
+        return 2
+
+    started = time.time()
+    warmer = Warmer(args.api_base, api_key, voice_id, args.concurrency, args.retries, args.backoff)
+    fetched, size, failures = asyncio.run(warm(missing, args.cache_dir, warmer))
+    print(f"=== Hits: {len(words) - len(missing)}, misses: {len(missing)}, fetched: {fetched} "
+          f"({size / 1e6:.1f} MB in {time.time() - started:.1f} s), failed: {len(failures)}"
+          + (f", throttled {warmer.throttled}x" if warmer.throttled else "") + " ===")
+    sys.stdout.flush()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
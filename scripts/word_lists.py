@@ -0,0 +1,36 @@
+"""The app's word lists as the offline scripts read them.
+
+server.ts keeps them in data.json, which it seeds from default-data.json on
+first start; warm-tts-cache.py, prefetch-dictionary.py and spell-audio.py
+read whichever of the two exists, unless given --data.
+"""
+
+import json, os
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def data_path(path: str | None = None) -> str:
+    """`path` if given, else the repo's data.json, else default-data.json."""
+    if path:
+        return path
+    live = os.path.join(REPO_DIR, "data.json")
+    return live if os.path.exists(live) else os.path.join(REPO_DIR, "default-data.json")
+
+
+def load_word_lists(path: str) -> list[dict]:
+    with open(path) as f:
+        return json.load(f).get("wordLists", [])
+
+
+def list_words(path: str, list_ids: list[str] | None = None) -> list[str]:
+    """Every word in the lists (only those in `list_ids`, if given), once each, in list order."""
+    words = {}
+    for word_list in load_word_lists(path):
+        if list_ids and word_list.get("id") not in list_ids:
+            continue
+        for entry in word_list.get("words", []):
+            text = entry.get("word") if isinstance(entry, dict) else None
+            if isinstance(text, str) and text.strip():
+                words[text] = None
+    return list(words)
@@ -1,10 +1,13 @@
 import { file } from 'bun'
 import { networkInterfaces } from 'os'
-import { existsSync, mkdirSync } from 'fs'
+import { existsSync, mkdirSync, readdirSync, readFileSync, renameSync, statSync, unlinkSync, writeFileSync } from 'fs'
 import { join } from 'path'
+import { gunzipSync, gzipSync } from 'zlib'
 
 const DATA_FILE = './data.json'
 const SESSIONS_FILE = './sessions.json'
+const SESSION_ARCHIVE_DIR = './session-archive'
+const DICTIONARY_FILE = './dictionary.json'
 const ADMIN_PIN_FILE = './admin-pin.json'
 
 const ELEVENLABS_API_KEY = process.env.ELEVENLABS_API_KEY || ''
@@ -123,6 +126,71 @@ async function saveSessions(sessions: unknown[]) {
   await Bun.write(SESSIONS_FILE, JSON.stringify(sessions, null, 2))
 }
 
+type StoredSession = { id?: string; listId?: string; userId?: string }
+
+// Sessions scripts/compact-sessions.py moved out of sessions.json, one gzipped
+// JSONL segment per month. They are served along with the live ones, and only
+// parsed again when a segment file changes.
+let archiveCache: { stamp: string; sessions: StoredSession[] } | null = null
+
+function archiveSegments(): string[] {
+  if (!existsSync(SESSION_ARCHIVE_DIR)) return []
+  return readdirSync(SESSION_ARCHIVE_DIR)
+    .filter((name) => name.startsWith('sessions-') && name.endsWith('.jsonl.gz'))
+    .sort()
+    .map((name) => join(SESSION_ARCHIVE_DIR, name))
+}
+
+function readSegment(path: string): StoredSession[] {
+  return gunzipSync(readFileSync(path)).toString('utf8')
+    .split('\n')
+    .filter((line) => line.trim())
+    .map((line) => JSON.parse(line))
+}
+
+function loadArchivedSessions(): StoredSession[] {
+  try {
+    const segments = archiveSegments()
+    const stamp = segments.map((path) => {
+      const st = statSync(path)
+      return `${path}:${st.mtimeMs}:${st.size}`
+    }).join('|')
+    if (archiveCache?.stamp !== stamp) {
+      archiveCache = { stamp, sessions: segments.flatMap(readSegment) }
+    }
+    return archiveCache.sessions
+  } catch (err) {
+    console.error('Could not read the session archive:', err)
+    return []
+  }
+}
+
+/** Archived sessions, then the live ones (a session mid-compaction can briefly be in both). */
+async function loadAllSessions(): Promise<StoredSession[]> {
+  const live = await loadSessions() as StoredSession[]
+  const liveIds = new Set(live.map((s) => s.id))
+  return [...loadArchivedSessions().filter((s) => !liveIds.has(s.id)), ...live]
+}
+
+/** Remove archived sessions that `keep` rejects. rollup.json is dropped; the next compaction rebuilds it. */
+function dropArchivedSessions(keep: (s: StoredSession) => boolean) {
+  for (const path of archiveSegments()) {
+    const sessions = readSegment(path)
+    const kept = sessions.filter(keep)
+    if (kept.length === sessions.length) continue
+    if (kept.length === 0) {
+      unlinkSync(path)
+      continue
+    }
+    const lines = kept.map((s) => JSON.stringify(s) + '\n').join('')
+    writeFileSync(`${path}.tmp`, gzipSync(lines, { level: 9 }))
+    renameSync(`${path}.tmp`, path)
+  }
+  const rollup = join(SESSION_ARCHIVE_DIR, 'rollup.json')
+  if (existsSync(rollup)) unlinkSync(rollup)
+  archiveCache = null
+}
+
 const server = Bun.serve({
   port: 3001,
   hostname: '0.0.0.0',
@@ -156,10 +224,10 @@ const server = Bun.serve({
 
     if (url.pathname === '/api/sessions') {
       if (req.method === 'GET') {
-        const sessions = await loadSessions()
+        const sessions = await loadAllSessions()
         const listId = url.searchParams.get('listId')
         const userId = url.searchParams.get('userId')
-        let filtered = sessions as Array<{ listId?: string; userId?: string }>
+        let filtered = sessions
         if (listId) filtered = filtered.filter((s) => s.listId === listId)
         if (userId) filtered = filtered.filter((s) => s.userId === userId || !s.userId)
         return new Response(JSON.stringify(filtered), { headers })
@@ -176,16 +244,29 @@ const server = Bun.serve({
       if (req.method === 'DELETE') {
         const userId = url.searchParams.get('userId')
         if (userId) {
-          const sessions = await loadSessions() as Array<{ userId?: string }>
-          const kept = sessions.filter((s) => s.userId !== userId && s.userId != null)
-          await saveSessions(kept)
+          const keep = (s: StoredSession) => s.userId !== userId && s.userId != null
+          const sessions = await loadSessions() as StoredSession[]
+          await saveSessions(sessions.filter(keep))
+          dropArchivedSessions(keep)
         } else {
           await saveSessions([])
+          dropArchivedSessions(() => false)
         }
         return new Response(JSON.stringify({ ok: true }), { headers })
       }
     }
 
+    // Word data scripts/prefetch-dictionary.py looked up ahead of time, all in one response
+    if (url.pathname === '/api/dictionary') {
+      if (req.method === 'GET') {
+        const f = file(DICTIONARY_FILE)
+        if (await f.exists()) {
+          return new Response(f, { headers })
+        }
+        return new Response(JSON.stringify({ version: 1, words: {} }), { headers })
+      }
+    }
+
     if (url.pathname === '/api/auth/verify-pin') {
       if (req.method === 'POST') {
         const clientIp = req.headers.get('x-forwarded-for')?.split(',')[0]?.trim() || 'unknown'
@@ -125,7 +125,8 @@ export function WordListManager() {
 
     const updatedWords = [...list.words]
     for (let i = 0; i < updatedWords.length; i++) {
-      const data = await fetchWordData(updatedWords[i].word)
+      // A refresh asks the dictionaries again rather than the prefetched index
+      const data = await fetchWordData(updatedWords[i].word, false)
       updatedWords[i] = { ...updatedWords[i], ...data }
       setBackfillProgress(Math.round(((i + 1) / updatedWords.length) * 100))
       if (i < updatedWords.length - 1) {
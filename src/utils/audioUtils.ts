@@ -288,9 +288,45 @@ async function fetchMWEntry(word: string): Promise<Omit<WordEntry, 'word'> | nul
   return best
 }
 
+// — Prefetched index (scripts/prefetch-dictionary.py, served by GET /api/dictionary) —
+
+type IndexedWord = Omit<WordEntry, 'word'> & { errors?: string[] }
+
+/** The whole index; empty if the server has none (every word is then looked up live). */
+async function loadDictionaryIndex(): Promise<Record<string, IndexedWord>> {
+  try {
+    const res = await fetch('/api/dictionary')
+    if (res.ok) {
+      const data: { words?: Record<string, IndexedWord> } = await res.json()
+      return data.words || {}
+    }
+  } catch {
+    // continue
+  }
+  return {}
+}
+
+// Fetched once per page load
+let dictionaryIndex: Promise<Record<string, IndexedWord>> | null = null
+
+async function fetchIndexedWordData(word: string): Promise<Omit<WordEntry, 'word'> | null> {
+  dictionaryIndex ??= loadDictionaryIndex()
+  const words = await dictionaryIndex
+  const entry = words[word]
+  // Entries a source failed for, or with no definition, are looked up live instead
+  if (!entry || entry.errors?.length || !entry.definition) return null
+  const { definition, partOfSpeech, example, audioUrl, phonetic } = entry
+  return { definition, partOfSpeech, example, audioUrl, phonetic }
+}
+
 export async function fetchWordData(
-  word: string
+  word: string,
+  useIndex = true
 ): Promise<Omit<WordEntry, 'word'>> {
+  // 0. Words in the prefetched index need no dictionary round-trips at all
+  const indexed = useIndex ? await fetchIndexedWordData(word) : null
+  if (indexed) return indexed
+
   const isProperNoun = word.length > 0 && word[0] === word[0].toUpperCase() && word[0] !== word[0].toLowerCase()
 
   // 1. Try Merriam-Webster Elementary dictionary (kid-friendly definitions)